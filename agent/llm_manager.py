@@ -1,33 +1,336 @@
 # agent/llm_manager.py
+#
+# The LLM call layer. Chat clients are created lazily, once per provider and
+# process, and every call goes through one LLMService that caches responses,
+# limits concurrency and request rate per provider, batches where the client
+# supports it, and fails over between providers based on errors and latency.
+#
+# Providers are plain factories, so tests and benchmarks can register a fake
+# chat model and run without network access:
+#
+#     from langchain_core.language_models.fake_chat_models import FakeListChatModel
+#     service = LLMService([Provider("fake", lambda: FakeListChatModel(responses=["hi"]))])
+#
+# Settings are read from the environment (and a .env file) when the service
+# and its clients are first built, not at import:
+#   LLM_PROVIDERS      providers to try, in order of preference ("gemini,ollama")
+#   GEMINI_MODEL       "gemini-2.5-pro"; needs GOOGLE_API_KEY
+#   OLLAMA_MODEL       "mistral"
+#   LLM_TEMPERATURE    0.7
+#   LLM_TIMEOUT        a call slower than this (60 s) counts as a failure and
+#                      moves on to the next provider
+#   LLM_SLOW_SECONDS   providers whose recent average latency is above this
+#                      (15 s) are tried last
+#   LLM_COOLDOWN       a provider that failed is skipped for this long (30 s)
+#   LLM_<NAME>_MAX_CONCURRENCY, LLM_<NAME>_RATE, LLM_<NAME>_BURST
+#                      per-provider limits (4 calls in flight, no rate limit)
 
+import asyncio
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.chat_models import ChatOllama
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
 from dotenv import load_dotenv
 
-# Load environment variables from a .env file
-load_dotenv()
+from tools.cache import LLM_CACHE
+from tools.rate_limit import TokenBucket
+from tools.singleflight import SingleFlight
+from tools.telemetry import get_logger
 
+log = get_logger(__name__)
 
-def get_llm():
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def _setting(name: str, default: str = None) -> str:
+    """Reads a setting, loading the .env file into the environment on first use."""
+    global _env_loaded
+    if not _env_loaded:
+        with _env_lock:
+            if not _env_loaded:
+                load_dotenv()
+                _env_loaded = True
+    return os.getenv(name, default)
+
+
+def make_gemini():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=_setting("GEMINI_MODEL", "gemini-2.5-pro"),
+        google_api_key=_setting("GOOGLE_API_KEY"),
+        temperature=float(_setting("LLM_TEMPERATURE", "0.7")),
+        convert_system_message_to_human=True
+    )
+
+
+def make_ollama():
+    from langchain_community.chat_models import ChatOllama
+
+    return ChatOllama(model=_setting("OLLAMA_MODEL", "mistral"),
+                      temperature=float(_setting("LLM_TEMPERATURE", "0.7")))
+
+
+PROVIDER_FACTORIES = {"gemini": make_gemini, "ollama": make_ollama}
+
+
+def register_provider(name: str, factory):
+    """Makes a chat model factory available under `name` for LLM_PROVIDERS."""
+    PROVIDER_FACTORIES[name] = factory
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised when no provider could answer a prompt."""
+
+
+class Provider:
     """
-    Initializes and returns the language model.
+    One chat model backend: a lazily created client plus its limits and health.
 
-    Tries to initialize the specified Gemini model using a Google API key.
-    If that fails, it falls back to a local Ollama model.
+    Args:
+        name: The provider name, used in logs and stats.
+        factory: A zero-argument callable returning a LangChain chat model.
+        max_concurrency: Calls in flight at once.
+        rate: Calls per second (token bucket); 0 disables the limit.
+        burst: Token bucket capacity.
+        cooldown: Seconds the provider is skipped after a failure.
+        slow_seconds: Average latency above which the provider is tried last.
     """
-    try:
-        # Using the specific model you mentioned
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-pro",  # Updated to the model you are using
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-            temperature=0.7,
-            convert_system_message_to_human=True
+
+    def __init__(self, name: str, factory, max_concurrency: int = 4, rate: float = 0, burst: float = None,
+                 cooldown: float = 30, slow_seconds: float = 15):
+        self.name = name
+        self.factory = factory
+        self.max_concurrency = max_concurrency
+        self.cooldown = cooldown
+        self.slow_seconds = slow_seconds
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.latency = None  # exponentially weighted average, seconds
+        self.calls = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._client = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str):
+        if name not in PROVIDER_FACTORIES:
+            raise ValueError(f"Unknown LLM provider {name!r}")
+        prefix = f"LLM_{name.upper()}"
+        return cls(
+            name,
+            PROVIDER_FACTORIES[name],
+            max_concurrency=int(_setting(f"{prefix}_MAX_CONCURRENCY", "4")),
+            rate=float(_setting(f"{prefix}_RATE", "0")),
+            burst=float(_setting(f"{prefix}_BURST", "0")) or None,
+            cooldown=float(_setting("LLM_COOLDOWN", "30")),
+            slow_seconds=float(_setting("LLM_SLOW_SECONDS", "15")),
         )
-        print("[✅] Successfully initialized Gemini-1.5-Flash.")
-        return llm
-    except Exception as e:
-        # Fallback choice: Local Ollama model
-        print(f"[⚠️ Gemini initialization failed: {str(e)}]")
-        print("[🔄] Switching to Ollama with 'mistral' model.")
-        return ChatOllama(model="mistral", temperature=0.7)
+
+    @property
+    def client(self):
+        """The chat model, created on first use and reused afterwards."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.factory()
+                    log.info("[✅] Initialized LLM provider '%s'.", self.name)
+        return self._client
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def slow(self) -> bool:
+        return self.latency is not None and self.latency > self.slow_seconds
+
+    def acquire(self, timeout: float) -> bool:
+        """Takes a rate-limit token and a concurrency slot, waiting at most `timeout`."""
+        deadline = time.monotonic() + timeout
+        if self.bucket is not None and not self.bucket.acquire(timeout=timeout):
+            return False
+        if self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            return True
+        # No call was made, so it must not count against the rate.
+        if self.bucket is not None:
+            self.bucket.refund()
+        return False
+
+    def release(self):
+        self._slots.release()
+
+    def record(self, seconds: float = None, error: Exception = None):
+        with self._lock:
+            self.calls += 1
+            if error is not None:
+                self.failures += 1
+                self.cooldown_until = time.monotonic() + self.cooldown
+                return
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+    def stats(self) -> dict:
+        return {
+            "initialized": self._client is not None,
+            "healthy": self.healthy(),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "calls": self.calls,
+            "failures": self.failures,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+def _prompt_key(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+def _content(message) -> str:
+    return getattr(message, "content", message)
+
+
+class LLMService:
+    """
+    Answers prompts through a list of providers, with caching and failover.
+
+    Identical prompts (ignoring whitespace) are served from LLM_CACHE, and
+    concurrent identical prompts share one call. Providers are tried in
+    order, except that ones with recent errors or timeouts, and then ones
+    that have been slow, are moved to the back.
+    """
+
+    def __init__(self, providers: list[Provider], cache=LLM_CACHE, timeout: float = 60):
+        if not providers:
+            raise ValueError("LLMService needs at least one provider")
+        self.providers = providers
+        self.cache = cache
+        self.timeout = timeout
+        self._flight = SingleFlight("llm")
+        self._pool = ThreadPoolExecutor(
+            max_workers=sum(p.max_concurrency for p in providers), thread_name_prefix="llm")
+
+    def ranked_providers(self) -> list[Provider]:
+        """Healthy providers first, then fast ones, then configured order."""
+        order = {id(p): i for i, p in enumerate(self.providers)}
+        return sorted(self.providers, key=lambda p: (not p.healthy(), p.slow(), order[id(p)]))
+
+    def _call(self, provider: Provider, fn, *args):
+        """Runs `fn(provider, *args)` within the provider's limits and the call timeout."""
+        if not provider.acquire(self.timeout):
+            raise TimeoutError(f"{provider.name} is at its rate or concurrency limit")
+        start = time.perf_counter()
+        future = self._pool.submit(fn, provider, *args)
+        # A timed-out call keeps its slot until it really finishes.
+        future.add_done_callback(lambda _: provider.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            error = TimeoutError(f"{provider.name} did not answer within {self.timeout}s")
+            provider.record(error=error)
+            raise error from None
+        except Exception as e:
+            provider.record(error=e)
+            raise
+        provider.record(time.perf_counter() - start)
+        return result
+
+    def _with_failover(self, fn, *args):
+        errors = []
+        for provider in self.ranked_providers():
+            try:
+                return self._call(provider, fn, *args)
+            except Exception as e:
+                log.warning("[⚠️] LLM provider '%s' failed: %s", provider.name, e)
+                errors.append(f"{provider.name}: {e}")
+        raise ProviderUnavailable("; ".join(errors))
+
+    def _invoke_uncached(self, key: str, prompt: str) -> str:
+        text = _content(self._with_failover(lambda provider, p: provider.client.invoke(p), prompt))
+        self.cache.set(key, text)
+        return text
+
+    def invoke(self, prompt: str) -> str:
+        """
+        Returns the model's answer to a prompt.
+
+        Raises:
+            ProviderUnavailable: If every provider failed or timed out.
+        """
+        key = _prompt_key(prompt)
+        text = self.cache.get(key)
+        if text is not None:
+            return text
+        return self._flight.do(key, self._invoke_uncached, key, prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        """Async version of `invoke`; the call itself runs on the service's threads."""
+        return await asyncio.to_thread(self.invoke, prompt)
+
+    def batch(self, prompts: list[str]) -> list[str]:
+        """
+        Answers many prompts, sending the uncached ones to a provider together.
+
+        Chat models that implement `batch` get all uncached prompts in one
+        call; if that fails, prompts fall back to individual `invoke`s.
+        """
+        keys = [_prompt_key(p) for p in prompts]
+        answers = {key: self.cache.get(key) for key in keys}
+        todo = {key: prompt for key, prompt in zip(keys, prompts) if answers[key] is None}
+
+        if todo:
+            try:
+                results = self._with_failover(
+                    lambda provider, ps: provider.client.batch(
+                        ps, config={"max_concurrency": provider.max_concurrency}),
+                    list(todo.values()))
+                for key, message in zip(todo, results):
+                    answers[key] = _content(message)
+                    self.cache.set(key, answers[key])
+            except ProviderUnavailable:
+                for key, prompt in todo.items():
+                    answers[key] = self.invoke(prompt)
+        return [answers[key] for key in keys]
+
+    def get_client(self):
+        """The chat model of the preferred provider that can be initialized."""
+        for provider in self.ranked_providers():
+            try:
+                return provider.client
+            except Exception as e:
+                log.warning("[⚠️] LLM provider '%s' initialization failed: %s", provider.name, e)
+                provider.record(error=e)
+        raise ProviderUnavailable("No LLM provider could be initialized.")
+
+    def stats(self) -> dict:
+        return {
+            "providers": {p.name: p.stats() for p in self.providers},
+            "cache": self.cache.stats(),
+            "coalesced": self._flight.stats(),
+        }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_llm_service() -> LLMService:
+    """Returns the process-wide LLMService for LLM_PROVIDERS, built on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                names = [n.strip() for n in _setting("LLM_PROVIDERS", "gemini,ollama").split(",") if n.strip()]
+                _service = LLMService([Provider.from_env(name) for name in names],
+                                      timeout=float(_setting("LLM_TIMEOUT", "60")))
+    return _service
+
+
+def get_llm():
+    """
+    Returns the language model.
+
+    Tries the configured providers in order (Gemini, then a local Ollama
+    model by default). The client is created once and shared; use
+    `get_llm_service()` for cached, rate-limited calls with failover.
+    """
+    return get_llm_service().get_client()
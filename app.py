@@ -1,16 +1,70 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import asyncio
+from contextlib import asynccontextmanager
 import uuid
-import shutil
+import json
 import os
-import tempfile
+import time
 
 import requests
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.formparsers import MultiPartParser
 
-from tools.agent_tool import find_anuschka_bag_for_style
+from tools.agent_tool import afind_bag_for_style, afind_bags_for_styles, astream_bags_for_style
+from tools.cache import cache_stats
+from tools.precompute import precompute_stats, start_refresher
+from tools.telemetry import Histogram, render_metrics
+from tools.upstream import UpstreamUnavailable, request as upstream_request, upstream_stats
+from tools.warmup import warm_up
 
-app = FastAPI(title="Persona Matcher AI Backend", version="1.0.0")
+# Maximum number of inputs (texts + images) accepted by /recommend/batch.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "50"))
+# Largest image accepted by the image endpoints, in bytes.
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Largest /recommend/batch request body, in bytes. Its images are analyzed
+# concurrently, so all of them are in memory at once.
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(32 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Leading bytes of the image formats the analyzer decodes (WebP is checked separately).
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a", b"BM")
+# Request body limits by path (multipart framing gets some slack) and the
+# 413 message for each. They are checked against Content-Length up front and
+# against the bytes received while the body streams in, so chunked uploads
+# are held to them too.
+UPLOAD_LIMITS = {
+    "/recommend/image": (MAX_IMAGE_BYTES + UPLOAD_CHUNK_SIZE, f"Upload exceeds {MAX_IMAGE_BYTES} bytes."),
+    "/recommend/image/raw": (MAX_IMAGE_BYTES, f"Upload exceeds {MAX_IMAGE_BYTES} bytes."),
+    "/recommend/batch": (MAX_BATCH_BYTES, f"Batch exceeds {MAX_BATCH_BYTES} bytes in total."),
+}
+
+# Starlette spills multipart files above 1 MB to a temporary file on disk;
+# keep every image we would accept in memory instead. UPLOAD_LIMITS bounds
+# what that can cost: one image per /recommend/image request, and
+# MAX_BATCH_BYTES for a whole batch.
+MultiPartParser.spool_max_size = max(MultiPartParser.spool_max_size, MAX_IMAGE_BYTES)
+
+REQUEST_SECONDS = Histogram(
+    "persona_http_request_duration_seconds", "Time to the response headers, by route.",
+    ["method", "route", "status"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Under gunicorn (preload_app) the master has already done the fork-safe
+    # steps, so this only loads what each worker needs for itself (the
+    # embedding model); under plain uvicorn it moves all the work off the
+    # first request.
+    await asyncio.to_thread(warm_up)
+    # Per worker, after the fork; only one worker at a time rebuilds the table.
+    start_refresher()
+    yield
+
+
+app = FastAPI(title="Persona Matcher AI Backend", version="1.0.0", lifespan=lifespan)
 
 # Allow local Vite dev server and any origin during development
 app.add_middleware(
@@ -22,6 +76,80 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_latency(request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, keeps the label set small.
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                route=route, status=status)
+
+
+class UploadLimitMiddleware:
+    """Rejects request bodies larger than their route's UPLOAD_LIMITS entry with 413.
+
+    A plain ASGI middleware rather than an `@app.middleware("http")` function,
+    since it has to count the body as the app receives it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = UPLOAD_LIMITS.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        max_bytes, detail = limit
+        rejection = JSONResponse({"detail": detail}, status_code=413)
+        length = Headers(scope=scope).get("content-length")
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            await rejection(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def receive_limited():
+            nonlocal received, too_large
+            if too_large:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Past the limit the app sees a client that went away,
+                    # so it stops reading; the 413 is sent from here instead.
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_unless_rejected(message):
+            nonlocal response_started
+            if too_large and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_limited, send_unless_rejected)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large and not response_started:
+            await rejection(scope, receive, send)
+
+
+app.add_middleware(UploadLimitMiddleware)
+
+
 class TextRequest(BaseModel):
     input_text: str
 
@@ -31,14 +159,47 @@ async def root():
     return {"message": "Persona Matcher AI Backend is running"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Return latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Return hit/miss counters and sizes of the search caches."""
+    return cache_stats()
+
+
+@app.get("/precompute/stats")
+async def get_precompute_stats():
+    """Return size, staleness and hit rate of the precomputed recommendation table."""
+    return precompute_stats()
+
+
+@app.get("/upstream/status")
+async def get_upstream_status():
+    """Return the rate limit and circuit breaker state of every upstream host."""
+    return upstream_stats()
+
+
+def _get_root(url: str):
+    with upstream_request(url, timeout=10) as call:
+        response = requests.get(url, timeout=10)
+        call.response(response.status_code)
+    return response
+
+
 # New endpoint to fetch data from http://0.0.0.0:8000/
 @app.get("/fetch-root")
 async def fetch_root():
     """Fetch data from the root endpoint of this API."""
     try:
-        response = requests.get("http://0.0.0.0:8000/")
+        response = await run_in_threadpool(_get_root, "http://0.0.0.0:8000/")
         response.raise_for_status()
         return response.json()
+    except UpstreamUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
@@ -47,33 +208,141 @@ async def fetch_root():
 async def recommend_from_text(payload: TextRequest):
     """Return bag recommendations given a natural-language style description."""
     try:
-        products = find_anuschka_bag_for_style.invoke(payload.input_text)
+        products = await afind_bag_for_style(payload.input_text)
         return {"recommendations": products}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
+@app.post("/recommend/text/stream")
+async def stream_recommendations_from_text(payload: TextRequest):
+    """Stream bag recommendations as NDJSON, one product per line, as each is found.
+
+    A failure after streaming has started is reported as a final
+    `{"error": ...}` line, since the status code has already been sent.
+    """
+    async def ndjson():
+        try:
+            async for product in astream_bags_for_style(payload.input_text):
+                yield json.dumps(product) + "\n"
+        except Exception as exc:
+            yield json.dumps({"error": str(exc)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+def _looks_like_image(head: bytes) -> bool:
+    return head.startswith(IMAGE_SIGNATURES) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
+
+async def _upload_chunks(file: UploadFile):
+    if file.size is not None and file.size > MAX_IMAGE_BYTES:
+        raise HTTPException(
+            status_code=413, detail=f"{file.filename}: larger than {MAX_IMAGE_BYTES} bytes.")
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def _read_image(chunks, name: str) -> bytes:
+    """Collect an image from an async iterator of byte chunks.
+
+    Raises HTTPException(415) as soon as the first bytes are not a known
+    image format, and HTTPException(413) as soon as the data grows past
+    MAX_IMAGE_BYTES, without reading the rest.
+    """
+    parts = []
+    head = b""
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"{name}: larger than {MAX_IMAGE_BYTES} bytes.")
+        parts.append(chunk)
+        if len(head) < 12:
+            # Only these leading bytes are copied for the format check.
+            head += chunk[:12 - len(head)]
+            if len(head) == 12 and not _looks_like_image(head):
+                break
+    if not _looks_like_image(head):
+        raise HTTPException(status_code=415, detail=f"{name}: not a JPEG, PNG, GIF, BMP or WebP image.")
+    # Joining copies the chunks into one bytes object (a single chunk is
+    # returned as is); the decoder's BytesIO then shares it without copying.
+    return b"".join(parts)
+
+
+async def _describe_image(data: bytes, name: str) -> str:
+    """Analyze an image in memory and describe its style as text.
+
+    Raises HTTPException(400) when the data is not a readable image.
+    """
+    from tools.image_features import analyze_image_async, describe_features
+
+    try:
+        features = await analyze_image_async(data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"{name}: {exc}") from exc
+    return describe_features(features)
+
+
+async def _describe_upload(file: UploadFile) -> str:
+    return await _describe_image(await _read_image(_upload_chunks(file), file.filename), file.filename)
+
+
+async def _recommend_for_image(style_description: str):
+    try:
+        products = await afind_bag_for_style(style_description)
+        return {"recommendations": products, "detected_style": style_description}
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
 @app.post("/recommend/image")
 async def recommend_from_image(file: UploadFile = File(...)):
     """Return bag recommendations based on an uploaded image.
 
-    NOTE: The current implementation simply forwards the temporary file path
-    to the existing recommendation tool, which primarily expects a text
-    description. You can later swap this out for a vision-enabled model.
+    The image is decoded in memory and its dominant colors and pattern
+    density are turned into a style description, which then goes through the
+    same recommendation pipeline as text input. Uploads that are not images
+    are rejected with 415, ones over MAX_IMAGE_BYTES with 413.
     """
-    # Save the uploaded image to a temporary file
-    try:
-        suffix = os.path.splitext(file.filename)[1] or ".jpg"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
+    return await _recommend_for_image(await _describe_upload(file))
 
-        products = find_anuschka_bag_for_style.invoke(tmp_path)
-        return {"recommendations": products}
+
+@app.post("/recommend/image/raw")
+async def recommend_from_raw_image(request: Request):
+    """Like /recommend/image, but the request body is the image itself.
+
+    The body is checked and collected as it arrives, with no multipart
+    parsing or spooling in between.
+    """
+    data = await _read_image(request.stream(), "body")
+    return await _recommend_for_image(await _describe_image(data, "body"))
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(input_texts: list[str] = Form(default=[]),
+                          files: list[UploadFile] = File(default=[])):
+    """Return bag recommendations for many text and/or image inputs at once.
+
+    Inputs that lead to the same search keywords share one search, and the
+    unique searches run concurrently. Results come back in input order,
+    texts first, then images.
+    """
+    if not input_texts and not files:
+        raise HTTPException(status_code=400, detail="No inputs provided.")
+    if len(input_texts) + len(files) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_SIZE} inputs per batch.")
+
+    # Images are analyzed concurrently, so they share feature batches.
+    image_styles = await asyncio.gather(*(_describe_upload(file) for file in files))
+    try:
+        results = await afind_bags_for_styles(list(input_texts) + list(image_styles))
+        inputs = [("text", text) for text in input_texts] + \
+            [("image", file.filename) for file in files]
+        return {"results": [
+            {"type": kind, "input": value, "recommendations": products}
+            for (kind, value), products in zip(inputs, results)
+        ]}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
-    finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
@@ -0,0 +1,72 @@
+# benchmarks/bench_cascade.py
+#
+# Latency of the fallback search cascade when the specific levels miss,
+# sequential versus speculative, against a local stub store.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_cascade
+
+import asyncio
+import contextlib
+import io
+import logging
+import time
+
+from benchmarks.stub_server import StubAnuschkaServer
+from tools import agent_tool, local_search_anuschka, search_providers
+from tools.cache import PAGE_CACHE, QUERY_CACHE, RECOMMENDATION_CACHE
+from tools.search_providers import DDGSProvider, HedgedSearch
+
+SEARCH_LATENCY = 0.3
+PAGE_LATENCY = 0.05
+KEYWORDS = ["hand painted", "artistic", "floral", "abstract"]
+
+
+def stub_ddgs(server, calls):
+    def ddgs_text(site_query, max_results=15):
+        calls.append(site_query)
+        time.sleep(SEARCH_LATENCY)
+        query = site_query.split(" ", 1)[1] if " " in site_query else ""
+        # Only the one-keyword (tertiary) and broad searches find anything.
+        if len(query.split()) > 2:
+            return []
+        return server.search_results(10)
+    return ddgs_text
+
+
+def run(mode: str, use_async: bool, calls: list) -> float:
+    agent_tool.CASCADE_MODE = mode
+    for cache in (PAGE_CACHE, QUERY_CACHE, RECOMMENDATION_CACHE):
+        cache.clear()
+    calls.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if use_async:
+            products = asyncio.run(agent_tool.afind_bag_for_keywords(KEYWORDS))
+        else:
+            products = agent_tool.find_bag_for_keywords(KEYWORDS)
+    elapsed = time.perf_counter() - start
+    assert products, "the cascade should find products"
+    return elapsed
+
+
+def main():
+    logging.getLogger("persona").setLevel(logging.ERROR)
+    with StubAnuschkaServer(latency=PAGE_LATENCY) as server:
+        local_search_anuschka.BASE_URL = server.base_url
+        local_search_anuschka.SEARCH_BACKEND = "live"
+        search_providers._scheduler = HedgedSearch([DDGSProvider()])
+        calls = []
+        local_search_anuschka._ddgs_text = stub_ddgs(server, calls)
+
+        print(f"DDGS {SEARCH_LATENCY * 1000:.0f} ms/search, pages {PAGE_LATENCY * 1000:.0f} ms; "
+              f"primary and secondary levels miss")
+        for use_async in (False, True):
+            for mode in ("sequential", "speculative"):
+                elapsed = run(mode, use_async, calls)
+                label = f"{'async' if use_async else 'sync'} {mode}"
+                print(f"  {label:<20} {elapsed * 1000:7.1f} ms   {len(calls)} DDGS searches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_extractors.py
+#
+# Pages/sec of each product page extractor over saved product HTML.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_extractors [page.html ...]
+
+import contextlib
+import glob
+import io
+import logging
+import os
+import sys
+import time
+
+from tools.extractors import HeadMetaExtractor, SoupExtractor, extract_streaming
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "*.html")
+URL = "https://anuschkaleather.com/products/sample"
+MIN_SECONDS = 1.0
+
+
+def pages_per_second(fn, html: bytes) -> float:
+    count = 0
+    start = time.perf_counter()
+    # The soup extractor prints progress; keep the output readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        while time.perf_counter() - start < MIN_SECONDS:
+            fn(html)
+            count += 1
+    return count / (time.perf_counter() - start)
+
+
+def streamed(html: bytes, chunk_size: int = 16384):
+    """The scraper's path: feed 16 KB chunks, stop once the head is enough."""
+    chunks = (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+    return extract_streaming(chunks, URL)[0]
+
+
+def main():
+    logging.getLogger("persona").setLevel(logging.ERROR)
+    paths = sys.argv[1:] or sorted(glob.glob(FIXTURES))
+    extractors = {
+        "soup": lambda html: SoupExtractor().extract(html, URL),
+        "head": lambda html: HeadMetaExtractor().extract(html, URL),
+        "streamed": streamed,
+    }
+    for path in paths:
+        with open(path, "rb") as f:
+            html = f.read()
+        print(f"{os.path.basename(path)} ({len(html) / 1024:.0f} KB)")
+        for name, fn in extractors.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                product = fn(html)
+            rate = pages_per_second(fn, html)
+            title = product['title'] if product else None
+            print(f"  {name:<9} {rate:9.1f} pages/s   title={title!r} price={product and product['price']!r}")
+
+
+if __name__ == "__main__":
+    main()
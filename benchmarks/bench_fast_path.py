@@ -0,0 +1,89 @@
+# benchmarks/bench_fast_path.py
+#
+# Cost of the <head>-only fast path against reading whole pages, over the
+# pooled session and the async client, against the local stub store.
+#
+# Three modes per client:
+#   full      FAST_EXTRACTION off: every page is read and parsed in full.
+#   drained   head-only parse, the rest of the page read unparsed so the
+#             connection is reused (the default).
+#   closed    head-only parse, the connection dropped with the page unread
+#             (SCRAPE_DRAIN_MAX_BYTES=0).
+#
+# The stub is local, so a new connection costs a TCP handshake but no TLS
+# and no network round trip; against the real store "closed" pays more per
+# page than shown here, and "drained" pays the transfer of the page tail.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_fast_path [--pages 200] [--padding-kb 200]
+
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks.fixture_store import SEED_PAGE
+from benchmarks.stub_server import StubAnuschkaServer
+from tools import local_search_anuschka
+
+MODES = {
+    "full": {"FAST_EXTRACTION": False, "DRAIN_MAX_BYTES": 512 * 1024},
+    "drained": {"FAST_EXTRACTION": True, "DRAIN_MAX_BYTES": 512 * 1024},
+    "closed": {"FAST_EXTRACTION": True, "DRAIN_MAX_BYTES": 0},
+}
+
+
+def _reset_clients():
+    local_search_anuschka._session = None
+    local_search_anuschka._async_clients.clear()
+
+
+def run_sync(urls: list[str]) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        assert local_search_anuschka._download_and_parse(url, time.monotonic() + 30)
+    return time.perf_counter() - start
+
+
+async def run_async(urls: list[str]) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        assert await local_search_anuschka._download_and_parse_async(url, time.monotonic() + 30)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200, help="page fetches per mode")
+    parser.add_argument("--padding-kb", type=int, default=200,
+                        help="extra body after </head>, to model a full-size store page")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub time to first byte, seconds")
+    args = parser.parse_args()
+
+    logging.getLogger("persona").setLevel(logging.WARNING)
+    with open(SEED_PAGE, "rb") as f:
+        html = f.read()
+    html = html.replace(b"</body>", b"<!--" + b"x" * (args.padding_kb * 1024) + b"--></body>")
+    pages = {f"/products/page-{i}": html for i in range(args.pages)}
+    saved = {name: getattr(local_search_anuschka, name) for name in MODES["full"]}
+    print(f"{args.pages} fetches of a {len(html) / 1024:.0f} KB page, {args.latency * 1000:.0f} ms latency")
+    try:
+        with StubAnuschkaServer(latency=args.latency, pages=pages) as server:
+            urls = [f"{server.base_url}{path}" for path in pages]
+            for client, runner in (("session", run_sync), ("async", lambda u: asyncio.run(run_async(u)))):
+                for mode, settings in MODES.items():
+                    for name, value in settings.items():
+                        setattr(local_search_anuschka, name, value)
+                    _reset_clients()
+                    before = server.connection_count
+                    elapsed = runner(urls)
+                    print(f"  {client:<8} {mode:<8} {len(urls) / elapsed:8.1f} pages/s "
+                          f"{server.connection_count - before:5d} connections")
+    finally:
+        for name, value in saved.items():
+            setattr(local_search_anuschka, name, value)
+        _reset_clients()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_hedging.py
+#
+# Tail latency of searches against a primary provider with a long tail and
+# occasional failures, with and without hedging to a backup provider.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_hedging
+
+import asyncio
+import contextlib
+import io
+import logging
+import statistics
+import time
+
+from benchmarks.stub_providers import StubProvider
+from tools.search_providers import HedgedSearch
+
+SEARCHES = 300
+
+
+def percentiles(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)] * 1000
+    return f"p50 {pick(50):7.1f} ms   p95 {pick(95):7.1f} ms   p99 {pick(99):7.1f} ms"
+
+
+async def run(search: HedgedSearch) -> list[float]:
+    async def one(i):
+        start = time.perf_counter()
+        products = await search.asearch(f"query {i}")
+        assert products, "every search should find products"
+        return time.perf_counter() - start
+
+    # Warm up the latency history so the hedge delay tracks the percentile.
+    for i in range(20):
+        await one(i)
+    return await asyncio.gather(*(one(i) for i in range(SEARCHES)))
+
+
+def primary():
+    # ~5% of calls take a second, ~3% fail outright.
+    return StubProvider("primary", latency=0.05, slow_latency=1.0, slow_rate=0.05, failure_rate=0.03)
+
+
+def backup():
+    return StubProvider("backup", latency=0.12, seed=1)
+
+
+def main():
+    logging.getLogger("persona").setLevel(logging.ERROR)
+    print(f"{SEARCHES} concurrent searches; primary 50 ms with a 5% 1 s tail and 3% failures, "
+          f"backup 120 ms")
+    with contextlib.redirect_stdout(io.StringIO()):
+        single = asyncio.run(run(HedgedSearch([StubProvider(
+            "primary", latency=0.05, slow_latency=1.0, slow_rate=0.05, failure_rate=0.0)])))
+        failover = HedgedSearch([primary(), backup()])
+        hedged_latencies = asyncio.run(run(failover))
+    print(f"  primary only (no failures)  {percentiles(single)}")
+    print(f"  primary + hedged backup     {percentiles(hedged_latencies)}")
+    stats = failover.stats()
+    backup_calls = stats["providers"]["backup"]["calls"]
+    print(f"  hedges sent: {stats['hedges']}, backup calls: {backup_calls} "
+          f"({backup_calls / (SEARCHES + 20):.0%} extra load), mean {statistics.mean(hedged_latencies) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_image_features.py
+#
+# Images/sec of the image feature pipeline: decoding versus the feature step,
+# and end to end one request at a time versus many concurrent requests.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_image_features [image ...]
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.image_features import analyze_batch, analyze_image, decode_thumbnail, describe_features
+
+DEFAULT_IMAGE = "pexels-see2believe-2450308.jpg"
+REQUESTS = 64
+CONCURRENCY = 16
+
+
+def timed(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    paths = sys.argv[1:] or [DEFAULT_IMAGE]
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    data = [images[i % len(images)] for i in range(REQUESTS)]
+
+    for path, image in zip(paths, images):
+        print(f"{path}: {describe_features(analyze_image(image))}")
+
+    thumbnails = [decode_thumbnail(image) for image in data]
+    decode_rate = timed(lambda: [decode_thumbnail(image) for image in data], REQUESTS)
+    single_rate = timed(lambda: [analyze_batch([t]) for t in thumbnails], REQUESTS)
+    batched_rate = timed(lambda: analyze_batch(thumbnails), REQUESTS)
+    print(f"decode:              {decode_rate:8.1f} images/s")
+    print(f"analyze one-by-one:  {single_rate:8.1f} images/s")
+    print(f"analyze batched:     {batched_rate:8.1f} images/s")
+
+    sequential = timed(lambda: [analyze_image(image) for image in data], REQUESTS)
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        concurrent = timed(lambda: list(pool.map(analyze_image, data)), REQUESTS)
+
+    print(f"end-to-end sequential:        {sequential:8.1f} images/s")
+    print(f"end-to-end {CONCURRENCY} concurrent:     {concurrent:8.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
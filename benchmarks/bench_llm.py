@@ -0,0 +1,81 @@
+# benchmarks/bench_llm.py
+#
+# Exercises the LLM call layer against local fake chat models: caching,
+# coalescing, batching, rate limits and failover, with no network access.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_llm
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from agent.llm_manager import LLMService, Provider
+from tools.cache import TTLCache
+
+LATENCY = 0.2
+
+
+class FakeChatModel(FakeListChatModel):
+    """FakeListChatModel batches sequentially; batch like a real client instead."""
+
+    def batch(self, inputs, config=None, **kwargs):
+        return BaseChatModel.batch(self, inputs, config, **kwargs)
+
+
+class FailingChatModel(FakeListChatModel):
+    """A provider that is down."""
+
+    def _call(self, *args, **kwargs):
+        raise ConnectionError("provider unavailable")
+
+
+def fake(latency: float = LATENCY, answer: str = "A structured leather tote."):
+    return lambda: FakeChatModel(responses=[answer], sleep=latency)
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:<44} {time.perf_counter() - start:7.3f}s")
+    return result
+
+
+def service(*providers, timeout: float = 5.0) -> LLMService:
+    return LLMService(list(providers), cache=TTLCache("llm-bench", maxsize=1024, ttl=60), timeout=timeout)
+
+
+def main():
+    prompts = [f"Describe a bag for persona {i}" for i in range(16)]
+
+    print(f"Fake provider, {LATENCY * 1000:.0f} ms per call, max 4 concurrent:")
+    llm = service(Provider("fake", fake(), max_concurrency=4))
+    timed("first call", lambda: llm.invoke(prompts[0]))
+    timed("same prompt again (cache)", lambda: llm.invoke(f"  {prompts[0]} "))
+    llm.cache.clear()
+    with ThreadPoolExecutor(16) as pool:
+        timed("16 identical concurrent prompts (coalesced)",
+              lambda: list(pool.map(llm.invoke, [prompts[1]] * 16)))
+        timed("16 distinct concurrent prompts", lambda: list(pool.map(llm.invoke, prompts[2:])))
+    llm.cache.clear()
+    timed("16 distinct prompts via batch()", lambda: llm.batch(prompts))
+
+    print("Rate limit of 5 calls/s, burst 1:")
+    llm = service(Provider("fake", fake(0.0), rate=5, burst=1))
+    timed("6 distinct prompts", lambda: [llm.invoke(p) for p in prompts[:6]])
+
+    print("Failover:")
+    llm = service(Provider("primary", lambda: FailingChatModel(responses=[""])), Provider("backup", fake()))
+    timed("primary down, served by backup", lambda: llm.invoke(prompts[0]))
+    print(f"  order after failure: {[p.name for p in llm.ranked_providers()]}")
+
+    llm = service(Provider("primary", fake(0.5)), Provider("backup", fake(0.05)), timeout=0.3)
+    timed("primary over the 0.3s timeout", lambda: llm.invoke(prompts[0]))
+    print(f"  order after timeout: {[p.name for p in llm.ranked_providers()]}")
+    print(f"  stats: {llm.stats()['providers']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_retrieval.py
+#
+# Compares queries/sec of the BM25 keyword index and the embedding index over
+# a synthetic catalog, single-threaded and under concurrent load.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_retrieval
+#
+# The semantic path needs sentence-transformers and downloads the model on
+# first run; it is skipped when the package is not installed.
+
+import itertools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.bag_recommender import recommend_style
+from tools.keyword_index import KeywordIndex
+
+STYLES = ["hand painted", "structured", "casual", "elegant", "classic", "practical", "bold"]
+KINDS = ["tote", "crossbody", "sling", "clutch", "satchel", "backpack", "wallet"]
+MOTIFS = ["floral", "garden", "abstract", "metallic", "denim blue", "earthy tan", "red poppy"]
+PERSONAS = [
+    "An artistic person who loves floral dresses and red accents",
+    "A professional who needs a bag for the office",
+    "Casual traveler in denim looking for a sling",
+    "Elegant evening party look with gold details",
+    "Minimalist in monochrome outfits who likes blue",
+]
+CONCURRENCY = 16
+QUERIES = 400
+
+
+def synthetic_products(count: int) -> list[dict]:
+    combos = list(itertools.product(STYLES, KINDS, MOTIFS))
+    random.Random(0).shuffle(combos)
+    products = []
+    for i in range(count):
+        style, kind, motif = combos[i % len(combos)]
+        products.append({
+            'url': f"https://example.test/products/{i}",
+            'title': f"{motif.title()} {kind.title()} {i}",
+            'description': f"A {style} leather {kind} with {motif} artwork.",
+        })
+    return products
+
+
+def measure(label: str, search, queries: list[str]):
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    sequential = len(queries) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        list(pool.map(search, queries))
+    concurrent = len(queries) / (time.perf_counter() - start)
+    print(f"  {label:<9} {sequential:10.0f} q/s sequential   "
+          f"{concurrent:10.0f} q/s with {CONCURRENCY} threads")
+
+
+def main():
+    products = synthetic_products(2000)
+    queries = [PERSONAS[i % len(PERSONAS)] for i in range(QUERIES)]
+    print(f"{len(products)} products, {len(queries)} queries")
+
+    index = KeywordIndex(products)
+
+    def keyword_search(text):
+        return index.search(recommend_style(text).keywords, top_k=5)
+
+    measure("keyword", keyword_search, queries)
+
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        print("  semantic  skipped (sentence-transformers not installed)")
+        return
+    from tools.semantic_index import SemanticIndex, encode, product_text
+
+    semantic = SemanticIndex(encode([product_text(p) for p in products]), products)
+    semantic.search(queries[0])  # load the model outside the timed runs
+    measure("semantic", semantic.search, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_rules.py
+#
+# Descriptions/sec of the compiled style rule engine as the rule set grows,
+# against scanning the same rules term by term.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_rules
+
+import json
+import random
+import re
+import time
+
+from tools.bag_recommender import STYLE_RULES_PATH, StyleRuleEngine
+
+DESCRIPTIONS = [
+    "An artistic person who loves floral dresses and preferred red accents.",
+    "Professional look for the office, navy blue blazer and a structured tote.",
+    "Casual weekend travel outfit with denim jacket and a small backpack.",
+    "Elegant evening party, gold jewelry and a tiny clutch.",
+    "A person wearing a solid monochrome outfit in brown tones.",
+]
+MIN_SECONDS = 1.0
+
+
+def synthetic_groups(base_groups: list[dict], extra_terms: int) -> list[dict]:
+    """The configured rules plus `extra_terms` made-up bag style terms."""
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    terms = {"".join(rng.choices(letters, k=rng.randint(5, 10))) for _ in range(extra_terms)}
+    extra = {"name": "synthetic", "match": "all",
+             "rules": [{"terms": [t], "keywords": [t]} for t in sorted(terms)]}
+    return base_groups + [extra]
+
+
+def naive_recommend(groups: list[dict]):
+    """Reference: one word-boundary regex per term, tried one after another."""
+    compiled = [(g, r, re.compile(rf"\b{re.escape(term)}(?:e?s)?\b"))
+                for g, group in enumerate(groups)
+                for r, rule in enumerate(group["rules"]) for term in rule["terms"]]
+
+    def recommend(text):
+        text = text.lower()
+        return [(g, r) for g, r, pattern in compiled if pattern.search(text)]
+    return recommend
+
+
+def rate(fn) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS:
+        for text in DESCRIPTIONS:
+            fn(text)
+        count += len(DESCRIPTIONS)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    with open(STYLE_RULES_PATH, encoding="utf-8") as f:
+        base_groups = json.load(f)["groups"]
+
+    print(f"{'terms':>8} {'compile':>10} {'compiled':>14} {'term by term':>16}")
+    for extra in (0, 1_000, 10_000):
+        groups = synthetic_groups(base_groups, extra)
+        start = time.perf_counter()
+        engine = StyleRuleEngine(groups)
+        compile_ms = (time.perf_counter() - start) * 1000
+        compiled = rate(engine.recommend)
+        naive = rate(naive_recommend(groups))
+        print(f"{len(engine):>8} {compile_ms:>8.1f}ms {compiled:>10.0f}/s {naive:>14.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_search_products.py
+#
+# Measures search_products latency against a local stub store, comparing
+# one-at-a-time fetching with the concurrent fetch engine.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_search_products
+
+import contextlib
+import io
+import logging
+import time
+
+from tools import local_search_anuschka
+from tools.cache import PAGE_CACHE, QUERY_CACHE
+from benchmarks.stub_server import StubAnuschkaServer
+
+RESULT_COUNT = 15
+MAX_RESULTS = 5
+LATENCY = 0.2
+ROUNDS = 3
+
+
+def _time_search(max_concurrency: int) -> float:
+    PAGE_CACHE.clear()
+    QUERY_CACHE.clear()
+    start = time.perf_counter()
+    # The scraper is chatty; keep the benchmark output readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        products = local_search_anuschka.search_products(
+            "floral", max_results=MAX_RESULTS, max_concurrency=max_concurrency)
+    elapsed = time.perf_counter() - start
+    assert len(products) == MAX_RESULTS, products
+    return elapsed
+
+
+def main():
+    logging.getLogger("persona").setLevel(logging.ERROR)
+    with StubAnuschkaServer(latency=LATENCY) as server:
+        local_search_anuschka.BASE_URL = server.base_url
+        local_search_anuschka._ddgs_text = lambda query, max_results=15: server.search_results(
+            RESULT_COUNT)
+
+        print(f"Stub latency {LATENCY * 1000:.0f} ms/page, {RESULT_COUNT} DDGS hits, "
+              f"max_results={MAX_RESULTS}")
+        for concurrency in (1, 5, 10):
+            timings = [_time_search(concurrency) for _ in range(ROUNDS)]
+            print(f"  concurrency={concurrency:<3} best {min(timings) * 1000:7.1f} ms   "
+                  f"mean {sum(timings) / len(timings) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
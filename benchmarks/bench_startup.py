@@ -0,0 +1,86 @@
+# benchmarks/bench_startup.py
+#
+# Worker startup cost: how long `import app` takes in a fresh interpreter,
+# and how long a fresh uvicorn process takes to answer its first request
+# (including the warm-up in the app's lifespan).
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_startup [--max-import-seconds S] [--max-first-response-seconds S]
+#
+# Exits with status 1 when a limit is exceeded, so CI can gate on it.
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def import_seconds(runs: int) -> float:
+    """Median wall time of `import app` over fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET],
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_response_seconds(timeout: float = 60.0) -> float:
+    """Seconds from starting a uvicorn process until GET / succeeds."""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=dict(os.environ))
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/", timeout=1).ok:
+                    return time.perf_counter() - start
+            except requests.ConnectionError:
+                time.sleep(0.02)
+        raise TimeoutError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app import time and time to first response.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float)
+    parser.add_argument("--max-first-response-seconds", type=float)
+    args = parser.parse_args(argv)
+
+    imported = import_seconds(args.runs)
+    responded = statistics.median(first_response_seconds() for _ in range(args.runs))
+    print(f"import app:           {imported:6.3f}s (median of {args.runs})")
+    print(f"first response:       {responded:6.3f}s (median of {args.runs})")
+
+    failed = False
+    if args.max_import_seconds is not None and imported > args.max_import_seconds:
+        print(f"❌ import took longer than {args.max_import_seconds}s")
+        failed = True
+    if args.max_first_response_seconds is not None and responded > args.max_first_response_seconds:
+        print(f"❌ first response took longer than {args.max_first_response_seconds}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
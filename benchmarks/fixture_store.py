@@ -0,0 +1,201 @@
+# benchmarks/fixture_store.py
+#
+# Recorded upstream responses (DuckDuckGo results and product page HTML) for
+# running the search pipeline offline and reproducibly.
+#
+# Record real responses once, from a machine with network access:
+#     python -m benchmarks.fixture_store record "floral crossbody" "leather tote"
+#
+# Replay them in a benchmark:
+#     with replay(FixtureStore.load_or_seed()) as server:
+#         find_anuschka_bag_for_style.invoke("An artistic person ...")
+#
+# Without a recorded store, `load_or_seed` builds one from the saved product
+# page in benchmarks/fixtures/, so the harness always runs.
+
+import argparse
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from benchmarks.stub_server import StubAnuschkaServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+RECORDED_DIR = os.path.join(FIXTURES_DIR, "recorded")
+SEED_PAGE = os.path.join(FIXTURES_DIR, "product_page.html")
+SEED_TITLE = b"Medium Tote - Peacock Garden"
+SEED_QUERIES = ["hand painted floral", "artistic", "structured leather tote", "crossbody", "leather bag"]
+
+
+def _query_key(site_query: str) -> str:
+    """The query without its `site:` prefix, so recordings do not depend on BASE_URL."""
+    words = [w for w in site_query.split() if not w.startswith("site:")]
+    return " ".join(words).lower()
+
+
+class FixtureStore:
+    """
+    DuckDuckGo results by query and product page HTML by URL path.
+
+    On disk:
+        <directory>/searches.json   {query: [DDGS result dicts]}
+        <directory>/pages.json      {url path: file name}
+        <directory>/pages/*.html
+    """
+
+    def __init__(self, directory: str = RECORDED_DIR):
+        self.directory = directory
+        self.searches = {}
+        self.pages = {}
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def load(cls, directory: str = RECORDED_DIR):
+        store = cls(directory)
+        with open(os.path.join(directory, "searches.json"), encoding="utf-8") as f:
+            store.searches = json.load(f)
+        with open(os.path.join(directory, "pages.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        for path, name in index.items():
+            with open(os.path.join(directory, "pages", name), "rb") as f:
+                store.pages[path] = f.read()
+        return store
+
+    @classmethod
+    def seeded(cls, page_count: int = 12):
+        """An in-memory store of `page_count` copies of the saved product page."""
+        with open(SEED_PAGE, "rb") as f:
+            html = f.read()
+        store = cls(directory=None)
+        results = []
+        for i in range(page_count):
+            title = f"Hand Painted Floral Tote {i}"
+            path = f"/products/hand-painted-floral-tote-{i}"
+            store.pages[path] = html.replace(SEED_TITLE, title.encode())
+            results.append({"title": title, "href": f"https://anuschkaleather.com{path}",
+                            "body": "Hand painted leather tote with a floral garden motif."})
+        store.searches = {query: results for query in SEED_QUERIES}
+        return store
+
+    @classmethod
+    def load_or_seed(cls, directory: str = RECORDED_DIR):
+        if os.path.exists(os.path.join(directory, "searches.json")):
+            return cls.load(directory)
+        return cls.seeded()
+
+    def save(self):
+        os.makedirs(os.path.join(self.directory, "pages"), exist_ok=True)
+        index = {}
+        for path, html in self.pages.items():
+            name = hashlib.sha1(path.encode()).hexdigest()[:16] + ".html"
+            with open(os.path.join(self.directory, "pages", name), "wb") as f:
+                f.write(html)
+            index[path] = name
+        with open(os.path.join(self.directory, "pages.json"), "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        with open(os.path.join(self.directory, "searches.json"), "w", encoding="utf-8") as f:
+            json.dump(self.searches, f, indent=1, sort_keys=True)
+
+    def add_search(self, site_query: str, results: list[dict]):
+        self.searches[_query_key(site_query)] = results
+
+    def add_page(self, url: str, html: bytes):
+        self.pages[urlparse(url).path] = html
+
+    def search_results(self, site_query: str, base_url: str, max_results: int = 15) -> list[dict]:
+        """
+        The recorded results for a query, with links rewritten to `base_url`.
+
+        Queries that were never recorded get every recorded result whose page
+        is available, so the cascade still finds products at some level.
+        """
+        results = self.searches.get(_query_key(site_query))
+        if results is None:
+            seen = {}
+            for recorded in self.searches.values():
+                for result in recorded:
+                    seen.setdefault(result["href"], result)
+            results = list(seen.values())
+        replayed = []
+        for result in results:
+            path = urlparse(result["href"]).path
+            if path in self.pages:
+                replayed.append(dict(result, href=f"{base_url}{path}"))
+        return replayed[:max_results]
+
+
+@contextmanager
+def replay(store: FixtureStore, latency: float = 0.05):
+    """
+    Serves `store` from a local stub server and points the scraper at it.
+
+    DuckDuckGo is replaced by the recorded results, the search scheduler only
+    uses the DDGS provider (the path that was recorded), and the module
+    settings are restored afterwards.
+    """
+    from tools import local_search_anuschka, search_providers
+
+    saved = (local_search_anuschka.BASE_URL, local_search_anuschka.SEARCH_BACKEND,
+             local_search_anuschka._ddgs_text, search_providers._scheduler)
+    with StubAnuschkaServer(latency=latency, pages=store.pages) as server:
+        local_search_anuschka.BASE_URL = server.base_url
+        local_search_anuschka.SEARCH_BACKEND = "live"
+        local_search_anuschka._ddgs_text = (
+            lambda site_query, max_results=15: store.search_results(site_query, server.base_url, max_results))
+        search_providers._scheduler = search_providers.HedgedSearch([search_providers.DDGSProvider()])
+        try:
+            yield server
+        finally:
+            (local_search_anuschka.BASE_URL, local_search_anuschka.SEARCH_BACKEND,
+             local_search_anuschka._ddgs_text, search_providers._scheduler) = saved
+
+
+def record(queries: list[str], directory: str = RECORDED_DIR, max_results: int = 15) -> FixtureStore:
+    """Runs real DuckDuckGo searches and downloads every product page they link to."""
+    from tools import local_search_anuschka
+
+    store = FixtureStore.load(directory) if os.path.exists(
+        os.path.join(directory, "searches.json")) else FixtureStore(directory)
+    session = local_search_anuschka.get_session()
+    for query in queries:
+        site_query = f"site:{local_search_anuschka.BASE_URL} {query}"
+        results = local_search_anuschka._ddgs_text(site_query, max_results=max_results)
+        store.add_search(site_query, results)
+        urls = local_search_anuschka._product_urls(results)
+        print(f"[🎞️] '{query}': {len(results)} results, {len(urls)} product pages")
+        for url in urls:
+            if urlparse(url).path in store.pages:
+                continue
+            response = session.get(url, timeout=local_search_anuschka.REQUEST_TIMEOUT)
+            if response.ok:
+                store.add_page(url, response.content)
+    store.save()
+    print(f"[🎞️] {len(store.searches)} searches and {len(store)} pages in {directory}")
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record upstream responses for offline benchmarks.")
+    parser.add_argument("--dir", default=RECORDED_DIR, help="fixture directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_cmd = commands.add_parser("record", help="record DDGS results and product pages")
+    record_cmd.add_argument("queries", nargs="+")
+    record_cmd.add_argument("--max-results", type=int, default=15)
+    commands.add_parser("show", help="list what the store contains")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.queries, args.dir, args.max_results)
+    else:
+        store = FixtureStore.load_or_seed(args.dir)
+        for query, results in sorted(store.searches.items()):
+            print(f"{query!r}: {len(results)} results")
+        print(f"{len(store)} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# benchmarks/harness.py
+#
+# One offline benchmark run that can be compared across commits: micro
+# benchmarks of the CPU-bound steps plus end-to-end latency and throughput
+# of the tool and the FastAPI endpoints, against replayed upstream responses
+# (see benchmarks/fixture_store.py). No network access is needed.
+#
+# Run from the repository root:
+#     python -m benchmarks.harness [--concurrency 8] [--requests 48] [--only micro]
+#     python -m benchmarks.harness --output before.json
+#     python -m benchmarks.harness --compare before.json [--tolerance 0.15]
+#
+# Results are written as JSON (default benchmarks/results/<commit>.json).
+# Metrics ending in `_per_s` are better when higher, ones ending in `_ms`
+# better when lower; `--compare` exits with status 1 if any of them got
+# worse by more than the tolerance.
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_extractors import URL as PAGE_URL, streamed
+from benchmarks.bench_retrieval import PERSONAS, synthetic_products
+from benchmarks.fixture_store import RECORDED_DIR, FixtureStore, replay
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+MIN_SECONDS = 0.5
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, group: str):
+    """Registers `fn(config) -> dict of metrics` under `name`."""
+    def register(fn):
+        BENCHMARKS[name] = (group, fn)
+        return fn
+    return register
+
+
+def rate(fn, min_seconds: float = MIN_SECONDS) -> float:
+    """Calls per second of `fn()` over at least `min_seconds`."""
+    fn()  # warm-up
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def latency_metrics(latencies: list[float], elapsed: float) -> dict:
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return round(ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)] * 1000, 2)
+
+    return {
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+    }
+
+
+# --- micro benchmarks -------------------------------------------------------
+
+@benchmark("rules.recommend_style", "micro")
+def bench_recommend_style(config):
+    from tools.bag_recommender import get_style_recommendation
+
+    personas = itertools.cycle(PERSONAS)
+    return {"calls_per_s": round(rate(lambda: get_style_recommendation(next(personas))), 1)}
+
+
+@benchmark("extract.page", "micro")
+def bench_extract(config):
+    from tools.extractors import HeadMetaExtractor, SoupExtractor
+
+    html = next(iter(config["store"].pages.values()))
+    return {
+        "head_pages_per_s": round(rate(lambda: HeadMetaExtractor().extract(html, PAGE_URL)), 1),
+        "soup_pages_per_s": round(rate(lambda: SoupExtractor().extract(html, PAGE_URL)), 1),
+        "streamed_pages_per_s": round(rate(lambda: streamed(html)), 1),
+    }
+
+
+@benchmark("keywords.filter", "micro")
+def bench_keyword_filter(config):
+    from tools.agent_tool import _rank_broad_results
+    from tools.bag_recommender import recommend_style
+    from tools.keyword_index import KeywordIndex
+
+    products = synthetic_products(2000)
+    keywords = [recommend_style(p).keywords for p in PERSONAS]
+    index = KeywordIndex(products)
+    queries = itertools.cycle(keywords)
+    broad = products[:50]
+    return {
+        "index_builds_per_s": round(rate(lambda: KeywordIndex(products)), 2),
+        "searches_per_s": round(rate(lambda: index.search(next(queries), top_k=5)), 1),
+        "broad_rankings_per_s": round(rate(lambda: _rank_broad_results(broad, next(queries))), 1),
+    }
+
+
+# --- end-to-end benchmarks ----------------------------------------------------
+
+def _requests(config) -> list[str]:
+    return [f"{PERSONAS[i % len(PERSONAS)]} #{i}" for i in range(config["requests"])]
+
+
+@benchmark("e2e.tool", "e2e")
+def bench_tool(config):
+    from tools.agent_tool import find_bag_for_style
+
+    def one(text):
+        start = time.perf_counter()
+        assert find_bag_for_style(text), f"no products for {text!r}"
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(config["concurrency"]) as pool:
+        latencies = list(pool.map(one, _requests(config)))
+    return latency_metrics(latencies, time.perf_counter() - start)
+
+
+async def _load_endpoint(path: str, config) -> dict:
+    import httpx
+
+    import app as app_module
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    semaphore = asyncio.Semaphore(config["concurrency"])
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(text):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json={"input_text": text})
+                response.raise_for_status()
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(text) for text in _requests(config)))
+        return latency_metrics(latencies, time.perf_counter() - start)
+
+
+@benchmark("e2e.api.text", "e2e")
+def bench_api_text(config):
+    return asyncio.run(_load_endpoint("/recommend/text", config))
+
+
+@benchmark("e2e.api.text_stream", "e2e")
+def bench_api_stream(config):
+    return asyncio.run(_load_endpoint("/recommend/text/stream", config))
+
+
+# --- running and comparing ----------------------------------------------------
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(config: dict, only: list[str] = None) -> dict:
+    """Runs the selected benchmarks and returns their metrics by name."""
+    from tools import cache
+
+    selected = [name for name, (group, _) in BENCHMARKS.items()
+                if not only or group in only or name in only]
+    results = {}
+    sizes = {tier: tier.maxsize for tier in (cache.PAGE_CACHE, cache.QUERY_CACHE, cache.RECOMMENDATION_CACHE)}
+    with replay(config["store"], latency=config["latency"]):
+        # Measure the pipeline, not the caches in front of it.
+        for tier in sizes:
+            tier.clear()
+            tier.maxsize = 0
+        try:
+            for name in selected:
+                print(f"  {name} ...", file=sys.stderr)
+                results[name] = BENCHMARKS[name][1](config)
+        finally:
+            for tier, maxsize in sizes.items():
+                tier.maxsize = maxsize
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Prints metric changes and returns the regressions beyond `tolerance`."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            before = baseline["results"].get(name, {}).get(metric)
+            if not before:
+                continue
+            change = value / before - 1
+            worse = -change if metric.endswith("_per_s") else change
+            flag = ""
+            if worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"  {name + '.' + metric:<45} {before:>11.2f} -> {value:>11.2f}  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=48, help="requests per end-to-end benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="replayed upstream latency, seconds")
+    parser.add_argument("--fixtures", default=RECORDED_DIR, help="recorded fixture directory")
+    parser.add_argument("--only", nargs="*", help="benchmark names or groups (micro, e2e)")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    # Keep the per-request log lines out of the measurements and the report.
+    logging.getLogger("persona").setLevel(logging.WARNING)
+    store = FixtureStore.load_or_seed(args.fixtures)
+    config = {"store": store, "concurrency": args.concurrency,
+              "requests": args.requests, "latency": args.latency}
+    commit = _git_commit()
+    print(f"Benchmarking {commit}: {len(store)} replayed pages, concurrency {args.concurrency}",
+          file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "fixtures": "recorded" if store.directory else "seeded",
+            "config": {k: v for k, v in config.items() if k != "store"},
+        },
+        "results": run(config, args.only),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {baseline['meta']['commit']} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/load_test.py
+#
+# Load-tests /recommend/text in-process against the local stub store, and
+# compares the async pipeline with the old blocking call on the event loop.
+# Both run on one event loop, the same as one uvicorn worker.
+#
+# Run from the repository root:
+#     python -m benchmarks.load_test [--requests 40] [--concurrency 20]
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import time
+
+import httpx
+
+import app as app_module
+from tools import cache, local_search_anuschka
+from tools.agent_tool import find_anuschka_bag_for_style
+from benchmarks.stub_server import StubAnuschkaServer
+
+
+@app_module.app.post("/_bench/recommend/text-blocking", include_in_schema=False)
+async def recommend_blocking(payload: app_module.TextRequest):
+    """The pre-async endpoint: a synchronous tool call inside `async def`."""
+    return {"recommendations": find_anuschka_bag_for_style.invoke(payload.input_text)}
+
+
+async def run_load(path: str, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app_module.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            async with semaphore:
+                resp = await client.post(path, json={"input_text": f"artistic floral person {i}"})
+                resp.raise_for_status()
+                assert resp.json()["recommendations"], resp.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    # redirect_stdout only hides print(); the log goes through its own handler.
+    logging.getLogger("persona").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="stub store latency per page, seconds")
+    args = parser.parse_args()
+
+    with StubAnuschkaServer(latency=args.latency) as server:
+        local_search_anuschka.BASE_URL = server.base_url
+        local_search_anuschka.SEARCH_BACKEND = "live"
+        local_search_anuschka._ddgs_text = lambda query, max_results=15: server.search_results(8)
+        # Measure the pipeline itself, not the caches in front of it.
+        for tier in (cache.PAGE_CACHE, cache.QUERY_CACHE, cache.RECOMMENDATION_CACHE):
+            tier.maxsize = 0
+
+        print(f"{args.requests} requests, {args.concurrency} concurrent, "
+              f"stub latency {args.latency * 1000:.0f} ms/page")
+        for label, path in (("blocking", "/_bench/recommend/text-blocking"),
+                            ("async", "/recommend/text")):
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = asyncio.run(run_load(path, args.requests, args.concurrency))
+            print(f"  {label:<9} {elapsed:6.2f} s   {args.requests / elapsed:7.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/stub_providers.py
+#
+# Search providers with injected latency and failures, for exercising
+# HedgedSearch without any network access.
+
+import asyncio
+import random
+import threading
+import time
+
+from tools.search_providers import SearchProvider
+
+
+class StubProvider(SearchProvider):
+    """
+    Answers every query with the same products after a simulated delay.
+
+    A `slow_rate` share of calls takes `slow_latency` instead of `latency`
+    (a long tail), and a `failure_rate` share raises. Randomness is seeded,
+    so runs are repeatable.
+    """
+
+    def __init__(self, name: str, latency: float = 0.05, slow_latency: float = 1.0, slow_rate: float = 0.0,
+                 failure_rate: float = 0.0, products: list[dict] = None, seed: int = 0):
+        super().__init__()
+        self.name = name
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.failure_rate = failure_rate
+        self.products = products if products is not None else [
+            {"title": f"{name} bag {i}", "url": f"https://example.com/products/{name}-{i}"} for i in range(5)]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+            slow = self._rng.random() < self.slow_rate
+        return failed, self.slow_latency if slow else self.latency
+
+    def search(self, query, max_results, max_concurrency=None):
+        failed, delay = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"{self.name} is unavailable")
+        return self.products[:max_results]
+
+    async def asearch(self, query, max_results, max_concurrency=None):
+        failed, delay = self._draw()
+        await asyncio.sleep(delay)
+        if failed:
+            raise ConnectionError(f"{self.name} is unavailable")
+        return self.products[:max_results]
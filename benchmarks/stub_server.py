@@ -0,0 +1,177 @@
+# benchmarks/stub_server.py
+
+import json
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PRODUCT_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<title>{title} | Anuschka</title>
+<meta property="og:title" content="{title}">
+<meta property="og:image" content="{base}/cdn/{slug}.jpg">
+<meta property="og:description" content="{description}">
+<meta property="og:price:amount" content="159.00">
+<meta property="og:price:currency" content="USD">
+<script type="application/ld+json">{{"@type": "Product", "name": "{title}", "image": ["{base}/cdn/{slug}.jpg"]}}</script>
+</head>
+<body>
+<h1 class="product__title">{title}</h1>
+<div class="price__regular"><span class="price-item">$159.00</span></div>
+<div class="product__description">{description}</div>
+</body>
+</html>
+"""
+
+
+class StubAnuschkaServer:
+    """
+    A local stand-in for anuschkaleather.com that serves product pages.
+
+    Every request to `/products/<slug>` sleeps for `latency` seconds before
+    answering, so the effect of concurrent fetching can be measured offline.
+    Paths in `pages` are answered with that HTML instead of the template
+    (e.g. pages replayed from benchmarks/fixture_store.py).
+
+    While it runs, the stub's host and DuckDuckGo (which the benchmarks
+    replace as well) are not rate limited by tools/upstream.py, so results
+    measure the pipeline rather than the limits meant for the real site.
+
+    Usage:
+        with StubAnuschkaServer(latency=0.2) as server:
+            hits = server.search_results(10)
+    """
+
+    def __init__(self, latency: float = 0.2, description: str = "Hand painted floral leather crossbody bag.",
+                 product_count: int = 20, pages: dict = None):
+        self.latency = latency
+        self.pages = pages or {}
+        self.product_count = product_count
+        self.description = description
+        self.request_count = 0
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._saved_governors = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def search_results(self, count: int) -> list[dict]:
+        """Returns DDGS-shaped result dicts pointing at `count` stub products."""
+        return [
+            {'title': f"Stub Bag {i}", 'href': f"{self.base_url}/products/stub-bag-{i}"}
+            for i in range(count)
+        ]
+
+    def suggest(self, query: str, limit: int = 10) -> dict:
+        """Returns a Shopify `/search/suggest.json` response for the stub products."""
+        products = [
+            {"title": f"Stub Bag {i}", "handle": f"stub-bag-{i}",
+             "url": f"/products/stub-bag-{i}?_pos={i + 1}&_sid=stub&_ss=r",
+             "price": "159.00", "image": f"{self.base_url}/cdn/stub-bag-{i}.jpg",
+             "body": f"<p>{self.description}</p>"}
+            for i in range(min(limit, self.product_count))
+        ]
+        return {"resources": {"results": {"products": products}}}
+
+    def sitemap(self) -> str:
+        """Returns a flat sitemap listing every stub product page."""
+        entries = "".join(
+            f"<url><loc>{self.base_url}/products/stub-bag-{i}</loc></url>"
+            for i in range(self.product_count))
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>')
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connection_count += 1
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    pass  # the client dropped a kept-alive connection
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_count += 1
+                time.sleep(stub.latency)
+                if self.path.startswith("/search/suggest.json"):
+                    params = parse_qs(urlparse(self.path).query)
+                    body = stub.suggest(params.get("q", [""])[0],
+                                        int(params.get("resources[limit]", ["10"])[0]))
+                    self._send(json.dumps(body).encode(), "application/json")
+                    return
+                if self.path == "/sitemap.xml":
+                    self._send(stub.sitemap().encode(), "application/xml")
+                    return
+                if not self.path.startswith("/products/"):
+                    self.send_error(404)
+                    return
+                path = self.path.split("?")[0]
+                slug = path.split("/products/", 1)[1]
+                body = stub.pages.get(path) or PRODUCT_PAGE_TEMPLATE.format(
+                    title=slug.replace("-", " ").title(), slug=slug,
+                    base=stub.base_url, description=stub.description).encode()
+                etag = f'"{zlib.crc32(body):08x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send(body, "text/html; charset=utf-8", etag)
+
+            def _send(self, body, content_type, etag=None):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the scraper stops reading after <head>
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        from tools import upstream
+
+        for host in (upstream.DDGS_HOST, urlparse(self.base_url).netloc):
+            self._saved_governors[host] = upstream._governors.get(host)
+            upstream._governors[host] = upstream.HostGovernor(host, max_rate=1e6, min_rate=1e6, burst=1e6)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        from tools import upstream
+
+        self._server.shutdown()
+        self._server.server_close()
+        for host, governor in self._saved_governors.items():
+            if governor is None:
+                upstream._governors.pop(host, None)
+            else:
+                upstream._governors[host] = governor
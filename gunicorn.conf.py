@@ -0,0 +1,18 @@
+# gunicorn.conf.py
+#
+# Loads the app once in the master and warms it up before forking, so every
+# worker starts with the modules and indexes already in (shared) memory.
+# State that does not survive fork (the embedding model's torch thread pools)
+# is left for each worker's own warm-up (see tools/warmup.py).
+
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    from tools.warmup import warm_up
+
+    warm_up(fork_safe=True)
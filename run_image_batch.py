@@ -1,7 +1,11 @@
 # run_image_batch.py
 
+import argparse
 import os
-from tools.agent_tool import find_anuschka_bag_for_style
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.agent_tool import find_anuschka_bag_for_style, find_bags_for_styles
+from tools.image_features import describe_image_file
 from dotenv import load_dotenv
 
 
@@ -32,25 +36,77 @@ def display_results(image_path, products):
         print(products)
 
 
-def process_image_recommendations(image_paths: list[str]):
+def process_image_recommendations(image_paths: list[str], workers: int = 1):
     """
     Processes a list of image file paths and gets a bag recommendation for each.
+
+    With `workers` > 1 the images are processed as one batch: images that need
+    the same search share it, and the unique searches run in parallel.
     """
     if not image_paths:
         print("No image paths provided.")
         return
 
+    if workers > 1:
+        process_image_recommendations_parallel(image_paths, workers)
+        return
+
     for image_path in image_paths:
         if os.path.exists(image_path):
             print(f"\n🚀 Starting tool with image input: '{image_path}'")
-            # Here we invoke our powerful image-based tool for each image
+            style_description = _describe(image_path)
+            if style_description is None:
+                continue
+            print(f"[🖼️] Detected style: {style_description}")
             recommended_products = find_anuschka_bag_for_style.invoke(
-                image_path)
+                style_description)
             display_results(image_path, recommended_products)
         else:
             print(f"\n⚠️  Could not find image at '{image_path}'. Skipping.")
 
 
+def _describe(image_path: str):
+    """Returns the style description for an image, or None (after saying so) if it cannot be read."""
+    try:
+        return describe_image_file(image_path)
+    except (ValueError, OSError) as e:
+        print(f"\n⚠️  Could not read image at '{image_path}' ({e}). Skipping.")
+        return None
+
+
+def process_image_recommendations_parallel(image_paths: list[str], workers: int):
+    """
+    Runs the whole list through the batch pipeline, reporting progress as searches finish.
+
+    Images are decoded on `workers` threads, so their feature extraction is
+    batched; images that cannot be read are skipped.
+    """
+    existing = [path for path in image_paths if os.path.exists(path)]
+    for image_path in image_paths:
+        if image_path not in existing:
+            print(f"\n⚠️  Could not find image at '{image_path}'. Skipping.")
+    if not existing:
+        return
+
+    print(f"\n🚀 Processing {len(existing)} images with {workers} workers")
+    start = time.perf_counter()
+
+    def report(done, total):
+        print(f"[⏳] {done}/{total} searches finished "
+              f"({time.perf_counter() - start:.1f}s elapsed)")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        described = [(path, style) for path, style in zip(existing, pool.map(_describe, existing))
+                     if style is not None]
+    if not described:
+        return
+    results = find_bags_for_styles([style for _, style in described], max_workers=workers,
+                                   on_progress=report)
+    for (image_path, _), recommended_products in zip(described, results):
+        display_results(image_path, recommended_products)
+    print(f"\n✅ Processed {len(described)} images in {time.perf_counter() - start:.1f}s")
+
+
 if __name__ == "__main__":
     # Load API keys from .env file
     load_dotenv()
@@ -65,7 +121,13 @@ if __name__ == "__main__":
     #     "test_images/person_with_bold_colors.jpg",
     # ]
 
-    image_files_to_test = [
+    parser = argparse.ArgumentParser(description="Get bag recommendations for a batch of images.")
+    parser.add_argument("images", nargs="*", help="image paths (default: the list below)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="searches to run in parallel (1 = one image at a time)")
+    args = parser.parse_args()
+
+    image_files_to_test = args.images or [
         "pexels-see2believe-2450308.jpg"
     ]
 
@@ -74,4 +136,4 @@ if __name__ == "__main__":
         print("‼️ Please edit 'run_image_batch.py' and add your image paths to the 'image_files_to_test' list.")
         print("="*60)
     else:
-        process_image_recommendations(image_files_to_test)
+        process_image_recommendations(image_files_to_test, workers=args.workers)
@@ -0,0 +1,39 @@
+# tests/test_batching.py
+#
+# MicroBatcher grouping, ordering and its per-batch collection window.
+
+import time
+
+import pytest
+
+from tools.batching import MicroBatcher
+
+
+def test_results_come_back_to_their_callers():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], batch_size=4, max_wait=0.05)
+    futures = [batcher.submit(i) for i in range(10)]
+    assert [f.result(timeout=1) for f in futures] == [i * 2 for i in range(10)]
+    assert batcher.items == 10
+
+
+def test_collection_window_is_per_batch_not_per_item():
+    sizes = []
+    batcher = MicroBatcher(lambda items: sizes.append(len(items)) or items, batch_size=100, max_wait=0.05)
+    futures = []
+    # Items arriving every 20 ms would keep a per-item timeout waiting forever.
+    for i in range(10):
+        futures.append(batcher.submit(i))
+        time.sleep(0.02)
+    for f in futures:
+        f.result(timeout=1)
+    assert len(sizes) > 1
+    assert max(sizes) <= 4
+
+
+def test_an_error_fails_the_whole_batch():
+    def fail(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(fail, max_wait=0.01)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.run("x")
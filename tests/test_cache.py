@@ -0,0 +1,130 @@
+# tests/test_cache.py
+#
+# TTLCache expiry and stale reads, the shared SQLite backend, and the writer
+# thread behind set_nowait.
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+from tools import cache as cache_module
+from tools.cache import MISSING, SqliteCacheBackend, TTLCache
+
+
+@pytest.fixture
+def backend_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_entries_expire_after_the_ttl():
+    cache = TTLCache("test", ttl=0.05)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    time.sleep(0.06)
+    assert cache.get("key", "default") == "default"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_still_served_stale():
+    cache = TTLCache("test", ttl=0)
+    cache.set("key", "value")
+    assert cache.get("key") is None
+    assert cache.get_stale("key") == "value"
+    assert asyncio.run(cache.aget_stale("key")) == "value"
+    assert cache.get_stale("other", "default") == "default"
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_workers_share_entries_through_the_backend(backend_path):
+    # Two caches with their own backend objects, like two worker processes.
+    writer = TTLCache("test", backend=SqliteCacheBackend(backend_path))
+    reader = TTLCache("test", backend=SqliteCacheBackend(backend_path))
+    writer.set(("floral", "tote"), [{"title": "Floral tote"}])
+
+    assert reader.get(("floral", "tote")) == [{"title": "Floral tote"}]
+    assert reader.stats()["shared_hits"] == 1
+    # Copied into the local LRU, so the second read does not touch SQLite.
+    assert reader.get(("floral", "tote")) == [{"title": "Floral tote"}]
+    assert reader.stats()["hits"] == 1
+    assert asyncio.run(TTLCache("test", backend=SqliteCacheBackend(backend_path)).aget(
+        ("floral", "tote"))) == [{"title": "Floral tote"}]
+
+
+def test_backend_keeps_expired_entries_for_stale_reads_until_pruned(backend_path):
+    backend = SqliteCacheBackend(backend_path)
+    backend.set("test", "key", "value", time.time() - 1)
+    assert backend.get("test", "key") is MISSING
+    assert backend.get("test", "key", stale=True)[0] == "value"
+    assert TTLCache("test", backend=backend).get_stale("key") == "value"
+
+    backend.prune()
+    assert backend.get("test", "key", stale=True) is MISSING
+
+
+def test_clear_only_touches_its_own_namespace(backend_path):
+    backend = SqliteCacheBackend(backend_path)
+    pages, queries = TTLCache("pages", backend=backend), TTLCache("queries", backend=backend)
+    pages.set("key", "page")
+    queries.set("key", "query")
+    pages.clear()
+    assert len(pages) == 0 and backend.get("pages", "key") is MISSING
+    assert backend.get("queries", "key")[0] == "query"
+
+
+def test_backend_errors_count_as_misses():
+    class BrokenBackend:
+        def get(self, *args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+
+        def set(self, *args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+
+    cache = TTLCache("test", backend=BrokenBackend())
+    cache.set("key", "value")  # kept locally despite the failed write
+    assert cache.get("key") == "value"
+    assert cache.get("other", "default") == "default"
+    assert cache.get_stale("other", "default") == "default"
+
+
+def test_set_nowait_writes_in_order_on_the_writer_thread(backend_path):
+    backend = SqliteCacheBackend(backend_path)
+    cache = TTLCache("test", backend=backend)
+    for value in range(5):
+        cache.set_nowait("key", value)
+    assert cache.get("key") == 4  # the local tier is updated at once
+
+    writer = cache_module._get_writer()
+    assert cache_module._get_writer() is writer
+    writer.submit(lambda: None).result()  # everything queued before it is written
+    assert backend.get("test", "key")[0] == 4
+
+
+def test_forked_child_opens_its_own_connection(backend_path):
+    backend = SqliteCacheBackend(backend_path)
+    backend.set("test", "key", "parent", time.time() + 60)
+    parent_conn = backend._local.conn
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            ok = backend.get("test", "key")[0] == "parent" and backend._local.conn is not parent_conn
+            backend.set("test", "key", "child", time.time() + 60)
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert backend.get("test", "key")[0] == "child"
+    assert backend._local.conn is parent_conn
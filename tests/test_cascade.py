@@ -0,0 +1,118 @@
+# tests/test_cascade.py
+#
+# The search cascade keeps the most specific hit, in sequential and
+# speculative mode, and stops the searches it no longer needs.
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools import agent_tool
+
+KEYWORDS = ["floral", "tote", "leather"]
+PRIMARY, SECONDARY, TERTIARY = "floral tote leather", "floral tote", "floral"
+
+
+def product(query: str) -> dict:
+    return {"url": f"https://example.com/products/{query.replace(' ', '-') or 'any'}",
+            "title": f"{query or 'broad'} bag", "description": query}
+
+
+# What the broad site search (the empty query) finds; only SECONDARY matches the keywords.
+BROAD = [product("plain clutch"), product(SECONDARY)]
+
+
+class FakeSearch:
+    """Answers queries with one product each after a per-query delay, recording what ran."""
+
+    def __init__(self, delays: dict, empty=()):
+        self.delays = delays
+        self.empty = set(empty)
+        self.started = []
+        self.cancelled = []
+
+    def answer(self, query):
+        if query in self.empty:
+            return []
+        return BROAD if query == "" else [product(query)]
+
+    def __call__(self, query):
+        self.started.append(query)
+        time.sleep(self.delays.get(query, 0))
+        return self.answer(query)
+
+    async def run_async(self, query):
+        self.started.append(query)
+        try:
+            await asyncio.sleep(self.delays.get(query, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(query)
+            raise
+        return self.answer(query)
+
+
+@pytest.fixture
+def search(monkeypatch):
+    def install(mode: str, delays: dict, empty=()):
+        fake = FakeSearch(delays, empty)
+        monkeypatch.setattr(agent_tool, "CASCADE_MODE", mode)
+        monkeypatch.setattr(agent_tool, "search_products", fake)
+        monkeypatch.setattr(agent_tool, "search_products_async", fake.run_async)
+        return fake
+
+    return install
+
+
+@pytest.mark.parametrize("mode", ["sequential", "speculative"])
+def test_first_strict_hit_wins(search, mode):
+    fake = search(mode, {PRIMARY: 0.05}, empty=[PRIMARY])
+    assert agent_tool.search_cascade(KEYWORDS) == [product(SECONDARY)]
+    assert asyncio.run(agent_tool.search_cascade_async(KEYWORDS)) == [product(SECONDARY)]
+    if mode == "sequential":
+        assert fake.started == [PRIMARY, SECONDARY] * 2
+
+
+def test_speculative_keeps_the_most_specific_hit_even_when_it_finishes_last(search):
+    search("speculative", {PRIMARY: 0.1})
+    assert agent_tool.search_cascade(KEYWORDS) == [product(PRIMARY)]
+    assert asyncio.run(agent_tool.search_cascade_async(KEYWORDS)) == [product(PRIMARY)]
+
+
+@pytest.mark.parametrize("mode", ["sequential", "speculative"])
+def test_broad_search_ranks_when_strict_levels_are_empty(search, mode):
+    fake = search(mode, {}, empty=[PRIMARY, SECONDARY, TERTIARY])
+    assert agent_tool.search_cascade(KEYWORDS) == [product(SECONDARY)]
+    assert asyncio.run(agent_tool.search_cascade_async(KEYWORDS)) == [product(SECONDARY)]
+
+    fake.started.clear()
+    assert agent_tool.search_cascade(KEYWORDS, broad=False) == []
+    assert asyncio.run(agent_tool.search_cascade_async(KEYWORDS, broad=False)) == []
+    assert "" not in fake.started
+
+
+def test_async_speculative_cancels_the_slower_levels(search):
+    fake = search("speculative", {SECONDARY: 5, TERTIARY: 5, "": 5})
+    start = time.monotonic()
+    assert asyncio.run(agent_tool.search_cascade_async(KEYWORDS)) == [product(PRIMARY)]
+    assert time.monotonic() - start < 1
+    assert sorted(fake.cancelled) == sorted(["", SECONDARY, TERTIARY])
+
+
+def test_sync_speculative_skips_levels_that_have_not_started(search, monkeypatch):
+    # One worker: the other levels queue behind the primary search, and the
+    # worker is busy with the secondary one when the answer is known.
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(agent_tool, "_cascade_pool", pool)
+    fake = search("speculative", {PRIMARY: 0.05, SECONDARY: 0.2})
+    assert agent_tool.search_cascade(KEYWORDS) == [product(PRIMARY)]
+    pool.shutdown(wait=True)
+    assert TERTIARY not in fake.started and "" not in fake.started
+
+
+def test_speculative_levels_are_limited(search, monkeypatch):
+    monkeypatch.setattr(agent_tool, "CASCADE_SPECULATIVE_LEVELS", 1)
+    fake = search("speculative", {}, empty=[PRIMARY])
+    assert agent_tool.search_cascade(KEYWORDS) == [product(SECONDARY)]
+    assert fake.started == [PRIMARY, SECONDARY]
@@ -0,0 +1,64 @@
+# tests/test_catalog_reload.py
+#
+# A serving process picks up catalog writes made by another process.
+
+import subprocess
+import sys
+
+import pytest
+
+from tools import catalog as catalog_module, keyword_index, local_search_anuschka
+
+WRITER = """
+import sys
+from tools.catalog import ProductCatalog
+
+catalog = ProductCatalog(sys.argv[1])
+for name in sys.argv[2:]:
+    catalog.upsert({"url": f"https://example.com/products/{name}", "title": f"{name} tote",
+                    "price": "$10", "image_url": "https://example.com/i.jpg",
+                    "description": f"A {name} leather tote."})
+"""
+
+
+def ingest_elsewhere(path, *names):
+    subprocess.run([sys.executable, "-c", WRITER, str(path), *names], check=True)
+
+
+@pytest.fixture
+def serving(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.sqlite3"
+    monkeypatch.setattr(catalog_module, "CATALOG_PATH", str(path))
+    monkeypatch.setattr(catalog_module, "_catalog", None)
+    monkeypatch.setattr(local_search_anuschka, "SEARCH_BACKEND", "auto")
+    monkeypatch.setattr(keyword_index, "_index", None)
+    monkeypatch.setattr(keyword_index, "KEYWORD_INDEX_CHECK_SECONDS", 0)
+    return path
+
+
+def test_index_and_count_follow_another_process(serving):
+    # Nothing built yet: live search, empty index.
+    assert local_search_anuschka._search_catalog("floral") is None
+    assert not keyword_index.get_keyword_index().from_catalog
+
+    ingest_elsewhere(serving)  # an empty catalog
+    assert catalog_module.get_catalog().count() == 0
+    assert local_search_anuschka._search_catalog("floral") is None
+
+    ingest_elsewhere(serving, "floral")
+    assert catalog_module.get_catalog().count() == 1
+    assert local_search_anuschka._search_catalog("floral")[0]["title"] == "floral tote"
+    index = keyword_index.get_keyword_index()
+    assert index.from_catalog
+    assert [p["title"] for p in index.search(["floral"])] == ["floral tote"]
+
+    ingest_elsewhere(serving, "paisley")
+    index = keyword_index.get_keyword_index()
+    assert len(index) == 2
+    assert [p["title"] for p in index.search(["paisley"])] == ["paisley tote"]
+
+
+def test_index_is_not_rebuilt_without_changes(serving):
+    ingest_elsewhere(serving, "floral")
+    index = keyword_index.get_keyword_index()
+    assert keyword_index.get_keyword_index() is index
@@ -0,0 +1,116 @@
+# tests/test_hedged_search.py
+#
+# HedgedSearch ordering, hedging and cancellation against in-memory providers.
+
+import asyncio
+import time
+
+import pytest
+
+from tools import search_providers
+from tools.search_providers import HedgedSearch, SearchProvider
+
+
+class FakeProvider(SearchProvider):
+    """Answers with `products` after `delay` seconds, or raises `error`."""
+
+    def __init__(self, name: str, products=(), delay: float = 0.0, error: Exception = None):
+        super().__init__()
+        self.name = name
+        self.products = list(products)
+        self.delay = delay
+        self.error = error
+        self.started = 0
+        self.cancelled = False
+
+    def search(self, query, max_results, max_concurrency=None):
+        self.started += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.products[:max_results]
+
+    async def asearch(self, query, max_results, max_concurrency=None):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.products[:max_results]
+
+
+def products(name: str) -> list[dict]:
+    return [{"title": f"{name} bag", "url": f"https://example.com/products/{name}"}]
+
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    # Providers without latency history are hedged after the default delay.
+    monkeypatch.setattr(search_providers, "HEDGE_DEFAULT_DELAY", 0.05)
+
+
+def test_slow_primary_is_hedged_with_the_next_provider():
+    slow, fast = FakeProvider("slow", products("slow"), delay=1.0), FakeProvider("fast", products("fast"))
+    search = HedgedSearch([slow, fast])
+
+    start = time.monotonic()
+    assert search.search("tote") == products("fast")
+    assert time.monotonic() - start < 0.5
+    assert search.hedges == 1
+    assert fast.wins == 1 and slow.wins == 0
+
+
+def test_fast_primary_is_not_hedged():
+    first, second = FakeProvider("first", products("first")), FakeProvider("second", products("second"))
+    search = HedgedSearch([first, second])
+
+    assert search.search("tote") == products("first")
+    assert search.hedges == 0
+    assert second.started == 0
+
+
+@pytest.mark.parametrize("primary", [FakeProvider("empty"), FakeProvider("broken", error=ConnectionError("down"))])
+def test_empty_or_failed_answer_hands_over_at_once(monkeypatch, primary):
+    monkeypatch.setattr(search_providers, "HEDGE_DEFAULT_DELAY", 5)
+    search = HedgedSearch([primary, FakeProvider("backup", products("backup"))])
+
+    start = time.monotonic()
+    assert search.search("tote") == products("backup")
+    assert time.monotonic() - start < 1
+    assert search.hedges == 0
+
+
+def test_all_providers_empty_returns_empty_list():
+    search = HedgedSearch([FakeProvider("a"), FakeProvider("b", delay=0.1), FakeProvider("c")])
+
+    assert search.search("tote") == []
+    assert asyncio.run(search.asearch("tote")) == []
+
+
+def test_async_hedge_wins_and_cancels_the_loser():
+    slow, fast = FakeProvider("slow", products("slow"), delay=5), FakeProvider("fast", products("fast"))
+    search = HedgedSearch([slow, fast])
+
+    async def run():
+        result = await search.asearch("tote")
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        return result
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == products("fast")
+    assert time.monotonic() - start < 1
+    assert search.hedges == 1
+    assert slow.cancelled
+
+
+def test_async_empty_answer_hands_over_at_once(monkeypatch):
+    monkeypatch.setattr(search_providers, "HEDGE_DEFAULT_DELAY", 5)
+    search = HedgedSearch([FakeProvider("empty"), FakeProvider("backup", products("backup"))])
+
+    start = time.monotonic()
+    assert asyncio.run(search.asearch("tote")) == products("backup")
+    assert time.monotonic() - start < 1
+    assert search.hedges == 0
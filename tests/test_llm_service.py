@@ -0,0 +1,113 @@
+# tests/test_llm_service.py
+#
+# LLMService failover, cooldown and timeouts against fake chat models.
+
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from agent import llm_manager
+from agent.llm_manager import LLMService, Provider, ProviderUnavailable
+from tools.cache import TTLCache
+
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        raise ConnectionError("provider is down")
+
+
+class SlowModel:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def invoke(self, prompt):
+        time.sleep(self.seconds)
+        return "too late"
+
+
+def fake(*responses: str) -> Provider:
+    return Provider("fake", lambda: FakeListChatModel(responses=list(responses)))
+
+
+def service(*providers: Provider, timeout: float = 5) -> LLMService:
+    return LLMService(list(providers), cache=TTLCache("test-llm"), timeout=timeout)
+
+
+def test_fails_over_to_the_next_provider():
+    down = FailingModel()
+    llm = service(Provider("down", lambda: down), fake("from fake"))
+
+    assert llm.invoke("hello") == "from fake"
+    assert down.calls == 1
+    assert llm.providers[0].failures == 1
+
+
+def test_failed_provider_is_skipped_during_its_cooldown():
+    down = FailingModel()
+    llm = service(Provider("down", lambda: down, cooldown=60), fake("first", "second"))
+
+    assert llm.invoke("one") == "first"
+    assert [p.name for p in llm.ranked_providers()] == ["fake", "down"]
+    assert llm.invoke("two") == "second"
+    assert down.calls == 1
+
+
+def test_provider_is_retried_after_its_cooldown():
+    down = FailingModel()
+    llm = service(Provider("down", lambda: down, cooldown=0), fake("first", "second"))
+
+    llm.invoke("one")
+    llm.invoke("two")
+    assert down.calls == 2
+
+
+def test_timeout_counts_as_failure_and_fails_over():
+    slow = Provider("slow", lambda: SlowModel(0.5))
+    llm = service(slow, fake("fast answer"), timeout=0.1)
+
+    assert llm.invoke("hello") == "fast answer"
+    assert slow.failures == 1
+    assert not slow.healthy()
+
+
+def test_all_providers_failing_raises():
+    llm = service(Provider("a", FailingModel), Provider("b", FailingModel))
+
+    with pytest.raises(ProviderUnavailable, match="a: provider is down; b: provider is down"):
+        llm.invoke("hello")
+
+
+def test_answers_are_cached():
+    llm = service(fake("only once"))
+
+    assert llm.invoke("same  prompt") == "only once"
+    # FakeListChatModel would cycle to the next response if it were called again.
+    assert llm.invoke("same prompt") == "only once"
+
+
+def test_settings_are_read_when_the_service_is_built(monkeypatch):
+    monkeypatch.setattr(llm_manager, "_service", None)
+    monkeypatch.setenv("LLM_PROVIDERS", "fake")
+    monkeypatch.setenv("LLM_FAKE_MAX_CONCURRENCY", "2")
+    monkeypatch.setenv("LLM_COOLDOWN", "5")
+    monkeypatch.setenv("LLM_TIMEOUT", "7")
+    monkeypatch.setitem(llm_manager.PROVIDER_FACTORIES, "fake", lambda: FakeListChatModel(responses=["hi"]))
+
+    llm = llm_manager.get_llm_service()
+    assert [(p.name, p.max_concurrency, p.cooldown) for p in llm.providers] == [("fake", 2, 5.0)]
+    assert llm.timeout == 7.0
+
+
+def test_slot_timeout_does_not_spend_a_rate_token():
+    provider = Provider("limited", FailingModel, max_concurrency=1, rate=0.01, burst=2)
+    assert provider.acquire(timeout=0.1)
+
+    # The only slot is taken, so this waits for it in vain.
+    assert not provider.acquire(timeout=0.05)
+    assert provider.bucket.available() == pytest.approx(1, abs=0.01)
+    provider.release()
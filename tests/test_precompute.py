@@ -0,0 +1,48 @@
+# tests/test_precompute.py
+#
+# The precomputed table is keyed by cascade queries and survives a save/load.
+
+import pytest
+
+from tools import agent_tool, precompute
+
+PRODUCT = {"url": "https://example.com/products/floral-tote", "title": "Floral tote"}
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    queries = []
+
+    def search_products(query):
+        queries.append(query)
+        return [PRODUCT] if query.startswith("floral") else []
+
+    monkeypatch.setattr(agent_tool, "CASCADE_MODE", "sequential")
+    monkeypatch.setattr(agent_tool, "search_products", search_products)
+    return queries
+
+
+def test_keyword_sets_sharing_a_cascade_are_searched_once(searches):
+    keyword_sets = [
+        ["floral", "tote", "leather", "red"],
+        ["floral", "tote", "leather", "blue"],
+        ["plain", "clutch"],
+    ]
+    table = precompute.build_table(keyword_sets, workers=1)
+
+    assert searches.count("floral tote leather") == 1
+    assert table.keyword_sets == 3 and table.cascades == 2
+    assert table.get(["floral", "tote", "leather", "green"]) == [PRODUCT]
+    # Every strict level came back empty and the broad search is not stored.
+    assert "" not in searches
+    assert table.get(["plain", "clutch"]) is None
+
+
+def test_table_round_trips_through_the_file(searches, tmp_path):
+    table = precompute.build_table([["floral", "tote"]], workers=1)
+    path = str(tmp_path / "precomputed.json")
+    table.save(path)
+
+    loaded = precompute.PrecomputedTable.load(path)
+    assert loaded.entries == table.entries
+    assert (loaded.keyword_sets, loaded.cascades) == (1, 1)
@@ -0,0 +1,146 @@
+# tests/test_singleflight.py
+#
+# Concurrent callers for one key share a single call, its result and its error.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def run_threads(flight: SingleFlight, fn, key="key"):
+    """Calls `flight.do` from CALLERS threads at once; returns each caller's result or exception."""
+    def call():
+        try:
+            return flight.do(key, fn)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        futures = [pool.submit(call) for _ in range(CALLERS)]
+        return [f.result() for f in futures]
+
+
+def leader_waiting_for(release: threading.Event, result=None, error=None):
+    """A function that blocks until `release` is set, counting its runs."""
+    def fn():
+        fn.runs += 1
+        release.wait(5)
+        if error is not None:
+            raise error
+        return result
+
+    fn.runs = 0
+    return fn
+
+
+def release_when_joined(flight: SingleFlight, release: threading.Event):
+    def check():
+        while flight.shared < CALLERS - 1:
+            time.sleep(0.005)
+        release.set()
+
+    threading.Thread(target=check, daemon=True).start()
+
+
+def test_threads_share_one_call():
+    flight, release = SingleFlight("test"), threading.Event()
+    fn = leader_waiting_for(release, result=["floral tote"])
+    release_when_joined(flight, release)
+
+    results = run_threads(flight, fn)
+    assert results == [["floral tote"]] * CALLERS
+    assert fn.runs == 1
+    assert flight.stats() == {"calls": 1, "shared": CALLERS - 1}
+
+
+def test_error_reaches_every_waiting_thread():
+    flight, release = SingleFlight("test"), threading.Event()
+    error = ConnectionError("upstream down")
+    fn = leader_waiting_for(release, error=error)
+    release_when_joined(flight, release)
+
+    results = run_threads(flight, fn)
+    assert all(result is error for result in results)
+    assert fn.runs == 1
+
+
+def test_key_is_forgotten_once_the_call_finishes():
+    flight = SingleFlight("test")
+
+    def broken():
+        raise ValueError("bad page")
+
+    with pytest.raises(ValueError):
+        flight.do("key", broken)
+    assert flight.do("key", lambda: "fresh") == "fresh"
+    assert flight.do("other", lambda: "other") == "other"
+    assert flight.stats() == {"calls": 3, "shared": 0}
+
+
+def test_coroutines_share_one_call():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def fetch(url):
+        runs.append(url)
+        await asyncio.sleep(0.01)
+        return url.upper()
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fetch, "floral") for _ in range(CALLERS)))
+
+    assert asyncio.run(main()) == ["FLORAL"] * CALLERS
+    assert runs == ["floral"]
+    assert flight.stats() == {"calls": 1, "shared": CALLERS - 1}
+
+
+def test_error_reaches_every_waiting_coroutine():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(CALLERS)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert len({id(r) for r in results}) == 1
+    assert flight.stats()["calls"] == 1
+
+
+def test_call_survives_until_the_last_coroutine_is_cancelled():
+    flight = SingleFlight("test")
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        first = asyncio.ensure_future(flight.do_async("key", fetch))
+        second = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled  # the second caller still wants the result
+
+        second.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled
+        assert not flight._tasks
+
+    asyncio.run(main())
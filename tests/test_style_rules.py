@@ -0,0 +1,63 @@
+# tests/test_style_rules.py
+#
+# The compiled rule engine against the keywords the original substring
+# matcher (if/elif chains over `term in text`) produced for the same text.
+
+import pytest
+
+from tools.bag_recommender import StyleRuleEngine, get_style_recommendation, recommend_style
+
+# Keywords the original matcher returned for each description.
+BASELINE = [
+    ("An artistic person who loves floral prints",
+     ["hand painted", "artistic", "floral", "abstract", "garden", "nature"]),
+    ("A professional woman heading to the office in a monochrome suit",
+     ["structured", "tote", "leather", "neutral", "work", "office", "colorful", "bold", "contrast"]),
+    ("casual traveler with denim",
+     ["casual", "sling", "crossbody", "practical", "travel", "compartment", "denim", "earthy", "tan",
+      "contrast"]),
+    ("I love traveling",
+     ["classic", "crossbody", "satchel", "travel", "sling", "compartment"]),
+    ("Professionally dressed",
+     ["structured", "tote", "leather", "neutral"]),
+    ("Elegant evening look with gold jewelry",
+     ["elegant", "clutch", "mini", "metallic", "evening", "shiny", "gold", "luxury"]),
+    ("formal party, red dress",
+     ["elegant", "clutch", "mini", "metallic", "evening", "shiny", "red", "vibrant"]),
+    ("Solid blue outfit for travel, needs a backpack and a sling",
+     ["classic", "crossbody", "satchel", "travel", "sling", "compartment", "colorful", "bold", "contrast",
+      "blue", "cool tone", "backpack"]),
+    ("Travelers who like satchels and crossbody bags",
+     ["classic", "crossbody", "satchel", "travel", "sling", "compartment"]),
+    ("Casually dressed for the office, blue jeans",
+     ["casual", "sling", "crossbody", "practical", "tote", "work", "office", "blue", "cool tone"]),
+    ("nothing in particular",
+     ["classic", "crossbody", "satchel"]),
+]
+
+
+@pytest.mark.parametrize("text, keywords", BASELINE)
+def test_keywords_match_baseline(text, keywords):
+    assert recommend_style(text).keywords == keywords
+
+
+def test_text_output_keeps_baseline_format():
+    text = get_style_recommendation("casual traveler with denim")
+    assert text.startswith("Recommended Style: A sling or backpack with playful, practical design.\n")
+    assert text.endswith("\nSearch Keywords: casual, sling, crossbody, practical, travel, compartment, "
+                         "denim, earthy, tan, contrast")
+
+
+@pytest.mark.parametrize("text", ["I preferred a dress", "She was bored", "a goldfinch"])
+def test_terms_inside_other_words_do_not_match(text):
+    assert recommend_style(text).matched == {}
+
+
+def test_inflections_match_their_term():
+    engine = StyleRuleEngine([{"name": "occasion", "rules": [
+        {"terms": ["party"], "keywords": ["evening"]},
+        {"terms": ["travel"], "keywords": ["travel"]},
+    ]}])
+    for text, term in [("parties", "party"), ("partying", "party"), ("travellers", "travel"),
+                       ("travelled", "travel")]:
+        assert engine.recommend(text).matched == {"occasion": [term]}, text
@@ -0,0 +1,98 @@
+# tests/test_upload_limits.py
+#
+# Request body limits on the image routes, with and without Content-Length.
+
+import asyncio
+
+import httpx
+import pytest
+
+import app as app_module
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n" + b"\0" * 8
+
+
+def post(path: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+
+    return asyncio.run(send())
+
+
+def chunked(data: bytes, size: int = 64 * 1024):
+    """A body without Content-Length, sent in `size` byte chunks."""
+    async def chunks():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    return chunks()
+
+
+@pytest.fixture
+def small_limits(monkeypatch):
+    monkeypatch.setitem(app_module.UPLOAD_LIMITS, "/recommend/image/raw", (1000, "Upload exceeds 1000 bytes."))
+    monkeypatch.setitem(app_module.UPLOAD_LIMITS, "/recommend/batch", (5000, "Batch exceeds 5000 bytes in total."))
+
+
+def test_declared_length_over_limit_is_rejected(small_limits):
+    resp = post("/recommend/image/raw", content=PNG_HEADER + b"\0" * 2000)
+    assert resp.status_code == 413
+    assert resp.json() == {"detail": "Upload exceeds 1000 bytes."}
+
+
+def test_chunked_body_over_limit_is_rejected(small_limits):
+    resp = post("/recommend/image/raw", content=chunked(PNG_HEADER + b"\0" * 2000, size=256))
+    assert resp.status_code == 413
+    assert resp.json() == {"detail": "Upload exceeds 1000 bytes."}
+
+
+def test_chunked_batch_over_limit_is_rejected(small_limits):
+    files = [("files", (f"{i}.png", PNG_HEADER + b"\0" * 2000, "image/png")) for i in range(3)]
+    request = httpx.Request("POST", "http://test/recommend/batch", files=files)
+    body = request.read()
+    resp = post("/recommend/batch", content=chunked(body, size=1024),
+                headers={"Content-Type": request.headers["Content-Type"]})
+    assert resp.status_code == 413
+    assert resp.json() == {"detail": "Batch exceeds 5000 bytes in total."}
+
+
+def test_chunked_body_under_limit_reaches_the_route(small_limits):
+    resp = post("/recommend/image/raw", content=chunked(b"not an image" * 50, size=256))
+    assert resp.status_code == 415
+
+
+def read_image(*chunks: bytes) -> bytes:
+    consumed = []
+
+    async def source():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    data = asyncio.run(app_module._read_image(source(), "test"))
+    assert consumed == list(chunks)
+    return data
+
+
+def test_signature_split_across_chunks_is_accepted():
+    assert read_image(PNG_HEADER[:5], PNG_HEADER[5:], b"rest") == PNG_HEADER + b"rest"
+
+
+def test_non_image_is_rejected_after_the_first_chunk():
+    consumed = []
+
+    async def source():
+        for chunk in (b"definitely not an image", b"never read"):
+            consumed.append(chunk)
+            yield chunk
+
+    with pytest.raises(app_module.HTTPException) as exc:
+        asyncio.run(app_module._read_image(source(), "test"))
+    assert exc.value.status_code == 415
+    assert consumed == [b"definitely not an image"]
+
+
+def test_multipart_images_are_kept_in_memory():
+    assert app_module.MultiPartParser.spool_max_size >= app_module.MAX_IMAGE_BYTES
@@ -0,0 +1,162 @@
+# tests/test_upstream.py
+#
+# HostGovernor rate adjustment and circuit breaker, and how page fetches use them.
+
+import asyncio
+import time
+
+import pytest
+
+from tools import local_search_anuschka, upstream
+from tools.cache import TTLCache
+from tools.upstream import CLOSED, HALF_OPEN, OPEN, CircuitOpen, HostGovernor, RateLimited
+
+URL = "https://store.test/products/floral-tote"
+
+
+@pytest.fixture(autouse=True)
+def fresh_governors(monkeypatch):
+    monkeypatch.setattr(upstream, "_governors", {})
+    monkeypatch.setattr(upstream, "DECREASE_INTERVAL", 0)
+    monkeypatch.setattr(upstream, "UPSTREAM_FAILURE_THRESHOLD", 3)
+
+
+def governor(max_rate: float = 8, min_rate: float = 1, burst: float = 4) -> HostGovernor:
+    return HostGovernor("store.test", max_rate=max_rate, min_rate=min_rate, burst=burst)
+
+
+def test_empty_bucket_rejects_the_call():
+    g = governor(max_rate=0.01, burst=1)
+    g.acquire(timeout=0)
+    with pytest.raises(RateLimited):
+        g.acquire(timeout=0)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_throttle_and_server_errors_halve_the_rate(status):
+    g = governor()
+    g.record(status=status)
+    assert g.rate == 4
+    g.record(status=status)
+    assert g.rate == 2
+    g.record(status=status)
+    assert g.rate == 1  # min_rate
+
+
+def test_rate_is_cut_once_per_interval(monkeypatch):
+    monkeypatch.setattr(upstream, "DECREASE_INTERVAL", 60)
+    g = governor()
+    g.record(status=503)
+    g.record(status=503)
+    assert g.rate == 4
+
+
+def test_slow_answer_cuts_the_rate_without_counting_as_failure():
+    g = governor()
+    g.record(status=200, seconds=upstream.UPSTREAM_SLOW_SECONDS + 1)
+    assert g.rate == 4
+    assert g.state == CLOSED and g.consecutive_failures == 0
+
+
+def test_fast_answers_raise_the_rate_up_to_the_maximum():
+    g = governor()
+    g.record(status=503)
+    for _ in range(100):
+        g.record(status=200, seconds=0.01)
+    assert g.rate == 8
+
+
+def test_not_found_is_a_healthy_answer():
+    g = governor()
+    for _ in range(5):
+        g.record(status=404, seconds=0.01)
+    assert g.state == CLOSED and g.consecutive_failures == 0
+
+
+def test_breaker_opens_probes_and_closes(monkeypatch):
+    monkeypatch.setattr(upstream, "UPSTREAM_OPEN_SECONDS", 0.05)
+    g = governor()
+    for _ in range(3):
+        g.record(error=ConnectionError("refused"))
+    assert g.state == OPEN and g.trips == 1
+    with pytest.raises(CircuitOpen):
+        g.acquire(timeout=0)
+
+    time.sleep(0.06)
+    g.acquire(timeout=0)  # the probe
+    assert g.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        g.acquire(timeout=0)  # only one probe at a time
+
+    g.record(status=200, seconds=0.01)
+    assert g.state == CLOSED
+    g.acquire(timeout=0)
+
+
+def test_failed_probe_opens_the_breaker_again(monkeypatch):
+    monkeypatch.setattr(upstream, "UPSTREAM_OPEN_SECONDS", 0.05)
+    g = governor()
+    for _ in range(3):
+        g.record(status=503)
+    time.sleep(0.06)
+    g.acquire(timeout=0)
+    g.record(status=503)
+    assert g.state == OPEN and g.trips == 2
+    with pytest.raises(CircuitOpen):
+        g.acquire(timeout=0)
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield b"<html><head><title>Floral tote</title></head></html>"
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeSession:
+    def get(self, url, **kwargs):
+        return FakeResponse()
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    cache = TTLCache("test-pages", ttl=0)  # every entry is expired at once
+    monkeypatch.setattr(local_search_anuschka, "PAGE_CACHE", cache)
+    monkeypatch.setattr(local_search_anuschka, "get_session", FakeSession)
+    return cache
+
+
+def test_parse_errors_do_not_count_against_the_host(pages, monkeypatch):
+    def broken_parser(chunks, url, try_head):
+        raise ValueError("unexpected markup")
+
+    monkeypatch.setattr(local_search_anuschka, "extract_streaming", broken_parser)
+    for _ in range(5):
+        assert local_search_anuschka._fetch_product(URL, time.monotonic() + 5) is None
+    g = upstream.get_governor(URL)
+    assert g.state == CLOSED and g.consecutive_failures == 0
+
+
+def test_stale_page_is_served_while_the_breaker_is_open(pages):
+    stale = {"url": URL, "title": "Floral tote (cached)"}
+    pages.set(URL, stale)
+    g = upstream.get_governor(URL)
+    for _ in range(3):
+        g.record(status=503)
+    assert g.state == OPEN
+
+    assert local_search_anuschka._fetch_product(URL, time.monotonic() + 5) == stale
+    assert asyncio.run(local_search_anuschka._fetch_product_async(URL, time.monotonic() + 5)) == stale
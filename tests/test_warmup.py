@@ -0,0 +1,18 @@
+# tests/test_warmup.py
+#
+# The gunicorn master only runs the fork-safe warm-up steps.
+
+from tools import warmup
+
+
+def test_master_skips_steps_that_do_not_survive_fork(monkeypatch):
+    ran = []
+    monkeypatch.setattr(warmup, "WARMUP", True)
+    monkeypatch.setattr(warmup, "STEPS", [
+        ("indexes", lambda: ran.append("indexes"), True),
+        ("model", lambda: ran.append("model"), False),
+    ])
+
+    assert list(warmup.warm_up(fork_safe=True)) == ["indexes"]
+    assert ran == ["indexes"]
+    assert list(warmup.warm_up()) == ["indexes", "model"]
@@ -1,77 +1,459 @@
 # tools/agent_tool.py
 
-from langchain_core.tools import tool
-from .bag_recommender import get_style_recommendation
-from .local_search_anuschka import search_products
-import re
+import asyncio
+import threading
+from contextlib import aclosing
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from .bag_recommender import recommend_style
+from .cache import RECOMMENDATION_CACHE, recommendation_key
+from .keyword_index import KeywordIndex, get_keyword_index
+from .local_search_anuschka import astream_products, search_products, search_products_async
+from .precompute import lookup_precomputed
+from .telemetry import get_logger, span
+import os
 
+# "keyword" ranks products by search keywords; "semantic" ranks them by the
+# embedding similarity of the raw style description (see tools/semantic_index.py).
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "keyword")
+# How the fallback search cascade runs. "sequential" starts each level only
+# after the previous one came back empty. "speculative" runs up to
+# CASCADE_SPECULATIVE_LEVELS levels at once and keeps the most specific one
+# that finds something, trading extra upstream searches for lower latency
+# when the first levels miss.
+CASCADE_MODE = os.getenv("CASCADE_MODE", "sequential")
+CASCADE_SPECULATIVE_LEVELS = max(int(os.getenv("CASCADE_SPECULATIVE_LEVELS", "4")), 1)
 
-@tool
-def find_anuschka_bag_for_style(style_description: str) -> list[dict]:
+_cascade_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="cascade")
+
+log = get_logger(__name__)
+
+
+def find_bag_for_style(style_description: str) -> list[dict]:
     """
     Finds and returns a list of Anuschka bags based on a style description.
     This tool intelligently searches for bags using style keywords and performs
     fallback searches if no exact matches are found.
     """
-    print(f"[🔎] Using combined tool for style: '{style_description}'")
+    kind, value = _plan_request(style_description)
+    if kind == "done":
+        return value
+    return find_bag_for_keywords(value)
 
-    # Step 1: Get style recommendation and keywords from our helper function
-    recommendation_output = get_style_recommendation(style_description)
-    print(f"[📝] Generated recommendation: {recommendation_output}")
 
-    # Step 2: Extract the keywords from the recommendation string
-    match = re.search(r"Search Keywords: (.*)", recommendation_output)
-    if not match:
-        print("[⚠️] Could not extract keywords from recommendation.")
-        return [{'error': 'Could not determine search keywords from the style description.'}]
+async def afind_bag_for_style(style_description: str) -> list[dict]:
+    """Async version of `find_bag_for_style` that never blocks the event loop."""
+    kind, value = await asyncio.to_thread(_plan_request, style_description)
+    if kind == "done":
+        return value
+    return await afind_bag_for_keywords(value)
 
-    keywords = match.group(1).strip().split(', ')
 
-    # --- Primary Search Attempt ---
-    primary_search_query = ' '.join(keywords[:3])
-    print(
-        f"[🔑] Attempting primary search with keywords: '{primary_search_query}'")
-    products = search_products(primary_search_query)
+_agent_tool = None
+_agent_tool_lock = threading.Lock()
 
-    # --- Secondary Search ---
-    if not products:
-        print("[⚠️] Primary search failed. Attempting secondary search.")
-        secondary_search_query = ' '.join(keywords[:2])
-        print(
-            f"[🔑] Attempting secondary search with keywords: '{secondary_search_query}'")
-        products = search_products(secondary_search_query)
 
-    # --- Tertiary Search ---
-    if not products:
-        print("[⚠️] Secondary search failed. Attempting tertiary search.")
-        tertiary_search_query = keywords[0]
-        print(
-            f"[🔑] Attempting tertiary search with keyword: '{tertiary_search_query}'")
-        products = search_products(tertiary_search_query)
+def get_agent_tool():
+    """
+    Returns the LangChain tool wrapping `find_bag_for_style`.
 
-    # --- Final Broad Search with Filtering ---
-    if not products:
-        print(
-            "[🛠️] All strict keyword searches failed. Trying broad site search + keyword filtering.")
-        # Empty query to trigger broad search
-        all_results = search_products("")
-
-        if all_results:
-            print(
-                f"[📦] Found {len(all_results)} products in broad search. Filtering by keyword match...")
-            filtered = []
-            for product in all_results:
-                combined_text = f"{product.get('title', '')} {product.get('description', '')}".lower(
+    langchain_core is slow to import, so the tool is only built when an
+    agent or script asks for it; the web app calls the functions directly.
+    """
+    global _agent_tool
+    if _agent_tool is None:
+        with _agent_tool_lock:
+            if _agent_tool is None:
+                from langchain_core.tools import StructuredTool
+
+                _agent_tool = StructuredTool.from_function(
+                    func=find_bag_for_style,
+                    coroutine=afind_bag_for_style,
+                    name="find_anuschka_bag_for_style",
                 )
-                if any(keyword.lower() in combined_text for keyword in keywords):
-                    filtered.append(product)
-            products = filtered
-            print(
-                f"[✅] Found {len(products)} filtered matches using fallback strategy.")
-        else:
-            print("[❌] Broad fallback search returned no products.")
+    return _agent_tool
 
-    if not products:
-        print("[❌] Final fallback search also failed. No matching products found.")
 
+def __getattr__(name):
+    # Keeps `from tools.agent_tool import find_anuschka_bag_for_style` working.
+    if name == "find_anuschka_bag_for_style":
+        return get_agent_tool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def find_bag_for_keywords(keywords: list[str]) -> list[dict]:
+    """Finds bags for search keywords, from the local indexes or the live search cascade."""
+    products = _retrieve_local(keywords)
+    if products is not None:
+        return products
+
+    products = search_cascade(keywords)
+    _remember(keywords, products)
+    return products
+
+
+async def afind_bag_for_keywords(keywords: list[str]) -> list[dict]:
+    """Async version of `find_bag_for_keywords`."""
+    products = await asyncio.to_thread(_retrieve_local, keywords)
+    if products is not None:
+        return products
+
+    products = await search_cascade_async(keywords)
+    _remember(keywords, products)
+    return products
+
+
+async def astream_bags_for_style(style_description: str):
+    """
+    Yields bags for a style description as soon as each one is found.
+
+    Local answers (indexes, caches) are yielded at once. Otherwise each level
+    of the search cascade streams its products as pages are scraped, and the
+    next level only runs if a level produced nothing. The broad fallback has
+    to rank all of its results first, so those arrive together at the end.
+    """
+    kind, value = await asyncio.to_thread(_plan_request, style_description)
+    if kind == "done":
+        products = value
+    else:
+        keywords = value
+        products = await asyncio.to_thread(_retrieve_local, keywords)
+    if products is not None:
+        for product in products:
+            yield product
+        return
+
+    for level, query in cascade_queries(keywords):
+        log.info("[🔑] Streaming %s search with keywords: '%s'", level, query)
+        products = []
+        async with aclosing(astream_products(query)) as stream:
+            async for product in stream:
+                products.append(product)
+                yield product
+        if products:
+            _remember(keywords, products)
+            return
+        log.warning("[⚠️] %s search failed.", level.title())
+
+    log.warning("[🛠️] All strict keyword searches failed. Trying broad site search + keyword ranking.")
+    products = _rank_broad_results(await search_products_async(""), keywords)
+    _remember(keywords, products)
+    for product in products:
+        yield product
+
+
+def find_bags_for_styles(style_descriptions: list[str], max_workers=8, on_progress=None) -> list[list[dict]]:
+    """
+    Finds bags for many style descriptions as one batch.
+
+    Descriptions that map to the same keyword set share one search, and the
+    unique searches run concurrently on `max_workers` threads.
+
+    Args:
+        style_descriptions: The inputs, in order.
+        max_workers: Searches run at the same time.
+        on_progress: Optional callback `(done, total)` called as searches finish.
+
+    Returns:
+        One product list per input, in input order.
+    """
+    plans, jobs = _plan_batch(style_descriptions)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(find_bag_for_keywords, keywords): key
+                   for key, keywords in jobs.items()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done, len(futures))
+    return [results[value] if kind == "job" else value for kind, value in plans]
+
+
+async def afind_bags_for_styles(style_descriptions: list[str]) -> list[list[dict]]:
+    """Async version of `find_bags_for_styles`; unique searches run concurrently."""
+    plans, jobs = await asyncio.to_thread(_plan_batch, style_descriptions)
+    keys = list(jobs)
+    outputs = await asyncio.gather(*(afind_bag_for_keywords(jobs[key]) for key in keys))
+    results = dict(zip(keys, outputs))
+    return [results[value] if kind == "job" else value for kind, value in plans]
+
+
+def _plan_request(style_description: str):
+    """
+    Works out how to answer one style description.
+
+    Returns:
+        ("done", products) when it was answered locally (semantic index or
+        keyword error), otherwise ("keywords", keywords) for the keyword search.
+    """
+    log.info("[🔎] Using combined tool for style: '%s'", style_description)
+
+    if RETRIEVAL_BACKEND == "semantic":
+        from .semantic_index import get_semantic_index
+
+        semantic_index = get_semantic_index()
+        if semantic_index is not None:
+            log.info("[🧠] Ranking %s products by embedding similarity.", len(semantic_index))
+            with span("retrieve.semantic"):
+                return "done", semantic_index.search(style_description, top_k=5)
+        log.warning("[⚠️] No embedding index found. Falling back to keyword retrieval.")
+
+    with span("keywords.generate"):
+        recommendation = recommend_style(style_description)
+    log.debug("[📝] Generated recommendation: %s", recommendation.as_text())
+
+    if not recommendation.keywords:
+        log.warning("[⚠️] Could not extract keywords from recommendation.")
+        return "done", [{'error': 'Could not determine search keywords from the style description.'}]
+
+    return "keywords", recommendation.keywords
+
+
+def _plan_batch(style_descriptions: list[str]):
+    """
+    Deduplicates a batch into unique searches.
+
+    Returns:
+        A (plans, jobs) pair. `jobs` maps a normalized keyword tuple to the
+        keywords to search for. `plans` has one ("job", key) entry per input, or
+        ("done", products) for inputs that were answered while planning.
+    """
+    plans = []
+    jobs = {}
+    for style_description in style_descriptions:
+        kind, value = _plan_request(style_description)
+        if kind == "done":
+            plans.append(("done", value))
+            continue
+        key = recommendation_key(value)
+        jobs.setdefault(key, value)
+        plans.append(("job", key))
+    log.info("[🧮] Batch of %s inputs needs %s unique searches.", len(style_descriptions), len(jobs))
+    return plans, jobs
+
+
+def _retrieve_local(keywords: list[str]):
+    """
+    Answers a keyword search from the local indexes when possible.
+
+    Returns:
+        The products, or None when the remote search cascade still has to
+        run. Keywords whose cascade queries are in the precomputed table (see
+        tools/precompute.py) and results cached from an earlier cascade with
+        the same keywords are returned directly.
+    """
+    # --- Ranked Index Lookup ---
+    # With an offline catalog every product is already indexed, so one ranked
+    # query over all keywords replaces the whole search cascade.
+    index = get_keyword_index()
+    if index.from_catalog:
+        log.info("[📇] Ranking %s indexed products for keywords: %s", len(index), keywords)
+        with span("retrieve.index"):
+            products = index.search(keywords, top_k=5)
+        if not products:
+            log.warning("[❌] No indexed products match the keywords.")
+        return products
+
+    products = lookup_precomputed(keywords)
+    if products is not None:
+        log.info("[📋] Using precomputed recommendations for keywords: %s", keywords)
+        return products
+
+    products = RECOMMENDATION_CACHE.get(recommendation_key(keywords))
+    if products is not None:
+        log.info("[💾] Using cached recommendations for keywords: %s", keywords)
+    return products
+
+
+def _remember(keywords: list[str], products: list[dict]):
+    """Caches the products a live search cascade found for a keyword set."""
+    # Empty results are not cached, so a transient upstream failure is retried.
+    # Also called on the event loop, so the shared cache write is queued.
+    if products:
+        RECOMMENDATION_CACHE.set_nowait(recommendation_key(keywords), products)
+
+
+def cascade_queries(keywords: list[str]) -> list[tuple[str, str]]:
+    """
+    Returns the strict (level, query) searches of the cascade, most specific first.
+
+    Only the first three keywords take part; when none of these searches finds
+    anything, the cascade ends with a broad site search ranked by all keywords.
+    """
+    return [
+        ("primary", ' '.join(keywords[:3])),
+        ("secondary", ' '.join(keywords[:2])),
+        ("tertiary", keywords[0]),
+    ]
+
+
+def _rank_broad_results(all_results: list[dict], keywords: list[str]) -> list[dict]:
+    """Ranks the products of a broad site search by keyword match."""
+    if all_results:
+        log.info("[📦] Found %s products in broad search. Ranking by keyword match...", len(all_results))
+        products = KeywordIndex(all_results).search(
+            keywords, top_k=len(all_results))
+        log.info("[✅] Found %s ranked matches using fallback strategy.", len(products))
+    else:
+        log.warning("[❌] Broad fallback search returned no products.")
+        products = []
+
+    if not products:
+        log.warning("[❌] Final fallback search also failed. No matching products found.")
     return products
+
+
+def search_cascade(keywords: list[str], broad: bool = True) -> list[dict]:
+    """
+    Searches with fewer and fewer keywords until something is found.
+
+    Args:
+        keywords: Search keywords, most important first.
+        broad: Whether to end with the broad site search when every strict
+            level comes back empty.
+    """
+    if CASCADE_MODE == "speculative":
+        return _search_cascade_speculative(keywords, broad)
+
+    steps = _sequential_steps(keywords, broad)
+    try:
+        level, query = next(steps)
+        while True:
+            level, query = steps.send(_search_level(level, query, keywords))
+    except StopIteration as done:
+        return done.value
+
+
+async def search_cascade_async(keywords: list[str], broad: bool = True) -> list[dict]:
+    """Async version of `search_cascade`."""
+    if CASCADE_MODE == "speculative":
+        return await _search_cascade_speculative_async(keywords, broad)
+
+    steps = _sequential_steps(keywords, broad)
+    try:
+        level, query = next(steps)
+        while True:
+            level, query = steps.send(await _search_level_async(level, query, keywords))
+    except StopIteration as done:
+        return done.value
+
+
+def _sequential_steps(keywords: list[str], broad: bool):
+    """
+    The sequential cascade, shared by the sync and async versions.
+
+    Yields the (level, query) searches to run one at a time and is sent the
+    products each one found; returns the cascade's products.
+    """
+    for level, query in cascade_queries(keywords):
+        log.info("[🔑] Attempting %s search with keywords: '%s'", level, query)
+        products = yield level, query
+        if products:
+            return products
+        log.warning("[⚠️] %s search failed.", level.title())
+    if not broad:
+        return []
+
+    # --- Final Broad Search with Ranking ---
+    log.warning("[🛠️] All strict keyword searches failed. Trying broad site search + keyword ranking.")
+    # Empty query to trigger broad search
+    return (yield "broad", "")
+
+
+def _search_level(level: str, query: str, keywords: list[str]) -> list[dict]:
+    with span(f"cascade.{level}"):
+        products = search_products(query)
+    return _rank_broad_results(products, keywords) if level == "broad" else products
+
+
+async def _search_level_async(level: str, query: str, keywords: list[str]) -> list[dict]:
+    with span(f"cascade.{level}"):
+        products = await search_products_async(query)
+    return _rank_broad_results(products, keywords) if level == "broad" else products
+
+
+class _SpeculativeCascade:
+    """
+    The bookkeeping shared by the sync and async speculative cascades.
+
+    Levels start in cascade order, at most CASCADE_SPECULATIVE_LEVELS at a
+    time, through `submit(level, query)`, which returns a future or task.
+    """
+
+    def __init__(self, keywords: list[str], broad: bool, submit):
+        self.levels = []
+        for level, query in cascade_queries(keywords) + ([("broad", "")] if broad else []):
+            if query not in [q for _, q in self.levels]:
+                self.levels.append((level, query))
+        self.submit = submit
+        self.results = {}
+        self.running = {}
+        log.info("[🏁] Speculatively searching %s cascade levels for keywords: %s", len(self.levels), keywords)
+
+    def start_more(self):
+        while (len(self.running) < CASCADE_SPECULATIVE_LEVELS
+               and len(self.results) + len(self.running) < len(self.levels)):
+            index = len(self.results) + len(self.running)
+            self.running[self.submit(*self.levels[index])] = index
+
+    def finish(self, done):
+        """
+        Records finished searches and decides the cascade if it can.
+
+        Returns:
+            The products of the most specific level that found something, once
+            every more specific level has come back empty; [] if all levels came
+            back empty; None while that is not yet known.
+        """
+        for future in done:
+            self.results[self.running.pop(future)] = future.result()
+        for index in range(len(self.levels)):
+            if index not in self.results:
+                return None
+            if self.results[index]:
+                return self.results[index]
+        return []
+
+    def cancel(self):
+        for future in self.running:
+            future.cancel()
+
+
+def _search_cascade_speculative(keywords: list[str], broad: bool = True) -> list[dict]:
+    """
+    Runs the cascade levels concurrently and keeps the most specific hit.
+
+    Up to CASCADE_SPECULATIVE_LEVELS levels are in flight at once; a level
+    that comes back empty makes room for the next. Levels not yet started
+    when the answer is known are skipped, but running threads cannot be
+    interrupted and finish in the background (filling the caches).
+    """
+    cascade = _SpeculativeCascade(
+        keywords, broad, lambda level, query: _cascade_pool.submit(_search_level, level, query, keywords))
+    cascade.start_more()
+    try:
+        while cascade.running:
+            done, _ = wait(cascade.running, return_when=FIRST_COMPLETED)
+            products = cascade.finish(done)
+            if products is not None:
+                return products
+            cascade.start_more()
+        return []
+    finally:
+        cascade.cancel()
+
+
+async def _search_cascade_speculative_async(keywords: list[str], broad: bool = True) -> list[dict]:
+    """Async version of `_search_cascade_speculative`; searches still running are cancelled."""
+    cascade = _SpeculativeCascade(
+        keywords, broad, lambda level, query: asyncio.ensure_future(_search_level_async(level, query, keywords)))
+    cascade.start_more()
+    try:
+        while cascade.running:
+            done, _ = await asyncio.wait(cascade.running, return_when=asyncio.FIRST_COMPLETED)
+            products = cascade.finish(done)
+            if products is not None:
+                return products
+            cascade.start_more()
+        return []
+    finally:
+        cascade.cancel()
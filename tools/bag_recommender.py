@@ -1,65 +1,201 @@
+# tools/bag_recommender.py
+#
+# Rule-based style recommendations. The personality, occasion, outfit, color
+# and bag-style rules live in style_rules.json (or STYLE_RULES_PATH) and are
+# compiled once into a single regex, so a description is scanned in one pass
+# however many terms the rules contain.
+
+import itertools
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+
+STYLE_RULES_PATH = os.getenv(
+    "STYLE_RULES_PATH", os.path.join(os.path.dirname(__file__), "style_rules.json"))
+
+# Endings a term may carry and still match ("travel" matches "travelers",
+# "professional" matches "professionally"). The "l" forms cover doubled
+# consonants ("travelling"); terms ending in "y" also match as "ies"/"ied".
+INFLECTIONS = ("s", "es", "er", "ers", "ing", "ings", "ed", "ly", "ally", "en",
+               "ler", "lers", "ling", "led")
+
+
+@dataclass
+class StyleRecommendation:
+    """The outcome of matching a description against the style rules."""
+
+    keywords: list[str]
+    lines: list[str] = field(default_factory=list)
+    # Group name -> the terms that matched in it, for diagnostics.
+    matched: dict[str, list[str]] = field(default_factory=dict)
+
+    def as_text(self) -> str:
+        """The human-readable form returned by `get_style_recommendation`."""
+        lines = "".join(f"{line}\n" for line in self.lines)
+        return f"{lines}\nSearch Keywords: {', '.join(self.keywords)}"
+
+
+def _trie_pattern(terms) -> str:
+    """
+    Builds a regex alternation for `terms` that shares common prefixes.
+
+    "tote" and "travel" become `t(?:ote|ravel)`, so the regex engine follows
+    one branch per character instead of trying every term at every position.
+    Spaces inside terms match any run of whitespace.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        ends_here = "" in node
+        branches = [(r"\s+" if char == " " else re.escape(char)) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        return f"(?:{'|'.join(branches)})" + ("?" if ends_here else "")
+
+    return emit(trie)
+
+
+class StyleRuleEngine:
+    """
+    Matches style descriptions against groups of keyword rules.
+
+    Each group has rules of `terms` and `keywords` (plus an optional `text`
+    line). In a "first" group the earliest rule with a matching term wins,
+    falling back to the group's `default`; in an "all" group every matching
+    rule contributes. Terms match at the start of a word and may end with one
+    of the INFLECTIONS, so "red" no longer matches inside "preferred" but
+    "traveling" still matches "travel".
+    """
+
+    def __init__(self, groups: list[dict]):
+        self.groups = groups
+        self._rules_by_term = {}  # term -> [(group index, rule index)]
+        self._terms_by_form = {}  # matched stem ("partie") -> term ("party")
+        for g, group in enumerate(groups):
+            if group.get("match", "first") not in ("first", "all"):
+                raise ValueError(f"Unknown match mode in style rule group {group.get('name')!r}")
+            for r, rule in enumerate(group.get("rules", [])):
+                for term in rule["terms"]:
+                    term = " ".join(term.lower().split())
+                    self._rules_by_term.setdefault(term, []).append((g, r))
+                    self._terms_by_form[term] = term
+                    if term.endswith("y"):
+                        self._terms_by_form.setdefault(f"{term[:-1]}ie", term)
+
+        self._pattern = None
+        if self._rules_by_term:
+            endings = "|".join(sorted(INFLECTIONS, key=len, reverse=True))
+            # A lookahead, so overlapping terms ("party", "cocktail party") all match.
+            self._pattern = re.compile(
+                rf"\b(?=({_trie_pattern(self._terms_by_form)})(?:{endings})?\b)")
+
+    @classmethod
+    def from_file(cls, path: str = STYLE_RULES_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["groups"])
+
+    def __len__(self):
+        return len(self._rules_by_term)
+
+    def recommend(self, input_text: str) -> StyleRecommendation:
+        """
+        Generates a style recommendation and search keywords from text.
+
+        Args:
+            input_text: A free-form personality, outfit or occasion description.
+
+        Returns:
+            A StyleRecommendation with the deduplicated search keywords, in
+            rule order.
+        """
+        hits = [{} for _ in self.groups]  # per group: rule index -> matched terms
+        if self._pattern is not None:
+            for match in self._pattern.finditer(input_text.lower()):
+                term = self._terms_by_form[" ".join(match.group(1).split())]
+                for g, r in self._rules_by_term[term]:
+                    hits[g].setdefault(r, []).append(term)
+
+        keywords, lines, matched = [], [], {}
+        for group, group_hits in zip(self.groups, hits):
+            if not group_hits:
+                chosen = [group["default"]] if "default" in group else []
+            elif group.get("match", "first") == "first":
+                chosen = [group["rules"][min(group_hits)]]
+            else:
+                chosen = [group["rules"][r] for r in sorted(group_hits)]
+            if group_hits:
+                matched[group["name"]] = [t for r in sorted(group_hits) for t in group_hits[r]]
+
+            for rule in chosen:
+                if rule.get("text") and group.get("label"):
+                    lines.append(f"{group['label']}: {rule['text']}")
+                keywords += rule["keywords"]
+
+        return StyleRecommendation(list(dict.fromkeys(keywords)), lines, matched)
+
+    def keyword_sets(self, max_all_rules: int = 1) -> list[list[str]]:
+        """
+        Enumerates the keyword lists `recommend` can return.
+
+        A "first" group contributes one of its rules, or its default (or
+        nothing) when no rule matches; an "all" group contributes any
+        combination of up to `max_all_rules` of its rules, since every
+        combination of bag styles would multiply the count by 2^rules.
+
+        Returns:
+            The distinct, non-empty keyword lists, in rule order.
+        """
+        choices = []
+        for group in self.groups:
+            rules = [rule["keywords"] for rule in group.get("rules", [])]
+            if group.get("match", "first") == "first":
+                options = [[keywords] for keywords in rules]
+                options.append([group["default"]["keywords"]] if "default" in group else [])
+            else:
+                options = [list(combo) for size in range(min(max_all_rules, len(rules)) + 1)
+                           for combo in itertools.combinations(rules, size)]
+            choices.append(options)
+
+        keyword_sets = {}
+        for combination in itertools.product(*choices):
+            keywords = list(dict.fromkeys(k for option in combination for rule in option for k in rule))
+            if keywords:
+                keyword_sets.setdefault(tuple(keywords), keywords)
+        return list(keyword_sets.values())
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> StyleRuleEngine:
+    """Returns the rule engine compiled from STYLE_RULES_PATH, once per process."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = StyleRuleEngine.from_file(STYLE_RULES_PATH)
+    return _engine
+
+
+def recommend_style(input_text: str) -> StyleRecommendation:
+    """Matches a description against the configured style rules."""
+    return get_rule_engine().recommend(input_text)
+
+
 def get_style_recommendation(input_text: str) -> str:
     """
     Generates a detailed style recommendation and search keywords from text.
     Supports personality, outfit, occasion, color, and bag style descriptions.
     """
-    input_text = input_text.lower()
-    result = ""
-    style_keywords = []
-
-    # --- Personality-Based ---
-    if "artistic" in input_text:
-        result += "Recommended Style: A hand-painted crossbody or unique tote with floral or abstract patterns.\n"
-        style_keywords += ["hand painted", "artistic", "floral", "abstract"]
-    elif "professional" in input_text:
-        result += "Recommended Style: A structured tote or sleek satchel in neutral colors.\n"
-        style_keywords += ["structured", "tote", "leather", "neutral"]
-    elif "casual" in input_text:
-        result += "Recommended Style: A sling or backpack with playful, practical design.\n"
-        style_keywords += ["casual", "sling", "crossbody", "practical"]
-    elif "elegant" in input_text or "formal" in input_text:
-        result += "Recommended Style: A mini crossbody or clutch with metallic or jeweled accents.\n"
-        style_keywords += ["elegant", "clutch", "mini", "metallic"]
-    else:
-        result += "Recommended Style: A classic crossbody or satchel with subtle patterns.\n"
-        style_keywords += ["classic", "crossbody", "satchel"]
-
-    # --- Occasion-Based ---
-    if "office" in input_text:
-        result += "Occasion Match: Pairs well with workwear—choose a sleek, large-capacity tote.\n"
-        style_keywords += ["tote", "work", "office"]
-    elif "party" in input_text or "evening" in input_text:
-        result += "Occasion Match: Pairs with cocktail attire—consider metallic mini bags.\n"
-        style_keywords += ["evening", "metallic", "mini", "shiny"]
-    elif "travel" in input_text:
-        result += "Occasion Match: Practical bags for travel—opt for multi-compartment slings.\n"
-        style_keywords += ["travel", "sling", "crossbody", "compartment"]
-
-    # --- Outfit-Based ---
-    if "floral" in input_text:
-        result += "Outfit Match: Compliments floral patterns with nature-inspired artwork.\n"
-        style_keywords += ["floral", "garden", "nature"]
-    elif "denim" in input_text:
-        result += "Outfit Match: Earthy tones or bold contrast bags go well with denim.\n"
-        style_keywords += ["denim", "earthy", "tan", "contrast"]
-    elif "monochrome" in input_text or "solid" in input_text:
-        result += "Outfit Match: Use colorful patterns to stand out against plain outfits.\n"
-        style_keywords += ["colorful", "bold", "contrast"]
-
-    # --- Color Preference ---
-    if "red" in input_text:
-        style_keywords += ["red", "vibrant"]
-    elif "blue" in input_text:
-        style_keywords += ["blue", "cool tone"]
-    elif "gold" in input_text:
-        style_keywords += ["gold", "luxury"]
-
-    # --- Bag Style Mention ---
-    for style in ["tote", "sling", "clutch", "backpack", "satchel", "crossbody"]:
-        if style in input_text:
-            style_keywords.append(style)
-
-    # Final keyword cleanup
-    unique_keywords = sorted(set(style_keywords), key=style_keywords.index)
-    result += f"\nSearch Keywords: {', '.join(unique_keywords)}"
-    return result
+    return recommend_style(input_text).as_text()
@@ -0,0 +1,64 @@
+# tools/batching.py
+#
+# Micro-batching for model calls shared by concurrent requests.
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Groups items submitted by concurrent callers into batched calls.
+
+    A background thread waits for the first item, then collects more for at
+    most `max_wait` seconds (or until `batch_size` items), and calls
+    `batch_fn(items)` once. `batch_fn` must return one result per item, in
+    order. An exception fails every item of its batch.
+    """
+
+    def __init__(self, batch_fn, batch_size: int = 32, max_wait: float = 0.005, name: str = "batcher"):
+        self._batch_fn = batch_fn
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def run(self, item):
+        """Submits an item and blocks until its batch has been processed."""
+        return self.submit(item).result()
+
+    async def run_async(self, item):
+        """Submits an item and waits for its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # One deadline for the whole batch, not a fresh wait per item.
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                pass
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self._batch_fn([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
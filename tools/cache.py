@@ -0,0 +1,321 @@
+# tools/cache.py
+#
+# LRU + TTL caches for the search pipeline, with an optional SQLite backend
+# shared by every worker process.
+#
+# Tiers:
+#   PAGE_CACHE           product page URL -> parsed product (or None)
+#   QUERY_CACHE          DuckDuckGo query -> raw result list
+#   RECOMMENDATION_CACHE normalized keyword tuple -> final product list
+#
+# Each tier is sized with CACHE_<TIER>_SIZE and CACHE_<TIER>_TTL (seconds).
+# Set CACHE_DIR to also keep entries in CACHE_DIR/cache.sqlite3, so the
+# gunicorn workers warm one shared cache instead of four private ones.
+# Code on the event loop uses `aget`, `aget_stale` and `set_nowait`, which
+# keep the (blocking) SQLite calls off the loop.
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .telemetry import get_logger, register_collector
+
+MISSING = object()
+
+CACHE_DIR = os.getenv("CACHE_DIR")
+
+log = get_logger(__name__)
+
+
+# Connections inherited from the parent process, kept referenced so that
+# they are never used or closed (which could checkpoint the parent's WAL)
+# in a forked child.
+_inherited_connections = []
+
+
+class SqliteCacheBackend:
+    """
+    A JSON key/value store with expiry, safe to share between processes.
+
+    Each thread opens its own connection on first use, so importing this
+    module (e.g. in the gunicorn master) opens none, and a forked worker
+    starts over with fresh connections.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            _inherited_connections.append(conn)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, stale: bool = False):
+        """Returns (value, expires_at) for a live entry (or any entry if `stale`), or MISSING."""
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, 0 if stale else time.time())).fetchone()
+        return (json.loads(row[0]), row[1]) if row else MISSING
+
+    def set(self, namespace: str, key: str, value, expires_at: float):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                         (namespace, key, json.dumps(value), expires_at))
+
+    def prune(self):
+        """Deletes expired entries."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self, namespace: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Values must be JSON-serializable when a shared backend is configured.
+    Local misses fall through to the backend, and backend hits are copied
+    into the local LRU. Expired entries are kept until they are evicted or
+    pruned, so `get_stale` can still answer while an upstream is down.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 3600, backend=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._sets = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        value = self._get_local(key)
+        if value is MISSING and self.backend is not None:
+            value = self._get_shared(key)
+        return self._result(value, default)
+
+    async def aget(self, key, default=None):
+        """Like `get`, for the event loop: a shared backend read runs in a worker thread."""
+        value = self._get_local(key)
+        if value is MISSING and self.backend is not None:
+            value = await asyncio.to_thread(self._get_shared, key)
+        return self._result(value, default)
+
+    def _get_local(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        return MISSING
+
+    def _get_shared(self, key):
+        try:
+            stored = self.backend.get(self.name, _backend_key(key))
+        except sqlite3.Error as e:
+            log.warning("[⚠️] Shared cache read failed for %s: %s", self.name, e)
+            return MISSING
+        if stored is MISSING:
+            return MISSING
+        with self._lock:
+            self._store(key, *stored)
+            self.backend_hits += 1
+        return stored[0]
+
+    def _result(self, value, default):
+        if value is MISSING:
+            with self._lock:
+                self.misses += 1
+            return default
+        return value
+
+    def get_stale(self, key, default=None):
+        """Returns an entry whether or not it has expired, or `default`."""
+        value = self._get_stale_local(key)
+        if value is MISSING and self.backend is not None:
+            value = self._get_stale_shared(key)
+        return self._stale_result(value, default)
+
+    async def aget_stale(self, key, default=None):
+        """Like `get_stale`, for the event loop."""
+        value = self._get_stale_local(key)
+        if value is MISSING and self.backend is not None:
+            value = await asyncio.to_thread(self._get_stale_shared, key)
+        return self._stale_result(value, default)
+
+    def _get_stale_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return MISSING if entry is None else entry[0]
+
+    def _get_stale_shared(self, key):
+        try:
+            stored = self.backend.get(self.name, _backend_key(key), stale=True)
+        except sqlite3.Error as e:
+            log.warning("[⚠️] Shared cache read failed for %s: %s", self.name, e)
+            return MISSING
+        return MISSING if stored is MISSING else stored[0]
+
+    def _stale_result(self, value, default):
+        if value is MISSING:
+            return default
+        with self._lock:
+            self.stale_hits += 1
+        return value
+
+    def set(self, key, value):
+        expires_at, prune = self._set_local(key, value)
+        if self.backend is not None:
+            self._set_shared(key, value, expires_at, prune)
+
+    def set_nowait(self, key, value):
+        """
+        Like `set`, but queues the shared backend write instead of waiting for it.
+
+        Safe to call on the event loop: a write that waits for another
+        worker's lock then holds up the writer thread, not the requests.
+        """
+        expires_at, prune = self._set_local(key, value)
+        if self.backend is not None:
+            _get_writer().submit(self._set_shared, key, value, expires_at, prune)
+
+    def _set_local(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            self._sets += 1
+            return expires_at, self._sets % 500 == 0
+
+    def _set_shared(self, key, value, expires_at, prune):
+        try:
+            self.backend.set(self.name, _backend_key(key), value, expires_at)
+            if prune:
+                self.backend.prune()
+        except sqlite3.Error as e:
+            log.warning("[⚠️] Shared cache write failed for %s: %s", self.name, e)
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear(self.name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.backend_hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+            }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    """The single thread that applies `set_nowait` writes to the shared backend, in order."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+    return _writer
+
+
+def _backend_key(key) -> str:
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+def _tier(name: str, maxsize: int, ttl: float, backend) -> TTLCache:
+    prefix = f"CACHE_{name.upper()}"
+    return TTLCache(
+        name,
+        maxsize=int(os.getenv(f"{prefix}_SIZE", maxsize)),
+        ttl=float(os.getenv(f"{prefix}_TTL", ttl)),
+        backend=backend,
+    )
+
+
+_shared_backend = SqliteCacheBackend(os.path.join(CACHE_DIR, "cache.sqlite3")) if CACHE_DIR else None
+
+PAGE_CACHE = _tier("page", maxsize=2048, ttl=6 * 3600, backend=_shared_backend)
+QUERY_CACHE = _tier("query", maxsize=1024, ttl=3600, backend=_shared_backend)
+RECOMMENDATION_CACHE = _tier("recommendation", maxsize=1024, ttl=3600, backend=_shared_backend)
+LLM_CACHE = _tier("llm", maxsize=1024, ttl=24 * 3600, backend=_shared_backend)
+
+
+def recommendation_key(keywords: list[str]) -> tuple:
+    """Normalizes a keyword list (case, whitespace, duplicates) into a cache key."""
+    normalized = []
+    for keyword in keywords:
+        keyword = ' '.join(keyword.lower().split())
+        if keyword and keyword not in normalized:
+            normalized.append(keyword)
+    return tuple(normalized)
+
+
+def cache_stats() -> dict:
+    """Returns hit/miss counters and sizes for every cache tier."""
+    return {cache.name: cache.stats() for cache in (PAGE_CACHE, QUERY_CACHE, RECOMMENDATION_CACHE, LLM_CACHE)}
+
+
+@register_collector
+def _cache_metrics() -> list[str]:
+    lines = ["# HELP persona_cache_lookups_total Cache lookups by tier and result.",
+             "# TYPE persona_cache_lookups_total counter"]
+    stats = cache_stats()
+    for name, tier in stats.items():
+        for result in ("hits", "shared_hits", "misses", "stale_hits"):
+            lines.append(f'persona_cache_lookups_total{{cache="{name}",result="{result}"}} {tier[result]}')
+    lines += ["# HELP persona_cache_entries Entries held in each local cache tier.",
+              "# TYPE persona_cache_entries gauge"]
+    for name, tier in stats.items():
+        lines.append(f'persona_cache_entries{{cache="{name}"}} {tier["size"]}')
+    return lines
@@ -0,0 +1,329 @@
+# tools/catalog.py
+#
+# Offline product catalog backed by SQLite.
+#
+# Build or refresh it from the live store with:
+#     python -m tools.catalog ingest
+# and query it with:
+#     python -m tools.catalog search "floral crossbody"
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from . import local_search_anuschka, upstream
+from .extractors import build_product, parse_product_page
+from .local_search_anuschka import get_session
+from .telemetry import get_logger
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join("data", "catalog.sqlite3"))
+
+log = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    price TEXT NOT NULL,
+    image_url TEXT NOT NULL,
+    description TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    checked_at REAL NOT NULL
+)
+"""
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class ProductCatalog:
+    """
+    An on-disk store of scraped products, in the same shape `search_products` returns.
+
+    Each thread gets its own SQLite connection, so one catalog can be shared by
+    the FastAPI thread pool and the ingest workers. Another process (usually
+    `python -m tools.catalog ingest`) may write to the same file at any time;
+    `version` tells readers when it has.
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._count = None  # (version, count)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Closes this thread's connection, e.g. before forking worker processes."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def version(self) -> tuple:
+        """
+        Returns a value that changes whenever the catalog is written, by any process.
+
+        In WAL mode a commit appends to the `-wal` file and a checkpoint
+        rewrites the database file, so the modification time and size of
+        the two change with every write. Unlike SQLite's `PRAGMA
+        data_version`, this needs no connection, so it stays comparable
+        across the fork into worker processes.
+        """
+        stamps = []
+        for path in (self.path, f"{self.path}-wal"):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def count(self) -> int:
+        """
+        Returns the number of stored products.
+
+        Searches check the count on every call, so it is cached until the
+        catalog's `version` changes.
+        """
+        version = self.version()
+        cached = self._count
+        if cached is None or cached[0] != version:
+            count = self._connect().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            cached = self._count = (version, count)
+        return cached[1]
+
+    def validators(self, url: str):
+        """Returns the stored (etag, last_modified) pair for a URL, or (None, None)."""
+        row = self._connect().execute(
+            "SELECT etag, last_modified FROM products WHERE url = ?", (url,)).fetchone()
+        return (row["etag"], row["last_modified"]) if row else (None, None)
+
+    def upsert(self, product: dict, etag: str = None, last_modified: str = None):
+        """Stores a product dictionary along with the HTTP validators of its page."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO products (url, title, price, image_url, description,
+                                      etag, last_modified, fetched_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    title = excluded.title, price = excluded.price,
+                    image_url = excluded.image_url, description = excluded.description,
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    fetched_at = excluded.fetched_at, checked_at = excluded.checked_at
+                """,
+                (product['url'], product['title'], product['price'], product['image_url'],
+                 product['description'], etag, last_modified, now, now))
+
+    def touch(self, url: str):
+        """Records that a page was revalidated and has not changed."""
+        with self._connect() as conn:
+            conn.execute("UPDATE products SET checked_at = ? WHERE url = ?",
+                         (time.time(), url))
+
+    def remove(self, url: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM products WHERE url = ?", (url,))
+
+    def all_products(self) -> list[dict]:
+        rows = self._connect().execute(
+            "SELECT url, title, price, image_url, description FROM products ORDER BY rowid")
+        return [_row_to_product(row) for row in rows]
+
+    def search(self, query: str, max_results=5) -> list[dict]:
+        """
+        Looks up products whose title or description contains the query terms.
+
+        Products matching more terms rank higher; an empty query returns the
+        whole catalog in insertion order (the broad search).
+
+        Args:
+            query: Space separated search terms.
+            max_results: The maximum number of products to return.
+
+        Returns:
+            A list of product dictionaries.
+        """
+        terms = _TOKEN_RE.findall(query.lower())
+        if not terms:
+            return self.all_products()[:max_results]
+
+        clause = " OR ".join(["(title || ' ' || description) LIKE ?"] * len(terms))
+        rows = self._connect().execute(
+            f"SELECT url, title, price, image_url, description FROM products "
+            f"WHERE {clause} ORDER BY rowid",
+            [f"%{term}%" for term in terms]).fetchall()
+
+        def score(row):
+            text = f"{row['title']} {row['description']}".lower()
+            return sum(term in text for term in terms)
+
+        rows.sort(key=score, reverse=True)
+        return [_row_to_product(row) for row in rows[:max_results]]
+
+
+def _row_to_product(row) -> dict:
+    return build_product(row["url"], row["title"], row["price"],
+                         row["image_url"], row["description"])
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Returns the shared catalog, or None if no catalog has been built yet."""
+    global _catalog
+    if _catalog is None:
+        if not os.path.exists(CATALOG_PATH):
+            return None
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ProductCatalog(CATALOG_PATH)
+    return _catalog
+
+
+def discover_product_urls(base_url: str = None) -> list[str]:
+    """
+    Lists every product page URL from the store's Shopify sitemaps.
+
+    `/sitemap.xml` is an index pointing at `sitemap_products_*.xml` files, which
+    in turn list the product pages.
+    """
+    base_url = base_url or local_search_anuschka.BASE_URL
+    session = get_session()
+
+    def locs(url):
+        with upstream.request(url) as call:
+            resp = session.get(url, timeout=local_search_anuschka.REQUEST_TIMEOUT)
+            call.response(resp.status_code)
+        resp.raise_for_status()
+        root = ET.fromstring(resp.content)
+        return [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+
+    entries = locs(f"{base_url}/sitemap.xml")
+    product_sitemaps = [u for u in entries if "sitemap_products" in u]
+    if product_sitemaps:
+        pages = [page for sitemap in product_sitemaps for page in locs(sitemap)]
+    else:
+        # Not a sitemap index; the entries are the pages themselves.
+        pages = entries
+    return [page for page in pages if "/products/" in page]
+
+
+def refresh_product(catalog: ProductCatalog, url: str) -> str:
+    """
+    Re-fetches one product page if it changed since it was last stored.
+
+    The stored ETag and Last-Modified values are sent as conditional headers,
+    so unchanged pages cost a 304 with no body.
+
+    Returns:
+        One of "unchanged", "updated", "discarded" or "failed".
+    """
+    etag, last_modified = catalog.validators(url)
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    try:
+        with upstream.request(url) as call:
+            resp = get_session().get(url, headers=headers,
+                                     timeout=local_search_anuschka.REQUEST_TIMEOUT)
+            call.response(resp.status_code)
+        if resp.status_code == 304:
+            catalog.touch(url)
+            return "unchanged"
+        if resp.status_code == 404:
+            catalog.remove(url)
+            return "discarded"
+        resp.raise_for_status()
+    except (requests.exceptions.RequestException, upstream.UpstreamUnavailable) as e:
+        log.warning("[⚠️] Request failed for %s: %s", url, e)
+        return "failed"
+
+    product = parse_product_page(resp.content, url)
+    if not product:
+        return "discarded"
+    catalog.upsert(product, etag=resp.headers.get('ETag'),
+                   last_modified=resp.headers.get('Last-Modified'))
+    return "updated"
+
+
+def ingest(catalog: ProductCatalog, urls: list[str] = None, max_concurrency: int = None) -> dict:
+    """
+    Crawls product pages into the catalog, skipping pages that have not changed.
+
+    Args:
+        catalog: The catalog to fill.
+        urls: Product page URLs to refresh. Defaults to every page in the sitemap.
+        max_concurrency: Pages fetched at the same time. Defaults to the
+            live scraper's SCRAPE_MAX_CONCURRENCY.
+
+    Returns:
+        A dictionary counting the outcome of each page.
+    """
+    if urls is None:
+        urls = discover_product_urls()
+    log.info("[📚] Refreshing %s product pages into %s", len(urls), catalog.path)
+
+    stats = {"unchanged": 0, "updated": 0, "discarded": 0, "failed": 0}
+    workers = max_concurrency or local_search_anuschka.MAX_CONCURRENT_FETCHES
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        futures = {pool.submit(refresh_product, catalog, url): url for url in urls}
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # One page that does not parse must not abort the whole run.
+                log.warning("[⚠️] Refreshing %s failed: %s", futures[future], e)
+                outcome = "failed"
+            stats[outcome] += 1
+    log.info("[🎉] Catalog refresh done: %s", stats)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the offline product catalog.")
+    parser.add_argument("--path", default=CATALOG_PATH, help="SQLite catalog file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_cmd = commands.add_parser("ingest", help="crawl or refresh product pages")
+    ingest_cmd.add_argument("urls", nargs="*", help="product URLs (default: sitemap)")
+    search_cmd = commands.add_parser("search", help="query the catalog")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--max-results", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    catalog = ProductCatalog(args.path)
+    if args.command == "ingest":
+        ingest(catalog, args.urls or None)
+    else:
+        for product in catalog.search(args.query, max_results=args.max_results):
+            print(f"{product['title']}  {product['price']}  {product['url']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# tools/extractors.py
+#
+# Product page extractors. Each one turns product page HTML into a product
+# dictionary, or returns None when it cannot find the essentials (title and
+# image). `parse_product_page` tries the registered extractors in order.
+
+import json
+import re
+from urllib.parse import urljoin
+
+from .telemetry import get_logger, span
+
+_HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+
+log = get_logger(__name__)
+
+CURRENCY_SYMBOLS = {"USD": "$", "CAD": "$", "AUD": "$", "EUR": "€", "GBP": "£"}
+
+
+def build_product(url: str, title: str, price: str, image_url: str, description: str) -> dict:
+    """Builds the product dictionary returned to the frontend."""
+    return {
+        'id': str(hash(url)),  # Generate unique ID from URL
+        'name': title,  # Map title to name for frontend
+        'title': title,  # Keep original for backwards compatibility
+        'price': price,
+        'link': url,  # Map url to link for frontend
+        'url': url,  # Keep original for backwards compatibility
+        'image': image_url,  # Map image_url to image for frontend
+        'image_url': image_url,  # Keep original for backwards compatibility
+        'description': description,
+    }
+
+
+def _json_ld_product(blocks: list[str]):
+    """Returns the first schema.org Product object among JSON-LD blocks, if any."""
+    for block in blocks:
+        try:
+            data = json.loads(block)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and item.get('@type') == 'Product':
+                return item
+    return None
+
+
+def _json_ld_image(data: dict) -> str:
+    image_data = data.get('image')
+    if isinstance(image_data, list) and image_data:
+        image_data = image_data[0]
+    if isinstance(image_data, dict):
+        image_data = image_data.get('url')
+    return image_data if isinstance(image_data, str) else ''
+
+
+def _format_price(amount, currency) -> str:
+    if amount in (None, ''):
+        return ''
+    try:
+        amount = f"{float(str(amount).replace(',', '')):,.2f}"
+    except ValueError:
+        amount = str(amount)
+    symbol = CURRENCY_SYMBOLS.get((currency or '').upper())
+    if symbol:
+        return f"{symbol}{amount}"
+    return f"{amount} {currency}".strip()
+
+
+class ProductExtractor:
+    """Base class for extractors. Subclasses implement `extract`."""
+
+    name = "base"
+
+    def extract(self, html: bytes, url: str):
+        raise NotImplementedError
+
+
+class HeadMetaExtractor(ProductExtractor):
+    """
+    Fast path: reads JSON-LD and Open Graph / product meta tags from <head> only.
+
+    Shopify product pages carry og:title, og:image, og:description and
+    og:price:amount in the head, so the (much larger) body never needs to be
+    parsed. Only the bytes before </head> are handed to lxml.
+    """
+
+    name = "head"
+
+    def extract(self, html: bytes, url: str):
+        match = _HEAD_END_RE.search(html)
+        head = html[:match.start()] if match else html
+        return self.extract_head(head, url)
+
+    def extract_head(self, head: bytes, url: str):
+        import lxml.html
+
+        try:
+            root = lxml.html.document_fromstring(head + b"</head><body></body></html>")
+        except (ValueError, lxml.etree.ParserError):
+            return None
+
+        meta = {}
+        for el in root.iter("meta"):
+            key = el.get("property") or el.get("name")
+            if key and el.get("content") and key not in meta:
+                meta[key] = el.get("content").strip()
+
+        data = _json_ld_product(
+            [el.text for el in root.iter("script")
+             if el.get("type") == "application/ld+json" and el.text]) or {}
+
+        title = (data.get('name') or meta.get('og:title') or '').strip()
+        if not title:
+            title_el = root.find(".//title")
+            title = title_el.text_content().strip() if title_el is not None else ''
+
+        image_url = _json_ld_image(data) or meta.get('og:image') or meta.get('og:image:secure_url', '')
+        if image_url.startswith('//'):
+            image_url = f"https:{image_url}"
+
+        offers = data.get('offers')
+        if isinstance(offers, list):
+            offers = offers[0] if offers else None
+        price = ''
+        if isinstance(offers, dict):
+            price = _format_price(offers.get('price'), offers.get('priceCurrency'))
+        if not price:
+            price = _format_price(
+                meta.get('og:price:amount') or meta.get('product:price:amount'),
+                meta.get('og:price:currency') or meta.get('product:price:currency'))
+
+        description = (data.get('description') or meta.get('og:description')
+                       or meta.get('description') or '').strip()
+
+        # Without a price the body has to be parsed anyway; let the full
+        # extractor handle the page.
+        if not (title and image_url and price):
+            return None
+        return build_product(url, title, price, image_url, description)
+
+
+class SoupExtractor(ProductExtractor):
+    """The full BeautifulSoup parse with theme-specific CSS selectors; the fallback."""
+
+    name = "soup"
+
+    def extract(self, html: bytes, url: str):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, 'html.parser')
+
+        title_el = soup.select_one(
+            'h1.product__title, h1.product-title, h1, title')
+        title = title_el.get_text(strip=True) if title_el else 'N/A'
+        log.debug("[🏷️] Found title: %s", title != 'N/A')
+
+        price_el = soup.select_one(
+            '.price__regular .price-item, .product__price, .price, .product-price')
+        price = price_el.get_text(
+            strip=True) if price_el else 'Price not available'
+        log.debug("[💰] Found price: %s", price != 'Price not available')
+
+        # --- NEW, MORE ROBUST IMAGE EXTRACTION STRATEGY ---
+        image_url = ''
+
+        # 1. Try to find JSON-LD structured data (most reliable method)
+        json_ld_script = soup.find(
+            'script', {'type': 'application/ld+json'})
+        if json_ld_script:
+            try:
+                data = json.loads(json_ld_script.string)
+                if isinstance(data, list):
+                    data = data[0]
+                if data.get('@type') == 'Product':
+                    image_data = data.get('image')
+                    if isinstance(image_data, list) and image_data:
+                        image_url = image_data[0]
+                    elif isinstance(image_data, str):
+                        image_url = image_data
+                    if image_url:
+                        log.debug("[✅] Found image URL in JSON-LD data: %s", image_url)
+            except (json.JSONDecodeError, KeyError, IndexError) as e:
+                log.warning("[⚠️] Could not parse JSON-LD data on %s: %s", url, e)
+
+        # 2. If JSON-LD fails, try Open Graph meta tags (very reliable)
+        if not image_url:
+            og_image = soup.find('meta', {'property': 'og:image'})
+            if og_image and og_image.get('content'):
+                image_url = og_image['content']
+                log.debug("[✅] Found image URL in Open Graph meta tag: %s", image_url)
+
+        # 3. If that fails, try a broad set of CSS selectors
+        if not image_url:
+            selectors = [
+                'figure.product__media img',
+                '.product-gallery__image img',
+                '.product-image-main img',
+                'img.product-gallery__image',
+                'img.product__image'
+            ]
+            image_element = soup.select_one(', '.join(selectors))
+            if image_element:
+                src = image_element.get(
+                    'src') or image_element.get('data-src')
+                if src:
+                    if src.startswith('//'):
+                        image_url = f"https:{src}"
+                    else:
+                        image_url = urljoin(url, src)
+                    log.debug("[🖼️] Successfully extracted image URL with CSS selector: %s", image_url)
+
+        if not image_url:
+            log.debug("[❌] Could not find an image URL for this product: %s", url)
+
+        desc = soup.select_one(
+            '.product__description, .product-description, .product__info-content')
+        description = desc.get_text(strip=True) if desc else ''
+
+        # Only add product if we have the essential details
+        if title == 'N/A' or not image_url:
+            log.warning("[❌] Discarding product due to missing title or image: %s", url)
+            return None
+
+        return build_product(url, title, price, image_url, description)
+
+
+HEAD_EXTRACTOR = HeadMetaExtractor()
+
+# Tried in order by parse_product_page; register faster extractors first.
+EXTRACTORS = [HEAD_EXTRACTOR, SoupExtractor()]
+
+
+def register_extractor(extractor: ProductExtractor, first: bool = True):
+    """Adds an extractor to the chain, by default ahead of the built-in ones."""
+    if first:
+        EXTRACTORS.insert(0, extractor)
+    else:
+        EXTRACTORS.append(extractor)
+
+
+def parse_product_page(content: bytes, url: str, extractors=None):
+    """
+    Parses a product page into a product dictionary.
+
+    Args:
+        content: The raw HTML of the product page.
+        url: The URL the page was fetched from.
+        extractors: The extractors to try, in order (default EXTRACTORS).
+
+    Returns:
+        The product dictionary from the first extractor that succeeds, or
+        None if none of them find the title and image.
+    """
+    for extractor in EXTRACTORS if extractors is None else extractors:
+        with span(f"parse.{extractor.name}"):
+            product = extractor.extract(content, url)
+        if product:
+            return product
+    return None
+
+
+class StreamingParse:
+    """
+    Parses a product page while it downloads, so reading can stop early.
+
+    Feed body chunks as they arrive. Once </head> has arrived the head
+    extractor is tried, and if it finds the product `feed` returns it and the
+    rest of the body need not be read. Otherwise call `finish` after the last
+    chunk to run the remaining extractors over the whole page.
+
+    With `try_head=False` chunks are only buffered and `finish` runs the
+    whole extractor chain.
+    """
+
+    def __init__(self, url: str, try_head: bool = True):
+        self.url = url
+        self.try_head = try_head
+        self.head_checked = False
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes):
+        # Only rescan the new bytes (plus enough overlap for a split tag).
+        scan_from = max(len(self._buffer) - 16, 0)
+        self._buffer += chunk
+        if self.head_checked or not self.try_head:
+            return None
+        match = _HEAD_END_RE.search(self._buffer, scan_from)
+        if not match:
+            return None
+        self.head_checked = True
+        with span("parse.head"):
+            return HEAD_EXTRACTOR.extract_head(bytes(self._buffer[:match.start()]), self.url)
+
+    def finish(self):
+        remaining = [e for e in EXTRACTORS if e is not HEAD_EXTRACTOR] if self.head_checked else None
+        return parse_product_page(bytes(self._buffer), self.url, remaining)
+
+
+def extract_streaming(chunks, url: str, try_head: bool = True):
+    """
+    Parses a product page from an iterable of body chunks, stopping early when possible.
+
+    Returns:
+        A (product, read_whole_body) pair.
+    """
+    parse = StreamingParse(url, try_head)
+    for chunk in chunks:
+        product = parse.feed(chunk)
+        if product:
+            return product, False
+    return parse.finish(), True
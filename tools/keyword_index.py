@@ -0,0 +1,198 @@
+# tools/keyword_index.py
+#
+# In-memory inverted index with BM25 ranking over product titles and descriptions.
+
+import math
+import os
+import re
+import threading
+import time
+
+from .telemetry import get_logger
+
+# Seconds between checks for catalog changes made by other processes, such
+# as a `python -m tools.catalog ingest` run from cron.
+KEYWORD_INDEX_CHECK_SECONDS = float(os.getenv("KEYWORD_INDEX_CHECK_SECONDS", "10"))
+
+log = get_logger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases text, splits it into words and folds simple plurals ("totes" -> "tote")."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def keyword_weights(keywords: list[str]) -> dict:
+    """
+    Turns an ordered keyword list into per-term query weights.
+
+    The first three keywords (the old primary search) count fully and the rest
+    count half, so one ranked query keeps the priorities of the search cascade.
+    """
+    weights = {}
+    for position, keyword in enumerate(keywords):
+        weight = 1.0 if position < 3 else 0.5
+        for term in tokenize(keyword):
+            weights[term] = max(weights.get(term, 0.0), weight)
+    return weights
+
+
+class KeywordIndex:
+    """
+    An inverted index of products, ranked with Okapi BM25.
+
+    Products are keyed by URL; adding a product that is already indexed
+    replaces it, so the index can be updated as new pages are scraped.
+    """
+
+    def __init__(self, products: list[dict] = None, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.from_catalog = False
+        self.catalog_version = None  # ProductCatalog.version() it was built from
+        self._lock = threading.Lock()
+        self._products = {}   # doc id -> product
+        self._doc_ids = {}    # url -> doc id
+        self._doc_lengths = {}
+        self._doc_terms = {}  # doc id -> distinct terms, for removal
+        self._postings = {}   # term -> {doc id: term frequency}
+        self._total_length = 0
+        self._next_id = 0
+        for product in products or []:
+            self.add(product)
+
+    def __len__(self):
+        return len(self._products)
+
+    def add(self, product: dict):
+        """Indexes a product, replacing any earlier version with the same URL."""
+        tokens = tokenize(f"{product.get('title', '')} {product.get('description', '')}")
+        with self._lock:
+            url = product.get('url')
+            if url in self._doc_ids:
+                self._remove(self._doc_ids[url])
+            doc_id = self._next_id
+            self._next_id += 1
+            self._products[doc_id] = product
+            if url:
+                self._doc_ids[url] = doc_id
+            self._doc_lengths[doc_id] = len(tokens)
+            self._total_length += len(tokens)
+            self._doc_terms[doc_id] = set(tokens)
+            for token in tokens:
+                postings = self._postings.setdefault(token, {})
+                postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    def add_many(self, products: list[dict]):
+        for product in products:
+            self.add(product)
+
+    def remove(self, url: str):
+        """Drops the product with this URL, if it is indexed."""
+        with self._lock:
+            doc_id = self._doc_ids.pop(url, None)
+            if doc_id is not None:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: int):
+        del self._products[doc_id]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, keywords: list[str], top_k=5) -> list[dict]:
+        """
+        Ranks indexed products against all keywords at once.
+
+        Args:
+            keywords: Search keywords, most important first.
+            top_k: The maximum number of products to return.
+
+        Returns:
+            Products that match at least one keyword, best match first.
+        """
+        weights = keyword_weights(keywords)
+        with self._lock:
+            doc_count = len(self._products)
+            if not doc_count or not weights:
+                return []
+            avg_length = self._total_length / doc_count or 1.0
+            scores = {}
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + \
+                        weight * idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+            return [self._products[doc_id] for doc_id in ranked[:top_k]]
+
+
+_index = None
+_index_lock = threading.Lock()
+_checked_at = 0.0
+
+
+def _build_index() -> KeywordIndex:
+    from . import local_search_anuschka
+    from .catalog import get_catalog
+
+    index = KeywordIndex()
+    catalog = get_catalog() if local_search_anuschka.SEARCH_BACKEND != "live" else None
+    if catalog is not None:
+        # Taken before reading, so a write during the read is picked up by the next check.
+        index.catalog_version = catalog.version()
+        index.add_many(catalog.all_products())
+        index.from_catalog = len(index) > 0
+        log.info("[📇] Built keyword index over %s catalog products.", len(index))
+    return index
+
+
+def _catalog_changed(index: KeywordIndex) -> bool:
+    from . import local_search_anuschka
+    from .catalog import get_catalog
+
+    if local_search_anuschka.SEARCH_BACKEND == "live":
+        return False
+    catalog = get_catalog()
+    return (catalog.version() if catalog is not None else None) != index.catalog_version
+
+
+def get_keyword_index() -> KeywordIndex:
+    """
+    Returns the process-wide product index, building it on first use.
+
+    The index is built from the offline catalog when one exists, and rebuilt
+    when the catalog has changed (checked at most every
+    KEYWORD_INDEX_CHECK_SECONDS), so ingests by another process reach every
+    worker. While one thread rebuilds, the others keep using the old index.
+    In live mode it stays empty.
+    """
+    global _index, _checked_at
+    index = _index
+    if index is not None and time.monotonic() - _checked_at < KEYWORD_INDEX_CHECK_SECONDS:
+        return index
+    # Only the first build makes callers wait.
+    if not _index_lock.acquire(blocking=index is None):
+        return index
+    try:
+        if _index is None or time.monotonic() - _checked_at >= KEYWORD_INDEX_CHECK_SECONDS:
+            if _index is None or _catalog_changed(_index):
+                _index = _build_index()
+            _checked_at = time.monotonic()
+        return _index
+    finally:
+        _index_lock.release()
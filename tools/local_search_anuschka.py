@@ -1,157 +1,643 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import aclosing, closing
 import requests
-from bs4 import BeautifulSoup
-import json
-from duckduckgo_search import DDGS
-from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from . import upstream
+from .cache import MISSING, PAGE_CACHE, QUERY_CACHE
+from .extractors import StreamingParse, extract_streaming
+from .singleflight import SingleFlight
+from .telemetry import SCRAPE_FAILURES, get_logger, span
+from urllib.parse import urlparse
 
-def search_products(query: str, max_results=5):
+# Overridable so the scraper can be pointed at a local stub server.
+BASE_URL = os.getenv("ANUSCHKA_BASE_URL", "https://anuschkaleather.com")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Maximum number of product pages fetched at the same time for one search.
+MAX_CONCURRENT_FETCHES = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "5"))
+# Deadline (seconds) for a single product page, connect + full body.
+REQUEST_TIMEOUT = float(os.getenv("SCRAPE_REQUEST_TIMEOUT", "10"))
+# Deadline (seconds) for all product page fetches of one search.
+OVERALL_DEADLINE = float(os.getenv("SCRAPE_OVERALL_DEADLINE", "25"))
+# Where search_products gets its products from: "live" (DuckDuckGo + scraping),
+# "catalog" (the offline catalog from tools/catalog.py) or "auto" (the catalog
+# when one has been built, live otherwise).
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# Parse product pages from their <head> meta data when possible and stop
+# downloading there (see tools/extractors.py). Set to 0 to always read the
+# whole page.
+FAST_EXTRACTION = os.getenv("FAST_EXTRACTION", "1") != "0"
+# After a <head>-only extraction the rest of the page is still read (but not
+# parsed) up to this many bytes, so its connection goes back to the pool.
+# Longer pages are cut off and their connection is closed. 0 never drains.
+DRAIN_MAX_BYTES = int(os.getenv("SCRAPE_DRAIN_MAX_BYTES", str(512 * 1024)))
+
+_session = None
+_session_lock = threading.Lock()
+_fetch_pool = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_FETCHES * 4, thread_name_prefix="scrape")
+_async_clients = weakref.WeakKeyDictionary()
+# Concurrent identical searches and page fetches share one in-flight call.
+_search_flight = SingleFlight("search")
+_page_flight = SingleFlight("page fetch")
+
+log = get_logger(__name__)
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide HTTP session used for product pages.
+
+    The session keeps connections to the store alive between requests, so
+    concurrent fetches reuse a small pool instead of a new TLS handshake each.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=MAX_CONCURRENT_FETCHES * 4)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(HEADERS)
+                _session = session
+    return _session
+
+
+def _ddgs_text(site_query: str, max_results: int = 15) -> list[dict]:
+    """Runs the DuckDuckGo text search and returns the raw result dicts."""
+    from duckduckgo_search import DDGS
+
+    with DDGS() as ddgs:
+        return list(ddgs.text(site_query, max_results=max_results))
+
+
+def _search_ddgs(site_query: str) -> list[dict]:
+    """
+    Returns DuckDuckGo results for a query, from QUERY_CACHE when possible.
+
+    While DuckDuckGo is throttled or failing (see tools/upstream.py), an
+    expired cache entry is returned instead, if there is one.
+    """
+    results = QUERY_CACHE.get(site_query)
+    if results is not None:
+        log.debug("[💾] Using cached DDGS results for: %s", site_query)
+        return results
+    try:
+        # Get more results to increase chances of finding valid products
+        with upstream.request(upstream.DDGS_HOST, timeout=REQUEST_TIMEOUT), span("ddgs.query"):
+            results = _ddgs_text(site_query, max_results=15)
+    except upstream.UpstreamUnavailable as e:
+        results = QUERY_CACHE.get_stale(site_query)
+        if results is None:
+            raise
+        log.warning("[🕰️] %s; using stale DDGS results for: %s", e, site_query)
+        return results
+    if results:
+        QUERY_CACHE.set(site_query, results)
+    return results
+
+
+def _product_urls(results: list[dict]) -> list[str]:
+    """Returns the unique product page URLs from search results, in rank order."""
+    marker = f"{urlparse(BASE_URL).netloc}/products/"
+    urls = []
+    seen_urls = set()
+    for r in results:
+        url = r.get('href') or r.get('url')
+        # Ensure we are only processing valid product pages
+        if not url or marker not in url:
+            continue
+
+        url = url.split('?')[0]  # Clean up URL parameters
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+        urls.append(url)
+    return urls
+
+
+class _DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+def _iter_body(resp, url: str, request_deadline: float, timeout: float):
+    """
+    Yields the response body in chunks, enforcing a hard deadline.
+
+    `requests` only bounds the time between socket reads, so the body is
+    streamed and the download is abandoned once the deadline has passed.
     """
-    Searches for products on the Anuschka Leather website using DuckDuckGo and scrapes product details.
+    for chunk in resp.iter_content(chunk_size=16384):
+        yield chunk
+        if time.monotonic() > request_deadline:
+            raise _DeadlineExceeded(
+                f"Deadline of {timeout:.1f}s exceeded while reading {url}")
+
+
+def _drain_allowed(resp) -> bool:
+    length = resp.headers.get("Content-Length")
+    return DRAIN_MAX_BYTES > 0 and not (length and length.isdigit() and int(length) > DRAIN_MAX_BYTES)
+
+
+def _drain(resp, chunks):
+    """
+    Reads the rest of a response without parsing it, so the session can reuse its connection.
+
+    Gives up (and lets the connection close) past DRAIN_MAX_BYTES, the
+    request deadline or a read error; the product is already extracted.
+    """
+    if not _drain_allowed(resp):
+        return
+    read = 0
+    try:
+        for chunk in chunks:
+            read += len(chunk)
+            if read > DRAIN_MAX_BYTES:
+                return
+    except requests.exceptions.RequestException:
+        pass
+
+
+def _download_and_parse(url: str, deadline: float):
+    """
+    Downloads a product page through the shared session and parses it.
+
+    Parsing stops once the head extractor has what it needs (see
+    tools/extractors.py); the rest of a normal-sized page is drained unparsed
+    so the connection stays in the pool.
+
+    Only the request up to the response headers is governed (see
+    tools/upstream.py), so a page that fails to parse is not held against
+    its host.
+    """
+    with upstream.request(url, timeout=max(deadline - time.monotonic(), 0)) as call:
+        timeout = min(REQUEST_TIMEOUT, max(deadline - time.monotonic(), 0.1))
+        request_deadline = time.monotonic() + timeout
+        resp = get_session().get(url, timeout=timeout, stream=True)
+        call.response(resp.status_code)
+    with resp:
+        log.debug("[📈] HTTP Status for %s: %s", url, resp.status_code)
+        resp.raise_for_status()
+        chunks = _iter_body(resp, url, request_deadline, timeout)
+        product, read_whole_body = extract_streaming(chunks, url, try_head=FAST_EXTRACTION)
+        if not read_whole_body:
+            log.debug("[⚡] Extracted product from page head: %s", url)
+            _drain(resp, chunks)
+        return product
+
+
+def _fetch_product(url: str, deadline: float):
+    """Fetches and parses one product page. Returns None on any failure."""
+    cached = PAGE_CACHE.get(url, MISSING)
+    if cached is not MISSING:
+        return cached
+    return _page_flight.do(url, _scrape_product, url, deadline)
+
+
+def _scrape_product(url: str, deadline: float):
+    log.debug("[🔗] Processing product page: %s", url)
+    try:
+        with span("page.fetch"):
+            product = _download_and_parse(url, deadline)
+        PAGE_CACHE.set(url, product)
+        if product:
+            log.debug("[✅] Successfully scraped product: %s", product['title'])
+        else:
+            SCRAPE_FAILURES.inc(reason="no_product")
+        return product
+    except upstream.UpstreamUnavailable as e:
+        return _stale_product(url, e, PAGE_CACHE.get_stale(url, MISSING))
+    except requests.exceptions.Timeout as e:
+        SCRAPE_FAILURES.inc(reason="timeout")
+        log.warning("[⚠️] Request failed for %s: %s", url, e)
+    except requests.exceptions.RequestException as e:
+        SCRAPE_FAILURES.inc(reason="request")
+        log.warning("[⚠️] Request failed for %s: %s", url, e)
+    except Exception as e:
+        SCRAPE_FAILURES.inc(reason="error")
+        log.warning("[⚠️] Error scraping %s: %s", url, e)
+    return None
+
+
+def _stale_product(url: str, reason: Exception, product):
+    """
+    Answers for a page that cannot be fetched now.
+
+    `product` is its expired PAGE_CACHE entry, or MISSING; the caller looks it
+    up, so the async path can do so off the event loop.
+    """
+    if product is not MISSING:
+        log.info("[🕰️] %s; using stale page for %s", reason, url)
+        return product
+    SCRAPE_FAILURES.inc(reason="unavailable")
+    log.warning("[⚠️] Skipped %s: %s", url, reason)
+    return None
+
+
+def _ranked_prefix(parsed: dict, total: int, max_results: int):
+    """
+    Returns the first `max_results` products in rank order once they are known.
+
+    Returns None while a higher-ranked page is still in flight, because it
+    could still turn out to be a valid product.
+    """
+    products = []
+    for index in range(total):
+        if index not in parsed:
+            return None
+        if parsed[index]:
+            products.append(parsed[index])
+            if len(products) >= max_results:
+                return products
+    return products
+
+
+def iter_product_pages(urls: list[str], max_concurrency=None, deadline=None):
+    """
+    Fetches product pages concurrently, yielding each one as soon as it is parsed.
+
+    At most `max_concurrency` pages are in flight at once. Pages are yielded
+    in completion order; closing the generator cancels the fetches that have
+    not started yet.
+
+    Args:
+        urls: Product page URLs, best match first.
+        max_concurrency: Pages fetched at the same time (default MAX_CONCURRENT_FETCHES).
+        deadline: A `time.monotonic()` timestamp after which fetching stops.
+
+    Yields:
+        (rank, product) pairs, where rank is the index into `urls` and product
+        is None for pages that failed or were discarded.
+    """
+    max_concurrency = max_concurrency or MAX_CONCURRENT_FETCHES
+    if deadline is None:
+        deadline = time.monotonic() + OVERALL_DEADLINE
+
+    pending = {}
+    next_index = 0
+    try:
+        while True:
+            while len(pending) < max_concurrency and next_index < len(urls):
+                future = _fetch_pool.submit(
+                    _fetch_product, urls[next_index], deadline)
+                pending[future] = next_index
+                next_index += 1
+            if not pending:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                SCRAPE_FAILURES.inc(len(pending), reason="deadline")
+                log.warning("[⏱️] Overall scrape deadline reached.")
+                return
+            done, _ = wait(pending, timeout=remaining,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def scrape_product_pages(urls: list[str], max_results=5, max_concurrency=None,
+                         deadline=None) -> list[dict]:
+    """
+    Fetches product pages concurrently and returns the valid products.
+
+    Fetching stops as soon as the top `max_results` products (in the order of
+    `urls`) are known, or when the overall deadline passes.
+
+    Args:
+        urls: Product page URLs, best match first.
+        max_results: The maximum number of products to return.
+        max_concurrency: Pages fetched at the same time (default MAX_CONCURRENT_FETCHES).
+        deadline: A `time.monotonic()` timestamp after which fetching stops.
+
+    Returns:
+        A list of product dictionaries in the same order as `urls`.
+    """
+    parsed = {}
+    with closing(iter_product_pages(urls, max_concurrency, deadline)) as pages:
+        for rank, product in pages:
+            parsed[rank] = product
+            if _ranked_prefix(parsed, len(urls), max_results) is not None:
+                break
+
+    products = [parsed[i] for i in sorted(parsed) if parsed[i]]
+    return products[:max_results]
+
+
+def _search_catalog(query: str, max_results=5):
+    """
+    Answers a search from the offline catalog when SEARCH_BACKEND allows it.
+
+    Returns:
+        A list of products, or None when the search should go to the live site.
+    """
+    if SEARCH_BACKEND == "live":
+        return None
+
+    from .catalog import get_catalog
+
+    catalog = get_catalog()
+    if catalog is not None and (SEARCH_BACKEND == "catalog" or catalog.count()):
+        log.info("[📚] Searching offline catalog for: '%s'", query)
+        return catalog.search(query, max_results=max_results)
+    if SEARCH_BACKEND == "catalog":
+        log.warning("[⚠️] No offline catalog found. Run `python -m tools.catalog ingest`.")
+        return []
+    return None
+
+
+def search_products(query: str, max_results=5, max_concurrency=None):
+    """
+    Searches for products on the Anuschka Leather website.
+
+    Live searches go through the search providers (DuckDuckGo + scraping by
+    default, optionally hedged with Shopify's own search; see
+    tools/search_providers.py). When an offline catalog is available (see
+    SEARCH_BACKEND) the search is a local lookup instead.
 
     Args:
         query: The search query.
         max_results: The maximum number of products to return.
+        max_concurrency: Product pages fetched at the same time.
 
     Returns:
         A list of dictionaries, where each dictionary represents a product.
     """
-    base_url = "https://anuschkaleather.com"
-    site_query = f"site:{base_url} {query}"
-    products = []
-    seen_urls = set()
+    products = _search_catalog(query, max_results=max_results)
+    if products is not None:
+        return products
 
-    print(f"[🦆] Searching DuckDuckGo for: {site_query}")
+    from .search_providers import get_search_scheduler
+
+    return list(_search_flight.do((query, max_results), get_search_scheduler().search,
+                                  query, max_results, max_concurrency))
+
+
+def _search_live(site_query: str, max_results: int, max_concurrency):
+    """Searches DuckDuckGo and scrapes the matching product pages."""
+    log.info("[🦆] Searching DuckDuckGo for: %s", site_query)
     try:
-        with DDGS() as ddgs:
-            # Get more results to increase chances of finding valid products
-            results = list(ddgs.text(site_query, max_results=15))
-            print(f"[📊] DDGS returned {len(results)} results.")
+        results = _search_ddgs(site_query)
+        log.info("[📊] DDGS returned %s results.", len(results))
     except Exception as e:
-        print(f"[❌] DuckDuckGo search failed: {e}")
+        log.error("[❌] DuckDuckGo search failed: %s", e)
         results = []
 
     if not results:
-        print("[⚠️] No results from DuckDuckGo search. Aborting.")
+        log.warning("[⚠️] No results from DuckDuckGo search. Aborting.")
         return []
 
-    for r in results:
-        if len(products) >= max_results:
-            break
+    products = scrape_product_pages(
+        _product_urls(results), max_results=max_results,
+        max_concurrency=max_concurrency)
 
-        url = r.get('href') or r.get('url')
-        # Ensure we are only processing valid product pages
-        if not url or 'anuschkaleather.com/products/' not in url:
-            continue
+    log.info("[🎉] Finished scraping. Found %s valid products.", len(products))
+    return products
 
-        url = url.split('?')[0]  # Clean up URL parameters
-        if url in seen_urls:
-            continue
-        seen_urls.add(url)
 
-        print(f"[🔗] Processing product page: {url}")
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            resp = requests.get(url, timeout=20, headers=headers)
-            print(f"[📈] HTTP Status for {url}: {resp.status_code}")
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.content, 'html.parser')
-
-            title_el = soup.select_one(
-                'h1.product__title, h1.product-title, h1, title')
-            title = title_el.get_text(strip=True) if title_el else 'N/A'
-            print(f"[🏷️] Found title: {title != 'N/A'}")
-
-            price_el = soup.select_one(
-                '.price__regular .price-item, .product__price, .price, .product-price')
-            price = price_el.get_text(
-                strip=True) if price_el else 'Price not available'
-            print(f"[💰] Found price: {price != 'Price not available'}")
-
-            # --- NEW, MORE ROBUST IMAGE EXTRACTION STRATEGY ---
-            image_url = ''
-
-            # 1. Try to find JSON-LD structured data (most reliable method)
-            json_ld_script = soup.find(
-                'script', {'type': 'application/ld+json'})
-            if json_ld_script:
-                try:
-                    data = json.loads(json_ld_script.string)
-                    if isinstance(data, list):
-                        data = data[0]
-                    if data.get('@type') == 'Product':
-                        image_data = data.get('image')
-                        if isinstance(image_data, list) and image_data:
-                            image_url = image_data[0]
-                        elif isinstance(image_data, str):
-                            image_url = image_data
-                        if image_url:
-                            print(
-                                f"[✅] Found image URL in JSON-LD data: {image_url}")
-                except (json.JSONDecodeError, KeyError, IndexError) as e:
-                    print(f"[⚠️] Could not parse JSON-LD data: {e}")
-
-            # 2. If JSON-LD fails, try Open Graph meta tags (very reliable)
-            if not image_url:
-                og_image = soup.find('meta', {'property': 'og:image'})
-                if og_image and og_image.get('content'):
-                    image_url = og_image['content']
-                    print(
-                        f"[✅] Found image URL in Open Graph meta tag: {image_url}")
-
-            # 3. If that fails, try a broad set of CSS selectors
-            if not image_url:
-                selectors = [
-                    'figure.product__media img',
-                    '.product-gallery__image img',
-                    '.product-image-main img',
-                    'img.product-gallery__image',
-                    'img.product__image'
-                ]
-                image_element = soup.select_one(', '.join(selectors))
-                if image_element:
-                    src = image_element.get(
-                        'src') or image_element.get('data-src')
-                    if src:
-                        if src.startswith('//'):
-                            image_url = f"https:{src}"
-                        else:
-                            image_url = urljoin(base_url, src)
-                        print(
-                            f"[🖼️] Successfully extracted image URL with CSS selector: {image_url}")
-
-            if not image_url:
-                print(
-                    f"[❌] Could not find an image URL for this product: {url}")
-
-            desc = soup.select_one(
-                '.product__description, .product-description, .product__info-content')
-            description = desc.get_text(strip=True) if desc else ''
-
-            # Only add product if we have the essential details
-            if title != 'N/A' and image_url:
-                products.append({
-                    'id': str(hash(url)),  # Generate unique ID from URL
-                    'name': title,  # Map title to name for frontend
-                    'title': title,  # Keep original for backwards compatibility
-                    'price': price,
-                    'link': url,  # Map url to link for frontend
-                    'url': url,  # Keep original for backwards compatibility
-                    'image': image_url,  # Map image_url to image for frontend
-                    'image_url': image_url,  # Keep original for backwards compatibility
-                    'description': description,
-                })
-                print(f"[✅] Successfully scraped product: {title}")
-            else:
-                print(f"[❌] Discarding product due to missing title or image: {url}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"[⚠️] Request failed for {url}: {e}")
-            continue
-        except Exception as e:
-            print(f"[⚠️] Error scraping {url}: {e}")
-            continue
+# --- Async variants, for callers running on an event loop (the FastAPI app) ---
+
+def get_async_client() -> "httpx.AsyncClient":
+    """
+    Returns the keep-alive HTTP client for the running event loop.
+
+    httpx clients are bound to the loop they were first used on, so each loop
+    (one per uvicorn worker) gets its own.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=HEADERS, follow_redirects=True, timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_FETCHES * 4,
+                                max_keepalive_connections=MAX_CONCURRENT_FETCHES * 4))
+        _async_clients[loop] = client
+    return client
+
+
+async def _adrain(resp, chunks, drain_deadline: float):
+    """Async counterpart of `_drain`."""
+    import httpx
+
+    if not _drain_allowed(resp):
+        return
+    read = 0
+    try:
+        async with asyncio.timeout(max(drain_deadline - time.monotonic(), 0)):
+            async for chunk in chunks:
+                read += len(chunk)
+                if read > DRAIN_MAX_BYTES:
+                    return
+    except (TimeoutError, httpx.HTTPError):
+        pass
+
+
+async def _download_and_parse_async(url: str, deadline: float):
+    """Async counterpart of `_download_and_parse`, enforcing the same deadline."""
+    async def parse_body(resp, drain_deadline):
+        log.debug("[📈] HTTP Status for %s: %s", url, resp.status_code)
+        resp.raise_for_status()
+        parse = StreamingParse(url, try_head=FAST_EXTRACTION)
+        chunks = resp.aiter_bytes()
+        async for chunk in chunks:
+            product = parse.feed(chunk)
+            if product:
+                log.debug("[⚡] Extracted product from page head: %s", url)
+                await _adrain(resp, chunks, drain_deadline)
+                return product
+        # Parsing the whole page is CPU-bound; keep it off the event loop.
+        return await asyncio.to_thread(parse.finish)
+
+    client = get_async_client()
+    async with upstream.arequest(url, timeout=max(deadline - time.monotonic(), 0)) as call:
+        timeout = min(REQUEST_TIMEOUT, max(deadline - time.monotonic(), 0.1))
+        # Taken before the timers start, so a slow drain gives up (keeping
+        # the product) just before the whole request would time out.
+        drain_deadline = time.monotonic() + timeout
+        resp = await asyncio.wait_for(client.send(client.build_request("GET", url), stream=True), timeout)
+        call.response(resp.status_code)
+    try:
+        return await asyncio.wait_for(parse_body(resp, drain_deadline),
+                                      max(drain_deadline - time.monotonic(), 0))
+    finally:
+        await resp.aclose()
+
+
+async def _fetch_product_async(url: str, deadline: float):
+    """Fetches and parses one product page. Returns None on any failure."""
+    cached = await PAGE_CACHE.aget(url, MISSING)
+    if cached is not MISSING:
+        return cached
+    return await _page_flight.do_async(url, _scrape_product_async, url, deadline)
+
+
+async def _scrape_product_async(url: str, deadline: float):
+    import httpx
+
+    log.debug("[🔗] Processing product page: %s", url)
+    try:
+        with span("page.fetch"):
+            product = await _download_and_parse_async(url, deadline)
+        PAGE_CACHE.set_nowait(url, product)
+        if product:
+            log.debug("[✅] Successfully scraped product: %s", product['title'])
+        else:
+            SCRAPE_FAILURES.inc(reason="no_product")
+        return product
+    except upstream.UpstreamUnavailable as e:
+        return _stale_product(url, e, await PAGE_CACHE.aget_stale(url, MISSING))
+    except (httpx.TimeoutException, asyncio.TimeoutError) as e:
+        SCRAPE_FAILURES.inc(reason="timeout")
+        log.warning("[⚠️] Request failed for %s: %r", url, e)
+    except httpx.HTTPError as e:
+        SCRAPE_FAILURES.inc(reason="request")
+        log.warning("[⚠️] Request failed for %s: %r", url, e)
+    except Exception as e:
+        SCRAPE_FAILURES.inc(reason="error")
+        log.warning("[⚠️] Error scraping %s: %s", url, e)
+    return None
+
+
+async def aiter_product_pages(urls: list[str], max_concurrency=None, deadline=None):
+    """Async counterpart of `iter_product_pages`."""
+    max_concurrency = max_concurrency or MAX_CONCURRENT_FETCHES
+    if deadline is None:
+        deadline = time.monotonic() + OVERALL_DEADLINE
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(url):
+        async with semaphore:
+            return await _fetch_product_async(url, deadline)
+
+    tasks = [asyncio.ensure_future(fetch(url)) for url in urls]
+    positions = {task: index for index, task in enumerate(tasks)}
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                SCRAPE_FAILURES.inc(len(pending), reason="deadline")
+                log.warning("[⏱️] Overall scrape deadline reached.")
+                return
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield positions[task], task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def scrape_product_pages_async(urls: list[str], max_results=5, max_concurrency=None,
+                                     deadline=None) -> list[dict]:
+    """Async counterpart of `scrape_product_pages`, with the same ordering and deadlines."""
+    parsed = {}
+    async with aclosing(aiter_product_pages(urls, max_concurrency, deadline)) as pages:
+        async for rank, product in pages:
+            parsed[rank] = product
+            if _ranked_prefix(parsed, len(urls), max_results) is not None:
+                break
+
+    products = [parsed[i] for i in sorted(parsed) if parsed[i]]
+    return products[:max_results]
+
+
+async def search_products_async(query: str, max_results=5, max_concurrency=None):
+    """
+    Async counterpart of `search_products`.
+
+    Product pages and Shopify searches are fetched on the event loop; the
+    DuckDuckGo client, the catalog and HTML parsing are synchronous and run
+    in worker threads.
+    """
+    if SEARCH_BACKEND != "live":
+        products = await asyncio.to_thread(_search_catalog, query, max_results)
+        if products is not None:
+            return products
+
+    from .search_providers import get_search_scheduler
+
+    return list(await _search_flight.do_async((query, max_results), get_search_scheduler().asearch,
+                                              query, max_results, max_concurrency))
+
+
+async def _search_live_async(site_query: str, max_results: int, max_concurrency):
+    """Async counterpart of `_search_live`."""
+    log.info("[🦆] Searching DuckDuckGo for: %s", site_query)
+    try:
+        results = await asyncio.to_thread(_search_ddgs, site_query)
+        log.info("[📊] DDGS returned %s results.", len(results))
+    except Exception as e:
+        log.error("[❌] DuckDuckGo search failed: %s", e)
+        results = []
+
+    if not results:
+        log.warning("[⚠️] No results from DuckDuckGo search. Aborting.")
+        return []
+
+    products = await scrape_product_pages_async(
+        _product_urls(results), max_results=max_results,
+        max_concurrency=max_concurrency)
+
+    log.info("[🎉] Finished scraping. Found %s valid products.", len(products))
+    return products
+
+
+async def astream_products(query: str, max_results=5, max_concurrency=None):
+    """
+    Yields products for a search as soon as each page is parsed.
+
+    Unlike `search_products_async` the products arrive in completion order,
+    not DuckDuckGo rank order, so the first one is available after a single
+    page fetch. Searches are not coalesced, but page fetches still are. If
+    DuckDuckGo fails or finds nothing, the other search providers answer
+    instead, all at once.
+    """
+    if SEARCH_BACKEND != "live":
+        products = await asyncio.to_thread(_search_catalog, query, max_results)
+        if products is not None:
+            for product in products:
+                yield product
+            return
+
+    site_query = f"site:{BASE_URL} {query}"
+    log.info("[🦆] Searching DuckDuckGo for: %s", site_query)
+    try:
+        results = await asyncio.to_thread(_search_ddgs, site_query)
+    except Exception as e:
+        log.error("[❌] DuckDuckGo search failed: %s", e)
+        results = []
+
+    if not _product_urls(results):
+        from .search_providers import HedgedSearch, get_search_scheduler
+
+        others = [p for p in get_search_scheduler().providers if p.name != "ddgs"]
+        if others:
+            for product in await HedgedSearch(others).asearch(query, max_results, max_concurrency):
+                yield product
+        return
 
-    print(f"[🎉] Finished scraping. Found {len(products)} valid products.")
-    return products
\ No newline at end of file
+    count = 0
+    async with aclosing(aiter_product_pages(_product_urls(results), max_concurrency)) as pages:
+        async for _, product in pages:
+            if product:
+                yield product
+                count += 1
+                if count >= max_results:
+                    break
+    log.info("[🎉] Finished streaming. Sent %s valid products.", count)
@@ -0,0 +1,347 @@
+# tools/precompute.py
+#
+# A lookup table with the search cascade results for the keyword sets the
+# style rules produce, combining at most PRECOMPUTE_MAX_ALL_RULES bag-style
+# rules (see StyleRuleEngine.keyword_sets). Requests whose keywords are
+# covered skip the search cascade entirely.
+#
+# The strict cascade levels only search the first three keywords (see
+# agent_tool.cascade_queries), so the table is keyed by those queries: the
+# many keyword sets the rules produce share a handful of them, and each is
+# searched once. Only strict-level hits are stored; when every strict level
+# comes back empty the cascade's broad search ranks by all keywords, which
+# is left to the live cascade and its caches.
+#
+# The table is rebuilt in a background thread every PRECOMPUTE_INTERVAL
+# seconds and swapped in whole, so requests never see a half-built table.
+# It is saved to PRECOMPUTE_PATH: whichever worker holds the file lock
+# rebuilds it, and the other workers pick up the new file.
+#
+# Build or inspect it by hand (e.g. from cron) with:
+#     python -m tools.precompute build
+#     python -m tools.precompute stats
+
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .telemetry import Counter, get_logger, register_collector
+
+PRECOMPUTE_PATH = os.getenv("PRECOMPUTE_PATH", os.path.join("data", "precomputed.json"))
+# Seconds between rebuilds; 0 disables the background refresh (an existing
+# table file is still served).
+PRECOMPUTE_INTERVAL = float(os.getenv("PRECOMPUTE_INTERVAL", str(6 * 3600)))
+# The first rebuild waits this long after startup, out of the way of warm-up
+# and the first requests.
+PRECOMPUTE_START_DELAY = float(os.getenv("PRECOMPUTE_START_DELAY", "60"))
+# Cascades searched at the same time while building.
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", "4"))
+# Bag-style rules combined per keyword set (see StyleRuleEngine.keyword_sets).
+PRECOMPUTE_MAX_ALL_RULES = int(os.getenv("PRECOMPUTE_MAX_ALL_RULES", "1"))
+# How often the refresher looks for a table written by another worker, and
+# how long it waits before trying again after a failed rebuild.
+CHECK_SECONDS = 30
+RETRY_SECONDS = 600
+# Bumped whenever the table's keys change meaning; older files are rebuilt.
+TABLE_FORMAT = 2
+
+PRECOMPUTE_LOOKUPS = Counter(
+    "persona_precompute_lookups_total", "Keyword set lookups in the precomputed table.", ["result"])
+
+log = get_logger(__name__)
+
+
+def cascade_key(keywords: list[str]) -> tuple:
+    """The strict cascade queries for `keywords`, which is what the table is keyed by."""
+    from .agent_tool import cascade_queries
+
+    return tuple(query for _, query in cascade_queries(keywords))
+
+
+class PrecomputedTable:
+    """
+    Products by cascade key (see `cascade_key`), plus when and from what it was built.
+
+    Only cascades that found products are stored; `cascades` counts every
+    cascade that was searched and `keyword_sets` the rule keyword sets they
+    cover.
+    """
+
+    def __init__(self, entries: dict, built_at: float, keyword_sets: int, cascades: int,
+                 build_seconds: float = 0.0):
+        self.entries = entries
+        self.built_at = built_at
+        self.keyword_sets = keyword_sets
+        self.cascades = cascades
+        self.build_seconds = build_seconds
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, keywords: list[str]):
+        return self.entries.get(cascade_key(keywords))
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    @classmethod
+    def load(cls, path: str = PRECOMPUTE_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != TABLE_FORMAT:
+            raise ValueError(f"{path} has an older format; it is rebuilt on the next refresh")
+        products = data["products"]
+        entries = {tuple(queries): [products[url] for url in urls] for queries, urls in data["entries"]}
+        return cls(entries, data["built_at"], data["keyword_sets"], data["cascades"],
+                   data.get("build_seconds", 0.0))
+
+    def save(self, path: str = PRECOMPUTE_PATH):
+        """Writes the table next to `path` and renames it into place, so readers never see part of it."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Most products answer several cascades; store each one once.
+        products = {p["url"]: p for entry in self.entries.values() for p in entry}
+        data = {
+            "format": TABLE_FORMAT,
+            "built_at": self.built_at,
+            "keyword_sets": self.keyword_sets,
+            "cascades": self.cascades,
+            "build_seconds": self.build_seconds,
+            "products": products,
+            "entries": [[list(key), [p["url"] for p in entry]] for key, entry in self.entries.items()],
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+_table = None
+_table_mtime = None
+_status = {"refreshing": False, "last_error": None}
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def install(table: PrecomputedTable, mtime: float = None):
+    """Makes `table` the one served; a single reference swap, so lookups never wait."""
+    global _table, _table_mtime
+    _table, _table_mtime = table, mtime
+
+
+def load_precomputed(path: str = PRECOMPUTE_PATH) -> bool:
+    """Loads the table file if it changed since it was last loaded. Returns True if it did."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return False
+    if mtime == _table_mtime:
+        return False
+    install(PrecomputedTable.load(path), mtime)
+    log.info("[📋] Loaded %s precomputed recommendations from %s", len(_table), path)
+    return True
+
+
+def lookup_precomputed(keywords: list[str]):
+    """Returns the precomputed products for a keyword set, or None."""
+    table = _table
+    if table is None:
+        return None
+    products = table.get(keywords)
+    PRECOMPUTE_LOOKUPS.inc(result="miss" if products is None else "hit")
+    return products
+
+
+def _search(keywords: list[str]) -> list[dict]:
+    from .agent_tool import search_cascade
+
+    try:
+        return search_cascade(keywords, broad=False)
+    except Exception as e:
+        log.warning("[⚠️] Precompute search failed for %s: %s", keywords, e)
+        return []
+
+
+def build_table(keyword_sets: list[list[str]] = None, workers: int = PRECOMPUTE_WORKERS) -> PrecomputedTable:
+    """
+    Runs the strict levels of the live search cascade once per distinct cascade key.
+
+    Args:
+        keyword_sets: The keyword sets to cover; defaults to every set the
+            style rules produce with up to PRECOMPUTE_MAX_ALL_RULES bag-style
+            rules.
+        workers: Cascades searched at the same time.
+    """
+    from .bag_recommender import get_rule_engine
+
+    if keyword_sets is None:
+        keyword_sets = get_rule_engine().keyword_sets(PRECOMPUTE_MAX_ALL_RULES)
+    cascades = {}
+    for keywords in keyword_sets:
+        cascades.setdefault(cascade_key(keywords), keywords)
+    log.info("[📋] Precomputing recommendations for %s keyword sets (%s distinct cascades).",
+             len(keyword_sets), len(cascades))
+    start = time.perf_counter()
+    entries = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="precompute") as pool:
+        for key, products in zip(cascades, pool.map(_search, cascades.values())):
+            if products:
+                entries[key] = products
+    table = PrecomputedTable(entries, time.time(), len(keyword_sets), len(cascades),
+                             round(time.perf_counter() - start, 1))
+    log.info("[📋] Precomputed %s of %s cascades in %.0fs.", len(entries), len(cascades),
+             table.build_seconds)
+    return table
+
+
+def refresh(path: str = PRECOMPUTE_PATH) -> bool:
+    """
+    Rebuilds, saves and installs the table, unless another process is already rebuilding it.
+
+    Returns:
+        True if this call rebuilt the table.
+    """
+    from .keyword_index import get_keyword_index
+
+    if get_keyword_index().from_catalog:
+        log.info("[📋] The offline catalog answers every search locally; nothing to precompute.")
+        return False
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        _status["refreshing"] = True
+        try:
+            table = build_table()
+            if not table.entries:
+                # Most likely an upstream outage; an older table beats none.
+                raise RuntimeError("no cascade found any products; keeping the previous table")
+            table.save(path)
+            install(table, os.path.getmtime(path))
+            _status["last_error"] = None
+        except Exception as e:
+            _status["last_error"] = str(e)
+            log.error("[❌] Rebuilding the precomputed table failed: %s", e)
+            return False
+        finally:
+            _status["refreshing"] = False
+    return True
+
+
+def _refresh_loop():
+    from .keyword_index import get_keyword_index
+
+    time.sleep(PRECOMPUTE_START_DELAY)
+    retry_at = 0.0
+    catalog_mode = False
+    while True:
+        # The catalog can be built (or emptied) while the server runs, so
+        # this is checked every time rather than once.
+        if get_keyword_index().from_catalog:
+            if not catalog_mode:
+                log.info("[📋] The offline catalog answers every search locally; "
+                         "not refreshing the precomputed table while it does.")
+                catalog_mode = True
+            time.sleep(CHECK_SECONDS)
+            continue
+        catalog_mode = False
+        try:
+            load_precomputed()
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("[⚠️] Could not load the precomputed table: %s", e)
+        if (_table is None or _table.age() >= PRECOMPUTE_INTERVAL) and time.time() >= retry_at:
+            if not refresh():
+                retry_at = time.time() + RETRY_SECONDS
+        time.sleep(CHECK_SECONDS)
+
+
+def start_refresher():
+    """
+    Starts the background refresh thread once per process (a no-op if PRECOMPUTE_INTERVAL is 0).
+
+    The thread idles while the offline catalog serves searches.
+    """
+    global _refresher
+    if PRECOMPUTE_INTERVAL <= 0 or _refresher is not None:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, daemon=True, name="precompute")
+            _refresher.start()
+
+
+def precompute_stats() -> dict:
+    """Returns the size, staleness and hit rate of the precomputed table."""
+    table = _table
+    hits, misses = PRECOMPUTE_LOOKUPS.value(result="hit"), PRECOMPUTE_LOOKUPS.value(result="miss")
+    stats = {
+        "loaded": table is not None,
+        "refreshing": _status["refreshing"],
+        "last_error": _status["last_error"],
+        "interval": PRECOMPUTE_INTERVAL,
+        "hits": hits,
+        "misses": misses,
+        # Share of keyword lookups the table answered.
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+    if table is not None:
+        age = table.age()
+        stats.update({
+            "entries": len(table),
+            "keyword_sets": table.keyword_sets,
+            "cascades": table.cascades,
+            # Share of the searched cascades whose strict levels found products.
+            # Keyword sets whose cascade only the broad search answers are
+            # misses, so this is not the share of requests answered (see
+            # hit_rate for that).
+            "found_rate": round(len(table) / table.cascades, 3) if table.cascades else None,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(table.built_at)),
+            "build_seconds": table.build_seconds,
+            "age_seconds": round(age),
+            "stale": PRECOMPUTE_INTERVAL > 0 and age > PRECOMPUTE_INTERVAL,
+        })
+    return stats
+
+
+@register_collector
+def _precompute_metrics() -> list[str]:
+    table = _table
+    if table is None:
+        return []
+    return [
+        "# HELP persona_precompute_entries Cascades with precomputed products.",
+        "# TYPE persona_precompute_entries gauge",
+        f"persona_precompute_entries {len(table)}",
+        "# HELP persona_precompute_age_seconds Age of the precomputed table.",
+        "# TYPE persona_precompute_age_seconds gauge",
+        f"persona_precompute_age_seconds {table.age():.0f}",
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the precomputed recommendation table.")
+    parser.add_argument("--path", default=PRECOMPUTE_PATH, help="table file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="search the keyword sets and save the table")
+    commands.add_parser("stats", help="show the size and staleness of the saved table")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if not refresh(args.path):
+            parser.exit(1, "Table not rebuilt (see the log above, or another process holds the lock).\n")
+    else:
+        load_precomputed(args.path)
+    print(json.dumps(precompute_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
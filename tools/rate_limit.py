@@ -0,0 +1,74 @@
+# tools/rate_limit.py
+#
+# Token-bucket rate limiting shared by the upstream clients.
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` operations per second on average, with bursts up to `capacity`.
+
+    Tokens refill continuously. `acquire` waits for a token (up to `timeout`
+    seconds); `try_acquire` never waits.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes `tokens` if available and returns 0, else returns the seconds to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        return self._reserve(tokens) == 0.0
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        """Blocks until `tokens` are available. Returns False if that would exceed `timeout`."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1, timeout: float = None) -> bool:
+        """Like `acquire`, but waits without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def refund(self, tokens: float = 1):
+        """Returns tokens taken for an operation that did not happen."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
@@ -0,0 +1,357 @@
+# tools/search_providers.py
+#
+# Where live product searches come from. Each provider turns a query into
+# finished product dictionaries; HedgedSearch asks them in order and sends a
+# backup query when the current one is slower than usual.
+#
+# Providers (SEARCH_PROVIDERS, in order of preference; "ddgs" by default):
+#     ddgs     DuckDuckGo site search + product page scraping (the original path)
+#     shopify  the store's own /search/suggest.json endpoint
+#     catalog  the offline catalog from tools/catalog.py
+#
+# Providers rank products differently, so a hedged search can return other
+# products than the first provider alone would. Hedging is therefore opt-in,
+# e.g. SEARCH_PROVIDERS=ddgs,shopify.
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+from . import local_search_anuschka, upstream
+from .cache import QUERY_CACHE
+from .extractors import _format_price, build_product
+from .telemetry import Counter, get_logger
+
+SEARCH_PROVIDERS = [p.strip() for p in os.getenv("SEARCH_PROVIDERS", "ddgs").split(",") if p.strip()]
+# A backup provider is asked once the current one has been running longer than
+# this percentile of its recent latencies...
+HEDGE_PERCENTILE = float(os.getenv("SEARCH_HEDGE_PERCENTILE", "95"))
+# ...but never sooner than this, and after this long while there is too little history.
+HEDGE_MIN_DELAY = float(os.getenv("SEARCH_HEDGE_MIN_DELAY", "0.25"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("SEARCH_HEDGE_DEFAULT_DELAY", "3"))
+HEDGE_MIN_SAMPLES = 10
+# Currency of the prices in Shopify's suggest.json, which does not say.
+SHOP_CURRENCY = os.getenv("SHOP_CURRENCY", "USD")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="search")
+
+SEARCH_HEDGES = Counter(
+    "persona_search_hedges_total", "Backup queries sent because a provider was slow.", ["provider"])
+SEARCH_PROVIDER_ERRORS = Counter(
+    "persona_search_provider_errors_total", "Provider searches that raised.", ["provider"])
+
+log = get_logger(__name__)
+
+
+class SearchProvider:
+    """
+    Base class for product search backends.
+
+    Subclasses implement `search`, and `asearch` when they can do better than
+    running `search` in a worker thread. Both return product dictionaries in
+    relevance order; an empty list means the provider had no answer.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.latencies = deque(maxlen=200)
+        self.calls = 0
+        self.failures = 0
+        self.wins = 0
+        # Calls are recorded from the hedge pool's threads.
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int, max_concurrency=None) -> list[dict]:
+        raise NotImplementedError
+
+    async def asearch(self, query: str, max_results: int, max_concurrency=None) -> list[dict]:
+        return await asyncio.to_thread(self.search, query, max_results, max_concurrency)
+
+    def record(self, seconds: float, products):
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(seconds)
+            if not products:
+                self.failures += 1
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def percentile(self, p: float):
+        """The `p`th percentile of recent call latencies, or None without enough history."""
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if len(ordered) < HEDGE_MIN_SAMPLES:
+            return None
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self._lock:
+            calls, failures, wins = self.calls, self.failures, self.wins
+        return {
+            "calls": calls,
+            "failures": failures,
+            "wins": wins,
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class DDGSProvider(SearchProvider):
+    """DuckDuckGo `site:` search, then scraping the product pages it finds."""
+
+    name = "ddgs"
+
+    def search(self, query, max_results, max_concurrency=None):
+        site_query = f"site:{local_search_anuschka.BASE_URL} {query}"
+        return local_search_anuschka._search_live(site_query, max_results, max_concurrency)
+
+    async def asearch(self, query, max_results, max_concurrency=None):
+        site_query = f"site:{local_search_anuschka.BASE_URL} {query}"
+        return await local_search_anuschka._search_live_async(site_query, max_results, max_concurrency)
+
+
+class ShopifySuggestProvider(SearchProvider):
+    """
+    The store's predictive search, `/search/suggest.json`.
+
+    One request returns titles, prices, images and descriptions, so no
+    product page has to be scraped.
+    """
+
+    name = "shopify"
+
+    def _request(self, query: str, max_results: int):
+        url = f"{local_search_anuschka.BASE_URL}/search/suggest.json"
+        params = {"q": query, "resources[type]": "product",
+                  "resources[limit]": min(max(max_results, 1), 10)}
+        return url, params
+
+    def _stale(self, error: Exception, products) -> list[dict]:
+        products = products or []
+        log.warning("[🕰️] Shopify suggest search skipped (%s); %s stale products.", error, len(products))
+        return products
+
+    def _products(self, data: dict) -> list[dict]:
+        products = []
+        for item in data.get("resources", {}).get("results", {}).get("products", []):
+            url = urljoin(local_search_anuschka.BASE_URL, (item.get("url") or "").split("?")[0])
+            image = item.get("image") or (item.get("featured_image") or {}).get("url") or ""
+            if image.startswith("//"):
+                image = f"https:{image}"
+            if not item.get("title") or not image:
+                continue
+            description = " ".join(_TAG_RE.sub(" ", item.get("body") or "").split())
+            products.append(build_product(
+                url, item["title"], _format_price(item.get("price"), SHOP_CURRENCY), image, description))
+        return products
+
+    def search(self, query, max_results, max_concurrency=None):
+        key = ("shopify", query, max_results)
+        products = QUERY_CACHE.get(key)
+        if products is not None:
+            return products
+        url, params = self._request(query, max_results)
+        try:
+            with upstream.request(url, timeout=local_search_anuschka.REQUEST_TIMEOUT) as call:
+                response = local_search_anuschka.get_session().get(
+                    url, params=params, timeout=local_search_anuschka.REQUEST_TIMEOUT)
+                call.response(response.status_code)
+                response.raise_for_status()
+            products = self._products(response.json())
+        except upstream.UpstreamUnavailable as e:
+            return self._stale(e, QUERY_CACHE.get_stale(key))[:max_results]
+        except Exception as e:
+            log.warning("[❌] Shopify suggest search failed: %s", e)
+            return []
+        if products:
+            QUERY_CACHE.set(key, products)
+        return products[:max_results]
+
+    async def asearch(self, query, max_results, max_concurrency=None):
+        key = ("shopify", query, max_results)
+        products = await QUERY_CACHE.aget(key)
+        if products is not None:
+            return products
+        url, params = self._request(query, max_results)
+        try:
+            async with upstream.arequest(url, timeout=local_search_anuschka.REQUEST_TIMEOUT) as call:
+                response = await local_search_anuschka.get_async_client().get(url, params=params)
+                call.response(response.status_code)
+                response.raise_for_status()
+            products = self._products(response.json())
+        except upstream.UpstreamUnavailable as e:
+            return self._stale(e, await QUERY_CACHE.aget_stale(key))[:max_results]
+        except Exception as e:
+            log.warning("[❌] Shopify suggest search failed: %s", e)
+            return []
+        if products:
+            QUERY_CACHE.set_nowait(key, products)
+        return products[:max_results]
+
+
+class CatalogProvider(SearchProvider):
+    """The offline catalog, as a provider regardless of SEARCH_BACKEND."""
+
+    name = "catalog"
+
+    def search(self, query, max_results, max_concurrency=None):
+        from .catalog import get_catalog
+
+        catalog = get_catalog()
+        return catalog.search(query, max_results=max_results) if catalog is not None else []
+
+
+PROVIDERS = {"ddgs": DDGSProvider, "shopify": ShopifySuggestProvider, "catalog": CatalogProvider}
+
+
+class HedgedSearch:
+    """
+    Queries providers in order, hedging slow calls with the next provider.
+
+    The first provider is asked straight away. If it has not answered after
+    its HEDGE_PERCENTILE latency, the next one is asked as well, and so on;
+    a provider that fails or finds nothing hands over to the next at once.
+    The first non-empty answer wins. Async searches cancel the losers;
+    threaded ones let them finish in the background (their caches still fill).
+    """
+
+    def __init__(self, providers: list[SearchProvider]):
+        if not providers:
+            raise ValueError("HedgedSearch needs at least one provider")
+        self.providers = providers
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def _hedge(self, provider: SearchProvider):
+        with self._lock:
+            self.hedges += 1
+        SEARCH_HEDGES.inc(provider=provider.name)
+        log.debug("[🪂] Search is slow, also asking '%s'.", provider.name)
+
+    def hedge_delay(self, provider: SearchProvider) -> float:
+        latency = provider.percentile(HEDGE_PERCENTILE)
+        return HEDGE_DEFAULT_DELAY if latency is None else max(latency, HEDGE_MIN_DELAY)
+
+    @staticmethod
+    def _timed(provider: SearchProvider, query, max_results, max_concurrency):
+        start = time.perf_counter()
+        products = []
+        try:
+            products = provider.search(query, max_results, max_concurrency)
+        except Exception as e:
+            SEARCH_PROVIDER_ERRORS.inc(provider=provider.name)
+            log.warning("[❌] Search provider '%s' failed: %s", provider.name, e)
+        provider.record(time.perf_counter() - start, products)
+        return products
+
+    @staticmethod
+    async def _atimed(provider: SearchProvider, query, max_results, max_concurrency):
+        start = time.perf_counter()
+        products = []
+        try:
+            products = await provider.asearch(query, max_results, max_concurrency)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            SEARCH_PROVIDER_ERRORS.inc(provider=provider.name)
+            log.warning("[❌] Search provider '%s' failed: %s", provider.name, e)
+        provider.record(time.perf_counter() - start, products)
+        return products
+
+    def search(self, query: str, max_results=5, max_concurrency=None) -> list[dict]:
+        """
+        Searches the providers, returning the first non-empty answer.
+
+        Returns:
+            A list of product dictionaries, or an empty list if no provider found any.
+        """
+        waiting = list(self.providers)
+        pending = {}
+
+        def ask_next():
+            provider = waiting.pop(0)
+            future = _hedge_pool.submit(self._timed, provider, query, max_results, max_concurrency)
+            pending[future] = provider
+            return time.monotonic() + self.hedge_delay(provider)
+
+        hedge_at = ask_next()
+        while pending:
+            timeout = max(hedge_at - time.monotonic(), 0) if waiting else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                self._hedge(waiting[0])
+                hedge_at = ask_next()
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                products = future.result()
+                if products:
+                    provider.record_win()
+                    return products
+            if waiting:
+                hedge_at = ask_next()
+        return []
+
+    async def asearch(self, query: str, max_results=5, max_concurrency=None) -> list[dict]:
+        """Async counterpart of `search`; providers still running are cancelled."""
+        waiting = list(self.providers)
+        pending = {}
+
+        def ask_next():
+            provider = waiting.pop(0)
+            task = asyncio.ensure_future(self._atimed(provider, query, max_results, max_concurrency))
+            pending[task] = provider
+            return time.monotonic() + self.hedge_delay(provider)
+
+        hedge_at = ask_next()
+        try:
+            while pending:
+                timeout = max(hedge_at - time.monotonic(), 0) if waiting else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._hedge(waiting[0])
+                    hedge_at = ask_next()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    products = task.result()
+                    if products:
+                        provider.record_win()
+                        return products
+                if waiting:
+                    hedge_at = ask_next()
+            return []
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {"hedges": self.hedges, "providers": {p.name: p.stats() for p in self.providers}}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_search_scheduler() -> HedgedSearch:
+    """Returns the process-wide HedgedSearch over SEARCH_PROVIDERS."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                unknown = [name for name in SEARCH_PROVIDERS if name not in PROVIDERS]
+                if unknown:
+                    raise ValueError(f"Unknown search providers: {', '.join(unknown)}")
+                _scheduler = HedgedSearch([PROVIDERS[name]() for name in SEARCH_PROVIDERS])
+    return _scheduler
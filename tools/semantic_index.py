@@ -0,0 +1,181 @@
+# tools/semantic_index.py
+#
+# Embedding-based product retrieval with sentence-transformers.
+#
+# Build the embedding matrix from the offline catalog with:
+#     python -m tools.semantic_index build
+#
+# Product embeddings live in a contiguous float32 matrix on disk and are
+# memory-mapped at startup, so every worker shares the same pages.
+
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from .batching import MicroBatcher
+from .telemetry import get_logger
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", os.path.join("data", "embeddings"))
+# Concurrent query encodings are grouped into one model call of at most this
+# many texts, waiting at most this long for the batch to fill.
+QUERY_BATCH_SIZE = int(os.getenv("EMBEDDING_QUERY_BATCH_SIZE", "32"))
+QUERY_BATCH_WAIT = float(os.getenv("EMBEDDING_QUERY_BATCH_WAIT_MS", "5")) / 1000
+
+log = get_logger(__name__)
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Loads the sentence-transformers model on CPU, once per process."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+
+                log.info("[🧠] Loading embedding model '%s' on CPU.", EMBEDDING_MODEL)
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _model
+
+
+def encode(texts: list[str]) -> np.ndarray:
+    """Embeds texts into L2-normalized float32 rows."""
+    vectors = get_model().encode(
+        texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def product_text(product: dict) -> str:
+    return f"{product.get('title', '')}. {product.get('description', '')}"
+
+
+class QueryEncoder(MicroBatcher):
+    """
+    Micro-batches query encodings from concurrent requests.
+
+    Callers block in `encode_one`; a single background thread embeds
+    everything that arrived together in one model call.
+    """
+
+    def __init__(self, encode_fn=encode, batch_size=QUERY_BATCH_SIZE, max_wait=QUERY_BATCH_WAIT):
+        super().__init__(encode_fn, batch_size, max_wait, name="query-encoder")
+
+    def encode_one(self, text: str) -> np.ndarray:
+        return self.run(text)
+
+
+class SemanticIndex:
+    """
+    Product embeddings as a memory-mapped (n_products, dim) float32 matrix.
+
+    Rows are normalized, so a single matrix-vector product gives the cosine
+    similarity of every product to a query.
+    """
+
+    def __init__(self, embeddings: np.ndarray, products: list[dict], query_encoder=None):
+        if len(embeddings) != len(products):
+            raise ValueError(
+                f"{len(embeddings)} embeddings for {len(products)} products")
+        self.embeddings = embeddings
+        self.products = products
+        self._query_encoder = query_encoder
+        self._query_encoder_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products)
+
+    @classmethod
+    def load(cls, directory: str = EMBEDDING_INDEX_DIR, query_encoder=None):
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "products.json"), encoding="utf-8") as f:
+            products = json.load(f)
+        return cls(embeddings, products, query_encoder)
+
+    def search_vector(self, query_vector: np.ndarray, top_k=5) -> list[dict]:
+        """Returns the `top_k` products closest to an embedded query, best first."""
+        scores = self.embeddings @ query_vector
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [self.products[i] for i in top]
+
+    def search(self, text: str, top_k=5) -> list[dict]:
+        """
+        Ranks products by semantic similarity to a persona or style description.
+
+        Args:
+            text: The free-form description to embed.
+            top_k: The maximum number of products to return.
+
+        Returns:
+            A list of product dictionaries, best match first.
+        """
+        return self.search_vector(self._get_query_encoder().encode_one(text), top_k)
+
+    def _get_query_encoder(self) -> QueryEncoder:
+        # Concurrent first searches must share one encoder thread (and one model load).
+        if self._query_encoder is None:
+            with self._query_encoder_lock:
+                if self._query_encoder is None:
+                    self._query_encoder = QueryEncoder()
+        return self._query_encoder
+
+
+def build_embedding_index(products: list[dict], directory: str = EMBEDDING_INDEX_DIR):
+    """Embeds product descriptions once and writes the matrix and products to disk."""
+    os.makedirs(directory, exist_ok=True)
+    embeddings = encode([product_text(p) for p in products])
+    np.save(os.path.join(directory, "embeddings.npy"), embeddings)
+    with open(os.path.join(directory, "products.json"), "w", encoding="utf-8") as f:
+        json.dump(products, f)
+    log.info("[🧠] Stored %sx%s embeddings in %s", embeddings.shape[0], embeddings.shape[1], directory)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_semantic_index():
+    """Returns the memory-mapped semantic index, or None if it has not been built."""
+    global _index
+    if _index is None:
+        if not os.path.exists(os.path.join(EMBEDDING_INDEX_DIR, "embeddings.npy")):
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = SemanticIndex.load(EMBEDDING_INDEX_DIR)
+    return _index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the product embedding index.")
+    parser.add_argument("--dir", default=EMBEDDING_INDEX_DIR, help="index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="embed every product in the offline catalog")
+    search_cmd = commands.add_parser("search", help="query the index")
+    search_cmd.add_argument("text")
+    search_cmd.add_argument("--max-results", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        from .catalog import get_catalog
+
+        catalog = get_catalog()
+        if catalog is None or not catalog.count():
+            parser.error("no offline catalog found; run `python -m tools.catalog ingest` first")
+        build_embedding_index(catalog.all_products(), args.dir)
+    else:
+        for product in SemanticIndex.load(args.dir).search(args.text, args.max_results):
+            print(f"{product['title']}  {product['price']}  {product['url']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# tools/singleflight.py
+#
+# Request coalescing: concurrent callers asking for the same key share one
+# in-flight call instead of each starting their own.
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from .telemetry import get_logger
+
+log = get_logger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is still running wait for it and get the same result (or exception). Once
+    the call finishes the key is forgotten, so later calls run again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._futures = {}  # key -> concurrent.futures.Future
+        self._tasks = {}    # (event loop, key) -> asyncio.Task
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` for a thread, or waits for the in-flight call."""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            log.debug("[🤝] Joining in-flight %s call for: %s", self.name, key)
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        """
+        Awaits `coro_fn(*args, **kwargs)`, or the in-flight call on this event loop.
+
+        The call is cancelled when every caller waiting for it is cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            self.calls += 1
+            task = loop.create_task(coro_fn(*args, **kwargs))
+            task.waiters = 0
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        else:
+            self.shared += 1
+            log.debug("[🤝] Joining in-flight %s call for: %s", self.name, key)
+        task.waiters += 1
+        try:
+            # Shielded, so one caller being cancelled does not cancel the others...
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # ...but once every caller has gone, nobody needs the result.
+            if task.waiters == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            task.waiters -= 1
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared}
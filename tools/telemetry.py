@@ -0,0 +1,214 @@
+# tools/telemetry.py
+#
+# Leveled, non-blocking logging plus in-process metrics in Prometheus text
+# format, so latency can be broken down by stage (see /metrics in app.py).
+#
+#     log = get_logger(__name__)
+#     with span("ddgs.query"):
+#         ...
+#     SCRAPE_FAILURES.inc(reason="http")
+#
+# Log records are put on a queue and written by a background thread, so the
+# request path never waits on stdout. LOG_LEVEL sets the level (default INFO).
+
+import asyncio
+import atexit
+import bisect
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_ROOT_LOGGER = "persona"
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s %(message)s"))
+    root = logging.getLogger(_ROOT_LOGGER)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def _configure_logging():
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                _start_listener()
+
+
+@atexit.register
+def _flush_logs():
+    if _listener is not None:
+        _listener.stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns a logger under the app's non-blocking root logger."""
+    _configure_logging()
+    return logging.getLogger(f"{_ROOT_LOGGER}.{name.rsplit('.', 1)[-1]}")
+
+
+def _restart_listener_in_child():
+    # The listener thread does not survive fork (gunicorn preload); a worker
+    # needs its own, or its log records would pile up in the queue.
+    global _listener
+    if _listener is not None:
+        _listener = None
+        _configure_logging()
+
+
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)) + "}"
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Observed values counted into cumulative buckets, optionally split by labels."""
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _label_text(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+# Callables returning extra exposition lines, for values kept elsewhere
+# (e.g. the cache tiers' own hit counters).
+COLLECTORS = []
+
+
+def register_collector(collector):
+    COLLECTORS.append(collector)
+    return collector
+
+
+def render_metrics() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    for collector in COLLECTORS:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+
+SPAN_SECONDS = Histogram(
+    "persona_span_duration_seconds", "Duration of instrumented stages.", ["span", "outcome"])
+SCRAPE_FAILURES = Counter(
+    "persona_scrape_failures_total", "Product pages that could not be fetched or parsed.", ["reason"])
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_log = get_logger("span")
+
+
+@contextmanager
+def span(name: str):
+    """
+    Times a stage of a request into SPAN_SECONDS.
+
+    Spans nest through a context variable, so the debug log line of a span
+    names its parent. The outcome label is "cancelled" when the block is
+    cancelled (e.g. a page fetch no longer needed) and "error" when it raises.
+    """
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_span.reset(token)
+        SPAN_SECONDS.observe(elapsed, span=name, outcome=outcome)
+        if _span_log.isEnabledFor(logging.DEBUG):
+            _span_log.debug("%s took %.1f ms (%s)%s", name, elapsed * 1000, outcome,
+                            f" in {parent}" if parent else "")
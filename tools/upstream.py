@@ -0,0 +1,319 @@
+# tools/upstream.py
+#
+# One governor per upstream host (the store, DuckDuckGo, ...) that every
+# outbound call goes through:
+#
+#     with upstream.request(url, timeout=remaining) as call:
+#         resp = session.get(url)
+#         call.response(resp.status_code)
+#
+# Each governor combines
+#   - a token bucket, whose rate adapts AIMD-style: it grows a little with
+#     every fast success and halves on 429s, 5xx responses, errors and slow
+#     answers;
+#   - a circuit breaker that opens after UPSTREAM_FAILURE_THRESHOLD failures
+#     in a row, rejects calls at once for UPSTREAM_OPEN_SECONDS, then lets a
+#     single probe call through to decide whether to close again.
+#
+# A call that is not admitted raises UpstreamUnavailable, which callers answer
+# from stale cache entries where they have them (see TTLCache.get_stale).
+#
+# Limits are set per host with UPSTREAM_<HOST>_MAX_RATE, _MIN_RATE and _BURST
+# (host upper-cased, other characters as "_", e.g. UPSTREAM_DUCKDUCKGO_COM_MAX_RATE),
+# falling back to UPSTREAM_MAX_RATE, UPSTREAM_MIN_RATE and UPSTREAM_BURST.
+
+import asyncio
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlparse
+
+from .rate_limit import TokenBucket
+from .telemetry import Counter, get_logger, register_collector
+
+# Host name used for the DuckDuckGo search client, which has no URL of ours.
+DDGS_HOST = "duckduckgo.com"
+
+UPSTREAM_MAX_RATE = os.getenv("UPSTREAM_MAX_RATE", "20")
+UPSTREAM_MIN_RATE = os.getenv("UPSTREAM_MIN_RATE", "0.5")
+UPSTREAM_BURST = os.getenv("UPSTREAM_BURST", "10")
+# Defaults for hosts known to throttle hard, below the environment overrides.
+HOST_DEFAULTS = {DDGS_HOST: {"MAX_RATE": "2", "BURST": "4"}}
+# Calls slower than this (to the response headers) count as congestion.
+UPSTREAM_SLOW_SECONDS = float(os.getenv("UPSTREAM_SLOW_SECONDS", "5"))
+UPSTREAM_FAILURE_THRESHOLD = int(os.getenv("UPSTREAM_FAILURE_THRESHOLD", "5"))
+UPSTREAM_OPEN_SECONDS = float(os.getenv("UPSTREAM_OPEN_SECONDS", "30"))
+# The rate is cut at most once per this many seconds, so one burst of
+# failing in-flight calls does not halve it again and again.
+DECREASE_INTERVAL = 1.0
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+UPSTREAM_CALLS = Counter(
+    "persona_upstream_calls_total", "Outbound calls by host and outcome.", ["host", "outcome"])
+
+log = get_logger(__name__)
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised when a call is not made because its host is throttled or failing."""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """The host's circuit breaker is open."""
+
+
+class RateLimited(UpstreamUnavailable):
+    """No token became available within the caller's timeout."""
+
+
+def _host(target: str) -> str:
+    if "://" in target:
+        return urlparse(target).netloc
+    return target
+
+
+def _host_setting(host: str, setting: str, default: str) -> str:
+    name = re.sub(r"[^A-Z0-9]", "_", host.upper())
+    return os.getenv(f"UPSTREAM_{name}_{setting}", HOST_DEFAULTS.get(host, {}).get(setting, default))
+
+
+def _is_throttle(error: Exception) -> bool:
+    # duckduckgo_search raises RatelimitException; HTTP clients attach the response.
+    if "ratelimit" in type(error).__name__.lower():
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+class HostGovernor:
+    """
+    Rate limit, AIMD adjustment and circuit breaker for one upstream host.
+
+    Args:
+        host: The host name, used in logs, stats and metrics.
+        max_rate: Calls per second allowed while the host is healthy.
+        min_rate: The floor the rate is never cut below.
+        burst: Token bucket capacity.
+    """
+
+    def __init__(self, host: str, max_rate: float, min_rate: float, burst: float):
+        self.host = host
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.bucket = TokenBucket(max_rate, burst)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, host: str):
+        return cls(
+            host,
+            max_rate=float(_host_setting(host, "MAX_RATE", UPSTREAM_MAX_RATE)),
+            min_rate=float(_host_setting(host, "MIN_RATE", UPSTREAM_MIN_RATE)),
+            burst=float(_host_setting(host, "BURST", UPSTREAM_BURST)),
+        )
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def _admit(self):
+        """Raises CircuitOpen unless the breaker lets a call through."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < UPSTREAM_OPEN_SECONDS:
+                    UPSTREAM_CALLS.inc(host=self.host, outcome="rejected")
+                    raise CircuitOpen(f"{self.host} is failing; not calling it for now")
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    UPSTREAM_CALLS.inc(host=self.host, outcome="rejected")
+                    raise CircuitOpen(f"{self.host} is being probed; not calling it for now")
+                self._probing = True
+
+    def _throttled(self):
+        with self._lock:
+            self._probing = False
+        UPSTREAM_CALLS.inc(host=self.host, outcome="rate_limited")
+        raise RateLimited(f"{self.host} is rate limited to {self.rate:.2f} calls/s")
+
+    def acquire(self, timeout: float = None):
+        """
+        Waits for permission to call the host.
+
+        Raises:
+            CircuitOpen: If the breaker is open.
+            RateLimited: If no token is available within `timeout` seconds.
+        """
+        self._admit()
+        if not self.bucket.acquire(timeout=timeout):
+            self._throttled()
+
+    async def acquire_async(self, timeout: float = None):
+        """Like `acquire`, but waits without blocking the event loop."""
+        self._admit()
+        if not await self.bucket.acquire_async(timeout=timeout):
+            self._throttled()
+
+    def cancel(self):
+        """Forgets an admitted call that was abandoned before it had an outcome."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, status: int = None, seconds: float = None, error: Exception = None):
+        """
+        Feeds a call's outcome into the rate and the breaker.
+
+        A status code decides on its own when there is one: 429 and 5xx are
+        failures, everything else (including 404) is a healthy answer.
+        Without one, any error is a failure.
+        """
+        if status is not None:
+            throttled, failed = status == 429, status == 429 or status >= 500
+        else:
+            throttled, failed = error is not None and _is_throttle(error), error is not None
+        slow = seconds is not None and seconds > UPSTREAM_SLOW_SECONDS
+        outcome = "throttled" if throttled else "error" if failed else "slow" if slow else "ok"
+        UPSTREAM_CALLS.inc(host=self.host, outcome=outcome)
+
+        with self._lock:
+            self._probing = False
+            if failed or slow:
+                self._decrease()
+            else:
+                # Additive increase: about one call/s more per second of full use.
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + 1 / max(self.bucket.rate, 1))
+            if not failed:
+                if self.state != CLOSED:
+                    log.info("[🔌] Upstream %s recovered; closing its circuit.", self.host)
+                self.state = CLOSED
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= UPSTREAM_FAILURE_THRESHOLD:
+                if self.state != OPEN:
+                    self.trips += 1
+                    log.warning("[🔌] Upstream %s failed %s times in a row; opening its circuit for %.0fs.",
+                                self.host, self.consecutive_failures, UPSTREAM_OPEN_SECONDS)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_INTERVAL:
+            self._last_decrease = now
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+
+    def stats(self) -> dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(UPSTREAM_OPEN_SECONDS - (time.monotonic() - self.opened_at), 0.0)
+            return {
+                "state": self.state,
+                "rate": round(self.bucket.rate, 3),
+                "max_rate": self.max_rate,
+                "tokens": round(self.bucket.available(), 2),
+                "consecutive_failures": self.consecutive_failures,
+                "trips": self.trips,
+                "retry_in": round(retry_in, 1),
+            }
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(target: str) -> HostGovernor:
+    """Returns the process-wide governor for a URL's host (or a host name)."""
+    host = _host(target)
+    governor = _governors.get(host)
+    if governor is None:
+        with _governors_lock:
+            governor = _governors.get(host)
+            if governor is None:
+                governor = _governors[host] = HostGovernor.from_env(host)
+    return governor
+
+
+class _Call:
+    """Handed to the body of a governed call to report when the answer arrived."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.status = None
+        self.seconds = None
+
+    def response(self, status: int):
+        """Records the HTTP status; the latency is taken up to this point."""
+        self.status = status
+        self.seconds = time.monotonic() - self.start
+
+
+def _finish(governor: HostGovernor, call: _Call, error: BaseException = None):
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit, KeyboardInterrupt)):
+        governor.cancel()
+        return
+    seconds = call.seconds if call.seconds is not None else time.monotonic() - call.start
+    governor.record(call.status, seconds, error if isinstance(error, Exception) else None)
+
+
+@contextmanager
+def request(target: str, timeout: float = None):
+    """
+    Governs one outbound call to the host of `target` (a URL or host name).
+
+    Raises:
+        UpstreamUnavailable: Before the call, if the host is not to be called now.
+    """
+    governor = get_governor(target)
+    governor.acquire(timeout)
+    call = _Call()
+    try:
+        yield call
+    except BaseException as e:
+        _finish(governor, call, e)
+        raise
+    _finish(governor, call)
+
+
+@asynccontextmanager
+async def arequest(target: str, timeout: float = None):
+    """Async counterpart of `request`."""
+    governor = get_governor(target)
+    await governor.acquire_async(timeout)
+    call = _Call()
+    try:
+        yield call
+    except BaseException as e:
+        _finish(governor, call, e)
+        raise
+    _finish(governor, call)
+
+
+def upstream_stats() -> dict:
+    """Returns the rate, breaker state and counters of every host called so far."""
+    with _governors_lock:
+        governors = list(_governors.values())
+    return {governor.host: governor.stats() for governor in governors}
+
+
+@register_collector
+def _upstream_metrics() -> list[str]:
+    stats = upstream_stats()
+    states = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    lines = ["# HELP persona_upstream_circuit_state Circuit breaker state by host (0 closed, 1 half open, 2 open).",
+             "# TYPE persona_upstream_circuit_state gauge"]
+    lines += [f'persona_upstream_circuit_state{{host="{host}"}} {states[s["state"]]}' for host, s in stats.items()]
+    lines += ["# HELP persona_upstream_rate_limit Current allowed calls per second by host.",
+              "# TYPE persona_upstream_rate_limit gauge"]
+    lines += [f'persona_upstream_rate_limit{{host="{host}"}} {s["rate"]}' for host, s in stats.items()]
+    return lines
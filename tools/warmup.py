@@ -0,0 +1,120 @@
+# tools/warmup.py
+#
+# Loads everything the request path needs before the first request arrives.
+#
+# Under gunicorn with `preload_app` (see gunicorn.conf.py) this runs once in
+# the master process, so imported modules, the keyword index and the
+# embedding matrix are shared copy-on-write by every forked worker instead of
+# being loaded again in each one.
+#
+# In the master only fork-safe state is created (`warm_up(fork_safe=True)`):
+# no threads are started and no network connections are opened, and the
+# catalog's SQLite connection is closed again before returning. The shared
+# cache (tools/cache.py) opens its connections lazily and drops inherited
+# ones in forked children.
+#
+# The embedding model is the exception: torch sets up its thread pools when
+# the model is loaded, and those do not survive fork. The master only maps
+# the embedding matrix; each worker loads the model when its app starts
+# (the lifespan in app.py runs warm-up again there).
+
+import os
+import time
+
+from .telemetry import get_logger
+
+# Set WARMUP=0 to skip warm-up (e.g. for quick local restarts).
+WARMUP = os.getenv("WARMUP", "1") != "0"
+
+log = get_logger(__name__)
+
+
+def _import_request_path():
+    # Deferred at import time to keep startup fast; needed by the first request.
+    import duckduckgo_search  # noqa: F401
+    import httpx  # noqa: F401
+    import lxml.html  # noqa: F401
+    from PIL import Image
+
+    from . import image_features  # noqa: F401
+
+    Image.init()
+
+
+def _load_indexes():
+    from .bag_recommender import get_rule_engine
+    from .catalog import get_catalog
+    from .keyword_index import get_keyword_index
+
+    get_rule_engine()
+    get_keyword_index()
+    catalog = get_catalog()
+    if catalog is not None:
+        catalog.close()
+
+
+def _load_precomputed():
+    from .precompute import load_precomputed
+
+    load_precomputed()
+
+
+def _load_semantic_index():
+    from .agent_tool import RETRIEVAL_BACKEND
+
+    if RETRIEVAL_BACKEND != "semantic":
+        return
+    from .semantic_index import get_semantic_index
+
+    get_semantic_index()
+
+
+def _load_embedding_model():
+    from .agent_tool import RETRIEVAL_BACKEND
+
+    if RETRIEVAL_BACKEND != "semantic":
+        return
+    from .semantic_index import get_model, get_semantic_index
+
+    if get_semantic_index() is not None:
+        get_model()
+
+
+# (name, step, fork_safe)
+STEPS = [
+    ("imports", _import_request_path, True),
+    ("indexes", _load_indexes, True),
+    ("precomputed", _load_precomputed, True),
+    ("semantic", _load_semantic_index, True),
+    ("model", _load_embedding_model, False),
+]
+
+
+def warm_up(fork_safe: bool = False) -> dict:
+    """
+    Runs every warm-up step once.
+
+    A failing step is reported and skipped; the first request will then do
+    that work instead.
+
+    Args:
+        fork_safe: Skip the steps whose state does not survive fork, for a
+            process that forks workers afterwards (the gunicorn master).
+
+    Returns:
+        Seconds taken per step.
+    """
+    timings = {}
+    if not WARMUP:
+        return timings
+    for name, step, step_fork_safe in STEPS:
+        if fork_safe and not step_fork_safe:
+            continue
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            log.warning("[⚠️] Warm-up step '%s' failed: %s", name, e)
+        timings[name] = round(time.perf_counter() - start, 3)
+    log.info("[🔥] Warm-up finished: %s", timings)
+    return timings